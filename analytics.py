@@ -0,0 +1,143 @@
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+WEEKDAYS = ["Пн", "Вт", "Ср", "Чт", "Пт", "Сб", "Вс"]
+DAY_SECONDS = 86400
+
+
+def _epoch(timestamp: str) -> float:
+    moment = datetime.fromisoformat(timestamp)
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return moment.timestamp()
+
+
+def _top(counts: Dict[Any, int], limit: Optional[int] = None) -> List[Tuple[Any, int]]:
+    return sorted(counts.items(), key=lambda item: (-item[1], str(item[0])))[:limit]
+
+
+def _percentile(values: Sequence[float], q: float) -> Optional[float]:
+    """Перцентиль с линейной интерполяцией"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    pos = (len(ordered) - 1) * q / 100
+    low = int(pos)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (pos - low)
+
+
+def _aggregate(ts, users, convs, offset: float, reply_window: float):
+    user_counts = Counter(users)
+    day_counts = Counter(int((t + offset) // DAY_SECONDS) for t in ts)
+    hours = [0] * 24
+    for t in ts:
+        hours[int(((t + offset) % DAY_SECONDS) // 3600)] += 1
+
+    threads = defaultdict(list)
+    for t, user, conv in zip(ts, users, convs):
+        threads[conv].append((t, user))
+    responses = []
+    for items in threads.values():
+        items.sort(key=lambda item: item[0])
+        for (prev_t, prev_user), (t, user) in zip(items, items[1:]):
+            if user != prev_user and t - prev_t <= reply_window:
+                responses.append(t - prev_t)
+
+    return dict(user_counts), dict(day_counts), hours, responses
+
+
+def compute_activity(messages: List[Dict], completed_tasks: List[Dict], active_tasks: List[Dict],
+                     since: Optional[datetime] = None, reply_window: float = 3600) -> Dict[str, Any]:
+    """
+    Точная статистика активности по сообщениям из _collect_analysis_data и задачам:
+    участники, топики, дни и часы (по локальному времени сервера), время ответа
+    и пропускная способность по поручениям.
+    """
+    offset = datetime.now().astimezone().utcoffset().total_seconds()
+    users = [m['user'] for m in messages]
+    topics = [m['topic'] for m in messages]
+    convs = [f"{m.get('chat_id')}:{m['topic']}" for m in messages]
+
+    ts = [_epoch(m['time']) for m in messages]
+    user_counts, day_counts, hours, responses = _aggregate(ts, users, convs, offset, reply_window)
+
+    all_tasks = completed_tasks + active_tasks
+    since_ts = since.timestamp() if since else None
+    created = [t for t in all_tasks if since_ts is None or _epoch(t['created_at']) >= since_ts]
+    completion_times = [
+        _epoch(t['completed_at']) - _epoch(t['created_at'])
+        for t in completed_tasks if t.get('completed_at') and t.get('created_at')
+    ]
+
+    return {
+        'messages': len(messages),
+        'participants': len(user_counts),
+        'users': _top(user_counts),
+        'topics': _top(Counter(topics)),
+        'days': sorted(day_counts.items()),
+        'hours': hours,
+        'responses': len(responses),
+        'response_median': _percentile(responses, 50),
+        'response_p90': _percentile(responses, 90),
+        'tasks_created': len(created),
+        'tasks_completed': len(completed_tasks),
+        'tasks_open': len(active_tasks),
+        'completion_median': _percentile(completion_times, 50),
+        'completed_by': _top(Counter(t.get('completed_by') or '?' for t in completed_tasks))
+    }
+
+
+def format_duration(seconds: float) -> str:
+    seconds = int(round(seconds))
+    if seconds < 60:
+        return f"{seconds} с"
+    minutes = seconds // 60
+    if minutes < 60:
+        return f"{minutes} мин"
+    hours, minutes = divmod(minutes, 60)
+    if hours < 24:
+        return f"{hours} ч {minutes} мин" if minutes else f"{hours} ч"
+    days, hours = divmod(hours, 24)
+    return f"{days} д {hours} ч" if hours else f"{days} д"
+
+
+def format_activity(report: Dict[str, Any], top: int = 5, by_day: bool = True) -> str:
+    """Текстовый блок статистики для промпта и команды /stats"""
+    total = report['messages']
+    lines = [f"Сообщений: {total}, участников: {report['participants']}"]
+
+    if report['users']:
+        lines.append("Самые активные: " + ", ".join(
+            f"{user} - {count} ({count * 100 // total}%)" for user, count in report['users'][:top]
+        ))
+    if report['topics']:
+        lines.append("По топикам: " + ", ".join(f"{topic} - {count}" for topic, count in report['topics']))
+    if by_day and report['days']:
+        lines.append("По дням: " + ", ".join(
+            f"{WEEKDAYS[(day + 3) % 7]} {datetime(1970, 1, 1) + timedelta(days=day):%d.%m} - {count}"
+            for day, count in report['days']
+        ))
+    if total:
+        peak = sorted(range(24), key=lambda hour: -report['hours'][hour])[:3]
+        lines.append("Пиковые часы: " + ", ".join(
+            f"{hour:02d}:00-{(hour + 1) % 24:02d}:00 ({report['hours'][hour]})"
+            for hour in peak if report['hours'][hour]
+        ))
+    if report['response_median'] is not None:
+        lines.append(
+            f"Время ответа: медиана {format_duration(report['response_median'])}, "
+            f"90% ответов быстрее {format_duration(report['response_p90'])} (ответов: {report['responses']})"
+        )
+
+    tasks_line = (f"Поручения: создано {report['tasks_created']}, выполнено {report['tasks_completed']}, "
+                  f"открыто {report['tasks_open']}")
+    if report['completion_median'] is not None:
+        tasks_line += f", медианное время выполнения {format_duration(report['completion_median'])}"
+    lines.append(tasks_line)
+    if report['completed_by']:
+        lines.append("Выполняли поручения: " + ", ".join(
+            f"{user} - {count}" for user, count in report['completed_by'][:top]
+        ))
+    return "\n".join(lines)
@@ -0,0 +1,347 @@
+#!/usr/bin/env python3
+"""
+Нагрузочный стенд: прогоняет синтетические (или построенные из history.json)
+сообщения через TelegramSummaryBot.handle_message с локальной заглушкой GigaChat.
+
+Выводит:
+- скорость приема (сообщ./с) и p50/p99 задержки обработчика
+- число запросов к LLM на сообщение
+- прирост памяти
+- время построения сводок на истории 1k/10k/100k сообщений
+
+Пример:
+    python benchmark.py --messages 1000 --llm-latency 0.05 --llm-error-rate 0.1
+    python benchmark.py --source history.json --history-sizes 1000,10000,100000
+    python benchmark.py --messages 1000 --llm-latency 0.05 --task-detection hybrid
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import logging
+import os
+import random
+import re
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+
+BENCH_CHAT_ID = -1000000000001
+BENCH_TOPICS = [{'id': i, 'name': f"Топик {i}"} for i in range(1, 6)]
+BENCH_USERS = [(1000 + i, f"user{i}", f"Имя{i}") for i in range(20)]
+BENCH_PHRASES = [
+    "Коллеги, подготовьте отчет по проекту до пятницы",
+    "Сделал презентацию, выложил в общую папку",
+    "Когда встреча с партнерами?",
+    "@user3 проверь, пожалуйста, расчеты к 15:00",
+    "Готово, задачу по интервью закрыл",
+    "Обсудим итоги выступления на планерке",
+    "Нужно согласовать бюджет на следующий квартал",
+]
+
+
+def write_bench_config(directory: str, llm_workers: int, task_detection: str = "llm") -> str:
+    """Конфиг стенда: фиктивные токены и одна синтетическая мультигруппа"""
+    path = os.path.join(directory, 'config.yaml')
+    config = {
+        'token': {'telegram': '0:BENCHMARK', 'gigachat': 'BENCHMARK'},
+        'bot': {
+            'summary_time': '09:00',
+            'max_messages_per_group': 100,
+            'summary_language': 'ru',
+            'llm_workers': llm_workers,
+            'task_detection': task_detection
+        },
+        'groups': [{'id': BENCH_CHAT_ID, 'name': 'Benchmark', 'topics': BENCH_TOPICS}]
+    }
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(config, f, ensure_ascii=False)  # JSON - подмножество YAML
+    return path
+
+
+class FakeGigaChatClient:
+    """Заглушка GigaChatClient с настраиваемой задержкой и долей ошибок"""
+
+    def __init__(self, latency: float = 0.0, jitter: float = 0.0, error_rate: float = 0.0,
+                 task_rate: float = 0.1, seed: int = 0):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.task_rate = task_rate
+        self.random = random.Random(seed)
+        self.calls: Dict[str, int] = {}
+        self.errors = 0
+        self.prompt_chars = 0
+
+    async def get_summary(self, prompt: str, call_type: str = "other") -> Optional[str]:
+        kind = call_type
+        self.calls[kind] = self.calls.get(kind, 0) + 1
+        self.prompt_chars += len(prompt)
+
+        delay = self.latency + self.random.uniform(-self.jitter, self.jitter)
+        if delay > 0:
+            await asyncio.sleep(delay)
+        if self.random.random() < self.error_rate:
+            # Настоящий клиент при ошибке логирует ее и возвращает None
+            self.errors += 1
+            return None
+
+        if kind == "task_detection":
+            is_task = self.random.random() < self.task_rate
+            return json.dumps({
+                "is_task": is_task,
+                "task_text": "Синтетическая задача" if is_task else None,
+                "assignee": None,
+                "deadline": None
+            }, ensure_ascii=False)
+        if kind == "task_batch":
+            count = len(re.findall(r"^\s*\d+\. Автор:", prompt, re.MULTILINE))
+            return json.dumps([
+                {"n": n, "is_task": self.random.random() < self.task_rate, "task_text": "Синтетическая задача",
+                 "assignee": None, "deadline": None}
+                for n in range(1, count + 1)
+            ], ensure_ascii=False)
+        if kind == "digest":
+            return "Синтетическое краткое изложение длинного сообщения."
+        if kind == "completion_check":
+            return json.dumps({"is_completion": False, "completed_task_id": None, "confidence": 0.0})
+        return "ОФИЦИАЛЬНАЯ СВОДКА\nСинтетическая сводка для стенда."
+
+    @property
+    def total_calls(self) -> int:
+        return sum(self.calls.values())
+
+
+def synthetic_messages(count: int, seed: int = 0, span: timedelta = timedelta(days=7)) -> List[Dict]:
+    """Сообщения в формате хранилища, равномерно распределенные по периоду span"""
+    rnd = random.Random(seed)
+    now = datetime.now(timezone.utc)
+    messages = []
+    for i in range(count):
+        user_id, username, first_name = rnd.choice(BENCH_USERS)
+        topic = rnd.choice(BENCH_TOPICS)
+        messages.append({
+            'id': i + 1,
+            'text': rnd.choice(BENCH_PHRASES),
+            'user_id': user_id,
+            'username': username,
+            'first_name': first_name,
+            'timestamp': (now - span * (1 - i / max(count, 1))).isoformat(),
+            'chat_id': BENCH_CHAT_ID,
+            'topic_id': topic['id'],
+            'topic_name': topic['name']
+        })
+    return messages
+
+
+def messages_from_history(path: str, count: int) -> List[Dict]:
+    """Сообщения из history.json, при необходимости повторяются до нужного количества"""
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    source = [msg for topics in data.values() for msgs in topics.values() for msg in msgs if msg.get('text')]
+    if not source:
+        raise ValueError(f"В {path} нет текстовых сообщений")
+    now = datetime.now(timezone.utc)
+    messages = []
+    for i in range(count):
+        msg = dict(source[i % len(source)])
+        topic = BENCH_TOPICS[i % len(BENCH_TOPICS)]
+        msg.update({
+            'id': i + 1,
+            'timestamp': (now - timedelta(days=7) * (1 - i / max(count, 1))).isoformat(),
+            'chat_id': BENCH_CHAT_ID,
+            'topic_id': topic['id'],
+            'topic_name': topic['name']
+        })
+        messages.append(msg)
+    return messages
+
+
+def to_update(msg: Dict, update_id: int):
+    """Обновление Telegram для сообщения хранилища (дата - текущее время)"""
+    from telegram import Update
+
+    data = {
+        'update_id': update_id,
+        'message': {
+            'message_id': msg['id'],
+            'date': int(time.time()),
+            'chat': {'id': msg['chat_id'], 'type': 'supergroup', 'is_forum': True},
+            'from': {
+                'id': msg.get('user_id') or 1,
+                'is_bot': False,
+                'first_name': msg.get('first_name') or 'user',
+                'username': msg.get('username')
+            },
+            'text': msg['text'],
+            'message_thread_id': msg['topic_id'],
+            'is_topic_message': True
+        }
+    }
+    return Update.de_json(data, None)
+
+
+def percentile(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q / 100 * (len(ordered) - 1))))]
+
+
+def make_bot(workdir: str, fake: FakeGigaChatClient):
+    from telegram_bot import TelegramSummaryBot
+
+    os.makedirs(workdir, exist_ok=True)
+    return TelegramSummaryBot(
+        history_file=os.path.join(workdir, 'history.json'),
+        tasks_file=os.path.join(workdir, 'tasks.json'),
+        giga_client=fake
+    )
+
+
+async def bench_ingest(workdir: str, messages: List[Dict], fake: FakeGigaChatClient,
+                       concurrency: int) -> Dict:
+    """Прием сообщений через handle_message"""
+    bot = make_bot(workdir, fake)
+    updates = [to_update(msg, i + 1) for i, msg in enumerate(messages)]
+    latencies: List[float] = []
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def handle(update):
+        async with semaphore:
+            started = time.perf_counter()
+            await bot.handle_message(update, None)
+            latencies.append(time.perf_counter() - started)
+
+    tracemalloc.start()
+    mem_before = tracemalloc.get_traced_memory()[0]
+    started = time.perf_counter()
+    await asyncio.gather(*(handle(u) for u in updates))
+    elapsed = time.perf_counter() - started
+    mem_after, mem_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    # В режиме hybrid неуверенные кандидаты проверяются пакетом (вне замера задержки приема)
+    await bot.process_deferred_tasks()
+    await bot.flush_storage()
+
+    return {
+        'messages': len(updates),
+        'seconds': elapsed,
+        'msgs_per_sec': len(updates) / elapsed if elapsed else 0.0,
+        'p50_ms': percentile(latencies, 50) * 1000,
+        'p99_ms': percentile(latencies, 99) * 1000,
+        'llm_calls_per_msg': fake.total_calls / len(updates) if updates else 0.0,
+        'llm_calls': dict(fake.calls),
+        'llm_errors': fake.errors,
+        'tasks_found': len(bot.tasks_storage),
+        'memory_growth_kb': (mem_after - mem_before) / 1024,
+        'memory_peak_kb': mem_peak / 1024
+    }
+
+
+async def bench_summary(workdir: str, size: int, source: Optional[str], fake: FakeGigaChatClient) -> Dict:
+    """Построение дневной и недельной сводки на истории из size сообщений"""
+    bot = make_bot(workdir, fake)
+    messages = messages_from_history(source, size) if source else synthetic_messages(size)
+    storage: Dict[int, List[Dict]] = {}
+    for msg in messages:
+        storage.setdefault(msg['topic_id'], []).append(msg)
+    bot.messages_storage = {BENCH_CHAT_ID: storage}
+
+    result = {'history': size}
+    for name, threshold, build_prompt, create in (
+        ('daily', timedelta(hours=24), bot._create_summary_prompt, bot.create_summary),
+        ('weekly', timedelta(days=7), bot._create_weekly_summary_prompt, bot.create_weekly_summary),
+    ):
+        started = time.perf_counter()
+        data = await bot._collect_analysis_data(datetime.now(timezone.utc) - threshold, wait_digests=True)
+        prompt = build_prompt(*data)
+        result[f'{name}_prompt_ms'] = (time.perf_counter() - started) * 1000
+        result[f'{name}_prompt_chars'] = len(prompt)
+
+        started = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):  # create_summary печатает промпт
+            await create()
+        result[f'{name}_total_ms'] = (time.perf_counter() - started) * 1000
+    return result
+
+
+async def run(args):
+    with tempfile.TemporaryDirectory() as workdir:
+        fake = FakeGigaChatClient(args.llm_latency, args.llm_jitter, args.llm_error_rate,
+                                  args.task_rate, args.seed)
+        if args.source:
+            messages = messages_from_history(args.source, args.messages)
+        else:
+            messages = synthetic_messages(args.messages, args.seed, span=timedelta(0))
+        ingest = await bench_ingest(os.path.join(workdir, 'ingest'), messages, fake, args.concurrency)
+
+        summaries = []
+        for size in args.history_sizes:
+            summary_fake = FakeGigaChatClient(args.llm_latency, 0.0, 0.0, seed=args.seed)
+            summaries.append(await bench_summary(os.path.join(workdir, f'summary_{size}'), size,
+                                                 args.source, summary_fake))
+    return {'ingest': ingest, 'summary': summaries}
+
+
+def print_report(report: Dict):
+    ingest = report['ingest']
+    print("=== Прием сообщений ===")
+    print(f"Сообщений: {ingest['messages']} за {ingest['seconds']:.2f} с "
+          f"({ingest['msgs_per_sec']:.1f} сообщ./с)")
+    print(f"Задержка обработчика: p50={ingest['p50_ms']:.2f} мс, p99={ingest['p99_ms']:.2f} мс")
+    print(f"Запросов к LLM на сообщение: {ingest['llm_calls_per_msg']:.2f} {ingest['llm_calls']}, "
+          f"ошибок: {ingest['llm_errors']}, найдено задач: {ingest['tasks_found']}")
+    print(f"Прирост памяти: {ingest['memory_growth_kb']:.0f} КБ (пик {ingest['memory_peak_kb']:.0f} КБ)")
+
+    print("\n=== Построение сводок ===")
+    print(f"{'история':>10} {'день: промпт мс':>16} {'день: всего мс':>15} "
+          f"{'неделя: промпт мс':>18} {'неделя: всего мс':>17} {'символов (нед.)':>16}")
+    for row in report['summary']:
+        print(f"{row['history']:>10} {row['daily_prompt_ms']:>16.1f} {row['daily_total_ms']:>15.1f} "
+              f"{row['weekly_prompt_ms']:>18.1f} {row['weekly_total_ms']:>17.1f} {row['weekly_prompt_chars']:>16}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Нагрузочный стенд Telegram Summary Bot")
+    parser.add_argument('--messages', type=int, default=1000, help='число сообщений для приема')
+    parser.add_argument('--source', help='history.json для построения сообщений (по умолчанию синтетика)')
+    parser.add_argument('--history-sizes', default='1000,10000,100000',
+                        help='размеры истории для замера сводок через запятую')
+    parser.add_argument('--concurrency', type=int, default=1,
+                        help='одновременно обрабатываемых сообщений (1 - как в python-telegram-bot по умолчанию)')
+    parser.add_argument('--llm-latency', type=float, default=0.0, help='задержка заглушки GigaChat, с')
+    parser.add_argument('--llm-jitter', type=float, default=0.0, help='разброс задержки, с')
+    parser.add_argument('--llm-error-rate', type=float, default=0.0, help='доля ошибок GigaChat (0-1)')
+    parser.add_argument('--task-rate', type=float, default=0.1, help='доля сообщений, распознаваемых как задачи')
+    parser.add_argument('--task-detection', choices=('llm', 'hybrid', 'heuristic'), default='llm',
+                        help='режим выявления задач (bot.task_detection)')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', action='store_true', help='вывести результат в JSON')
+    args = parser.parse_args()
+    args.history_sizes = [int(x) for x in args.history_sizes.split(',') if x.strip()]
+
+    logging.disable(logging.WARNING)
+    # Конфиг стенда подключается до импорта модулей бота (они читают CONFIG при импорте)
+    config_dir = tempfile.mkdtemp(prefix='bench_config_')
+    os.environ['APP_CONFIG_FILE_PATH'] = write_bench_config(config_dir, args.concurrency, args.task_detection)
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+    try:
+        report = asyncio.run(run(args))
+    finally:
+        shutil.rmtree(config_dir, ignore_errors=True)
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+    else:
+        print_report(report)
+
+
+if __name__ == '__main__':
+    main()
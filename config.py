@@ -1,11 +1,20 @@
 import os
+import time
 import yaml
 
-def get_config():
+# C-реализация загрузчика (libyaml) заметно быстрее, если доступна
+_YamlLoader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
+def config_path():
     path_to_config = "config.yaml"
-    yaml_config_path = os.getenv("APP_CONFIG_FILE_PATH", path_to_config)
+    return os.getenv("APP_CONFIG_FILE_PATH", path_to_config)
+
+def get_config():
+    yaml_config_path = config_path()
     with open(yaml_config_path, encoding="utf-8") as f:
-        config = yaml.safe_load(f)
+        config = yaml.load(f, Loader=_YamlLoader)
     return config
 
+_started = time.perf_counter()
 CONFIG = get_config()
+CONFIG_LOAD_SECONDS = time.perf_counter() - _started
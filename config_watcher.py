@@ -0,0 +1,214 @@
+import asyncio
+import copy
+import logging
+import os
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+import yaml
+
+import storage_io
+from config import _YamlLoader
+from metrics import CONFIG_RELOADS
+from scheduler import parse_time, parse_weekday
+
+logger = logging.getLogger(__name__)
+
+# Параметры, которые применяются только при запуске (процессы, серверы, учетные данные)
+RESTART_KEYS = (
+    ("token",), ("secretsPaths",), ("telethon",), ("webhook",), ("metrics",),
+    ("bot", "update_mode"), ("bot", "shards"), ("bot", "llm_workers"), ("bot", "io_workers"),
+    ("bot", "json_backend"), ("bot", "lazy_history_load"), ("bot", "config_reload_interval"),
+    ("bot", "digest_workers")
+)
+TASK_DETECTION_MODES = ("llm", "hybrid", "heuristic")
+
+# Числовые параметры bot: ключ -> (целое, минимум, допускается null)
+NUMERIC_KEYS = {
+    "max_messages_per_group": (True, 1, False),
+    "shards": (True, 1, True),
+    "llm_workers": (True, 1, True),
+    "io_workers": (True, 1, True),
+    "commit_interval": (False, 0, False),
+    "commit_max_pending": (True, 1, False),
+    "loop_lag_threshold": (False, 0, False),
+    "config_reload_interval": (False, 0, False),
+    "shard_call_timeout": (False, 1, False),
+    "search_results": (True, 1, False),
+    "task_confidence": (False, 0, False),
+    "task_batch_interval": (False, 1, False),
+    "task_batch_size": (True, 1, False),
+    "task_deferred_limit": (True, 1, False),
+    "reminder_lead_minutes": (False, 0, False),
+    "reminder_check_interval": (False, 1, False),
+    "history_retention_days": (True, 1, True),
+    "task_completed_days": (True, 1, False),
+    "task_open_days": (True, 1, True),
+    "task_archive_days": (True, 1, True),
+    "digest_threshold": (True, 1, False),
+    "digest_chunk_chars": (True, 100, False),
+    "digest_max_chars": (True, 50, False),
+    "digest_workers": (True, 1, False),
+    "digest_wait": (False, 0, False),
+    "document_max_bytes": (True, 1, False),
+}
+BOOL_KEYS = ("reminders", "lazy_history_load")
+
+
+def _get(config: Dict[str, Any], path: Tuple[str, ...]) -> Any:
+    for key in path:
+        if not isinstance(config, dict):
+            return None
+        config = config.get(key)
+    return config
+
+
+def validate_config(config: Any) -> List[str]:
+    """Проверка конфига перед применением; возвращает список ошибок (пустой - конфиг корректен)"""
+    if not isinstance(config, dict):
+        return ["конфиг должен быть словарем"]
+    errors = []
+    bot = config.get("bot")
+    if not isinstance(bot, dict):
+        return ["не задан раздел bot"]
+
+    for key in ("summary_time", "weekly_summary_time", "deadline_default_time"):
+        if bot.get(key) is None and key != "summary_time":
+            continue
+        try:
+            parse_time(str(bot.get(key)))
+        except (ValueError, AttributeError):
+            errors.append(f"bot.{key}: ожидается время HH:MM, получено {bot.get(key)!r}")
+    if bot.get("weekly_summary_day") is not None:
+        try:
+            parse_weekday(bot["weekly_summary_day"])
+        except ValueError as e:
+            errors.append(f"bot.weekly_summary_day: {e}")
+    if "max_messages_per_group" not in bot:
+        errors.append("bot.max_messages_per_group: не задан")
+    for key, (integer, minimum, nullable) in NUMERIC_KEYS.items():
+        if key not in bot or (nullable and bot[key] is None):
+            continue
+        value = bot[key]
+        # bool - подкласс int, но true вместо числа - ошибка
+        valid_type = isinstance(value, int) if integer else isinstance(value, (int, float))
+        if isinstance(value, bool) or not valid_type or value < minimum:
+            kind = "целое число" if integer else "число"
+            errors.append(f"bot.{key}: ожидается {kind} не меньше {minimum}, получено {value!r}")
+    if isinstance(bot.get("task_confidence"), (int, float)) and bot["task_confidence"] > 1:
+        errors.append("bot.task_confidence: ожидается число от 0 до 1")
+    if "gigachat_model" in bot and not (isinstance(bot["gigachat_model"], str) and bot["gigachat_model"]):
+        errors.append("bot.gigachat_model: ожидается название модели")
+    for key in BOOL_KEYS:
+        if key in bot and not isinstance(bot[key], bool):
+            errors.append(f"bot.{key}: ожидается true или false")
+    admins = bot.get("admin_user_ids") or []
+    if not isinstance(admins, list) or not all(isinstance(a, int) and not isinstance(a, bool) for a in admins):
+        errors.append("bot.admin_user_ids: ожидается список целых id пользователей")
+    if not bot.get("summary_language"):
+        errors.append("bot.summary_language: не задан")
+    if bot.get("task_detection", "llm") not in TASK_DETECTION_MODES:
+        errors.append(f"bot.task_detection: ожидается одно из {', '.join(TASK_DETECTION_MODES)}")
+
+    groups = config.get("groups") or []
+    if not isinstance(groups, list):
+        return errors + ["groups: ожидается список групп"]
+    seen = set()
+    for i, group in enumerate(groups):
+        if not isinstance(group, dict) or not isinstance(group.get("id"), int):
+            errors.append(f"groups[{i}]: ожидается словарь с целым id")
+            continue
+        if group["id"] in seen:
+            errors.append(f"groups[{i}]: группа {group['id']} указана дважды")
+        seen.add(group["id"])
+        for j, topic in enumerate(group.get("topics") or []):
+            if not isinstance(topic, dict) or not isinstance(topic.get("id"), int) or not topic.get("name"):
+                errors.append(f"groups[{i}].topics[{j}]: ожидается словарь с целым id и name")
+    return errors
+
+
+def merge_reloadable(current: Dict[str, Any], new: Dict[str, Any]) -> Dict[str, Any]:
+    """Новый конфиг, в котором параметры из RESTART_KEYS оставлены прежними"""
+    merged = copy.deepcopy(new)
+    for path in RESTART_KEYS:
+        old_value, new_value = _get(current, path), _get(merged, path)
+        if old_value == new_value:
+            continue
+        logger.warning(f"Параметр {'.'.join(path)} применяется только после перезапуска")
+        parent = merged
+        for key in path[:-1]:
+            parent = parent.setdefault(key, {})
+        if old_value is None:
+            parent.pop(path[-1], None)
+        else:
+            parent[path[-1]] = copy.deepcopy(old_value)
+    return merged
+
+
+def _read_config(path: str) -> Any:
+    with open(path, encoding="utf-8") as f:
+        return yaml.load(f, Loader=_YamlLoader)
+
+
+class ConfigWatcher:
+    """
+    Слежение за config.yaml по времени изменения и размеру файла (опрос раз в interval секунд).
+    Измененный файл читается в пуле потоков ввода-вывода и проверяется; некорректный
+    конфиг отклоняется с записью в лог, и бот продолжает работать со старым.
+    """
+
+    def __init__(self, path: str, on_reload: Callable[[Dict[str, Any]], Awaitable[None]], interval: float = 5):
+        self.path = path
+        self.on_reload = on_reload
+        self.interval = interval
+        self._stamp = self._file_stamp()
+        self._task: Optional[asyncio.Task] = None
+
+    def _file_stamp(self) -> Optional[Tuple[int, int]]:
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+            logger.info(f"Отслеживание изменений {self.path} (раз в {self.interval} с)")
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            stamp = self._file_stamp()
+            if stamp is None or stamp == self._stamp:
+                continue
+            self._stamp = stamp
+            await self.check()
+
+    async def check(self) -> bool:
+        """Чтение, проверка и применение конфига"""
+        try:
+            config = await storage_io.run_io(_read_config, self.path)
+        except Exception as e:
+            CONFIG_RELOADS.inc(result="error")
+            logger.error(f"Конфиг {self.path} не загружен, продолжаем со старым: {e}")
+            return False
+
+        errors = validate_config(config)
+        if errors:
+            CONFIG_RELOADS.inc(result="invalid")
+            logger.error(f"Конфиг {self.path} отклонен, продолжаем со старым: " + "; ".join(errors))
+            return False
+
+        try:
+            await self.on_reload(config)
+        except Exception as e:
+            CONFIG_RELOADS.inc(result="error")
+            logger.error(f"Ошибка применения конфига {self.path}: {e}", exc_info=True)
+            return False
+        CONFIG_RELOADS.inc(result="ok")
+        return True
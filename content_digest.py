@@ -0,0 +1,225 @@
+import asyncio
+import hashlib
+import logging
+import os
+import re
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Вложения, которые отмечаются в сводке, и их подписи
+MEDIA_LABELS = {
+    "photo": "фото", "video": "видео", "document": "документ", "audio": "аудио", "voice": "голосовое",
+    "video_note": "видеосообщение", "animation": "анимация", "sticker": "стикер", "poll": "опрос",
+    "location": "геопозиция", "contact": "контакт"
+}
+TEXT_EXTENSIONS = (".txt", ".md", ".csv", ".tsv", ".json", ".log", ".xml", ".yaml", ".yml", ".ini", ".py", ".sql")
+TEXT_MIME_TYPES = ("application/json", "application/xml", "application/x-yaml", "application/csv")
+
+PARAGRAPH_RE = re.compile(r"\n\s*\n")
+SENTENCE_RE = re.compile(r"(?<=[.!?…])\s+")
+
+CHUNK_PROMPT = """Кратко изложи {part} из рабочего чата в 2-3 предложениях.
+Сохрани факты, числа, имена, решения и сроки, ничего не добавляй от себя.
+Ответь только текстом изложения, без вступлений.
+
+{text}"""
+REDUCE_PROMPT = """Ниже краткие изложения частей одного сообщения из рабочего чата.
+Объедини их в связное изложение не длиннее {limit} символов, сохрани факты, числа, имена, решения и сроки.
+Ответь только текстом изложения, без вступлений.
+
+{text}"""
+
+
+def is_text_document(file_name: Optional[str], mime_type: Optional[str]) -> bool:
+    """Документ, из которого можно извлечь текст без сторонних библиотек"""
+    if mime_type and (mime_type.startswith("text/") or mime_type in TEXT_MIME_TYPES):
+        return True
+    return bool(file_name) and os.path.splitext(file_name)[1].lower() in TEXT_EXTENSIONS
+
+
+def decode_document(data: bytes) -> str:
+    """Текст документа: UTF-8 (в том числе с BOM), иначе cp1251"""
+    try:
+        return data.decode("utf-8-sig")
+    except UnicodeDecodeError:
+        return data.decode("cp1251", errors="replace")
+
+
+def shorten(text: str, limit: int) -> str:
+    """Начало текста не длиннее limit символов по границе предложения или слова"""
+    text = " ".join(text.split())
+    if len(text) <= limit:
+        return text
+    taken = ""
+    for sentence in SENTENCE_RE.split(text):
+        if len(taken) + len(sentence) + 2 > limit:
+            break
+        taken = f"{taken} {sentence}" if taken else sentence
+    if taken:
+        return taken + " …"
+    return text[:limit - 1].rsplit(" ", 1)[0] + "…"
+
+
+def split_chunks(text: str, size: int) -> List[str]:
+    """Разбиение на части не длиннее size символов по абзацам, затем по предложениям"""
+    pieces: List[str] = []
+    for paragraph in PARAGRAPH_RE.split(text.strip()):
+        if len(paragraph) <= size:
+            pieces.append(paragraph)
+            continue
+        for sentence in SENTENCE_RE.split(paragraph):
+            # Предложение длиннее части (таблица, лог) режется как есть
+            pieces.extend(sentence[i:i + size] for i in range(0, len(sentence), size))
+
+    chunks: List[str] = []
+    current = ""
+    for piece in pieces:
+        if current and len(current) + len(piece) + 2 > size:
+            chunks.append(current)
+            current = ""
+        current = f"{current}\n\n{piece}" if current else piece
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+class ContentExtractor:
+    """
+    Фоновая обработка длинных сообщений и текстовых документов: содержимое
+    режется на части, каждая сжимается GigaChat, затем части сводятся в одно
+    краткое изложение (digest), которое сохраняется в самом сообщении.
+    Сводки берут готовый digest, поэтому каждое сообщение сжимается один раз.
+    При ошибке GigaChat digest остается пустым, а начало текста (shorten) сохраняется
+    в digest_partial: сводка использует его, пока сообщение не будет обработано заново.
+    """
+
+    def __init__(self, summarize: Callable[[str], Awaitable[Optional[str]]], workers: int = 2,
+                 chunk_chars: int = 3000, max_chars: int = 400, max_chunks: int = 20, cache_size: int = 1024):
+        self.summarize = summarize
+        self.workers = workers
+        self.chunk_chars = chunk_chars
+        self.max_chars = max_chars
+        self.max_chunks = max_chunks
+        self.cache_size = cache_size
+        # Одинаковое содержимое (пересланные посты, повторные документы) сжимается один раз
+        self._cache: "OrderedDict[str, str]" = OrderedDict()
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._tasks: List[asyncio.Task] = []
+        # Части одного сообщения сжимаются параллельно, но не занимают больше workers запросов к GigaChat
+        self._slots = asyncio.Semaphore(workers)
+        self.pending = 0
+
+    def __len__(self) -> int:
+        """Сообщений в очереди и в обработке"""
+        return self.pending
+
+    def start(self):
+        if self._tasks:
+            return
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return  # Запустится при первом submit в работающем event loop
+        self._tasks = [asyncio.create_task(self._run()) for _ in range(self.workers)]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def submit(self, message: Dict[str, Any], load_document: Optional[Callable[[], Awaitable[str]]] = None,
+               on_done: Optional[Callable[[Dict[str, Any]], None]] = None):
+        """
+        Постановка сообщения в очередь; по готовности изложение записывается в message['digest'],
+        при ошибке GigaChat - начало текста в message['digest_partial']
+        """
+        self._queue.put_nowait((message, load_document, on_done))
+        self.pending += 1
+        self.start()
+
+    async def join(self, timeout: float) -> bool:
+        """Ожидание обработки очереди не дольше timeout секунд"""
+        if not len(self):
+            return True
+        self.start()
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            logger.warning(f"Не дождались кратких изложений: в очереди {len(self)} сообщений")
+            return False
+
+    async def _run(self):
+        while True:
+            message, load_document, on_done = await self._queue.get()
+            try:
+                content = message.get('text') or ""
+                if load_document is not None:
+                    document = await load_document()
+                    name = (message.get('document') or {}).get('name') or "без названия"
+                    content = f"{content}\n\nДокумент {name}:\n{document}".strip()
+                if content:
+                    result, complete = await self._digest(content)
+                    # Ключи не добавляются и не удаляются: сообщение может сериализоваться в другом потоке
+                    if complete:
+                        message['digest'], message['digest_partial'] = result, None
+                    else:
+                        message['digest'], message['digest_partial'] = None, result
+                    if on_done is not None:
+                        on_done(message)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Ошибка обработки содержимого сообщения {message.get('id')}: {e}", exc_info=True)
+            finally:
+                self.pending -= 1
+                self._queue.task_done()
+
+    async def digest(self, text: str) -> str:
+        """Краткое изложение текста (с кешем по содержимому)"""
+        return (await self._digest(text))[0]
+
+    async def _digest(self, text: str) -> Tuple[str, bool]:
+        """Изложение и признак того, что GigaChat ответил на все запросы (иначе в нем начало текста)"""
+        if len(text) <= self.max_chars:
+            return " ".join(text.split()), True
+        key = hashlib.sha1(text.encode("utf-8")).hexdigest()
+        if key in self._cache:
+            self._cache.move_to_end(key)
+            return self._cache[key], True
+
+        chunks = split_chunks(text, self.chunk_chars)
+        if len(chunks) > self.max_chunks:
+            logger.info(f"Текст из {len(chunks)} частей сокращен до первых {self.max_chunks}")
+            chunks = chunks[:self.max_chunks]
+        summaries = await asyncio.gather(*(
+            self._summarize(CHUNK_PROMPT.format(
+                part=f"часть {i} из {len(chunks)} сообщения" if len(chunks) > 1 else "сообщение", text=chunk
+            ))
+            for i, chunk in enumerate(chunks, 1)
+        ))
+        complete = all(summaries)
+        parts = [summary or shorten(chunk, self.max_chars) for summary, chunk in zip(summaries, chunks)]
+        combined = "\n".join(parts)
+        if len(parts) > 1 and len(combined) > self.max_chars:
+            reduced = await self._summarize(REDUCE_PROMPT.format(limit=self.max_chars, text=combined))
+            complete = complete and reduced is not None
+            combined = reduced or combined
+        result = shorten(combined, self.max_chars)
+
+        # Изложение с подстановкой начала текста не кешируется: при повторе GigaChat может ответить
+        if complete:
+            self._cache[key] = result
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return result, complete
+
+    async def _summarize(self, prompt: str) -> Optional[str]:
+        async with self._slots:
+            summary = await self.summarize(prompt)
+        if not summary or not summary.strip():
+            return None
+        return " ".join(summary.split())
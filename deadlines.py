@@ -0,0 +1,171 @@
+import heapq
+import re
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+WEEKDAY_STEMS = {
+    "понедельник": 0, "вторник": 1, "сред": 2, "четверг": 3, "пятниц": 4, "суббот": 5, "воскресень": 6
+}
+MONTHS = {
+    "января": 1, "февраля": 2, "марта": 3, "апреля": 4, "мая": 5, "июня": 6,
+    "июля": 7, "августа": 8, "сентября": 9, "октября": 10, "ноября": 11, "декабря": 12
+}
+
+# "15:30" или "в 11.30" ("10.06" без "в" - это дата)
+TIME_RE = re.compile(r"\b(\d{1,2}):(\d{2})\b|\bв\s+(\d{1,2})\.(\d{2})\b")
+# "до 18", "к 17 часам", "в 11 часов"
+HOUR_RE = re.compile(r"\b(?:до|к)\s+(\d{1,2})(?:\s*(?:ч|час(?:ам|ов|а)?)\b|\s*$)|\bв\s+(\d{1,2})\s*(?:ч|час(?:ов|а)?)\b")
+NUMERIC_DATE_RE = re.compile(r"\b(\d{1,2})[./](\d{1,2})(?:[./](\d{2,4}))?\b")
+TEXT_DATE_RE = re.compile(r"\b(\d{1,2})\s+(" + "|".join(MONTHS) + r")(?:\s+(\d{4}))?")
+WEEKDAY_RE = re.compile(r"\b(" + "|".join(WEEKDAY_STEMS) + r")[а-я]*")
+RELATIVE_DAY_RE = re.compile(r"\b(сегодня|послезавтра|завтра)\b")
+END_OF_RE = re.compile(r"\b(?:концу|конца)\s+(дня|недели|месяца)")
+WITHIN_RE = re.compile(r"\bв\s+течени[ея]\s+(?:(\d+)\s+)?(час|дн|день|недел)")
+
+
+def _at(day: datetime, hour: int, minute: int = 0) -> datetime:
+    return day.replace(hour=hour, minute=minute, second=0, microsecond=0)
+
+
+def parse_deadline(text: Optional[str], reference: datetime,
+                   default_time: Tuple[int, int] = (18, 0)) -> Optional[datetime]:
+    """
+    Перевод срока из свободного текста ("до пятницы", "к 15:00", "25.06", "2024-06-28T12:00",
+    "до конца недели", "в течение 2 дней") в момент времени.
+
+    reference - время постановки задачи (с часовым поясом); срок без времени
+    считается наступающим в default_time (часы, минуты). Возвращает None, если срок не распознан.
+    """
+    if not text:
+        return None
+    text = text.strip().lower().replace("ё", "е")
+    reference = reference.astimezone()
+
+    try:
+        parsed = datetime.fromisoformat(text)
+        if parsed.tzinfo is None:
+            parsed = parsed.replace(tzinfo=reference.tzinfo)
+        if len(text) <= 10:  # только дата
+            parsed = _at(parsed, *default_time)
+        return parsed
+    except ValueError:
+        pass
+
+    clock: Optional[Tuple[int, int]] = None
+    time_match = TIME_RE.search(text)
+    hour_match = HOUR_RE.search(text)
+    if time_match:
+        hours_str, minutes_str = time_match.group(1, 2) if time_match.group(1) else time_match.group(3, 4)
+        if int(hours_str) < 24 and int(minutes_str) < 60:
+            clock = (int(hours_str), int(minutes_str))
+        # "в 11.30" не должно читаться как дата ниже
+        text = text[:time_match.start()] + text[time_match.end():]
+    elif hour_match and int(hour_match.group(1) or hour_match.group(2)) < 24:
+        clock = (int(hour_match.group(1) or hour_match.group(2)), 0)
+    hour, minute = clock or default_time
+
+    day: Optional[datetime] = None
+    if match := NUMERIC_DATE_RE.search(text):
+        day_num, month = int(match.group(1)), int(match.group(2))
+        year = int(match.group(3)) if match.group(3) else reference.year
+        if year < 100:
+            year += 2000
+        try:
+            day = reference.replace(year=year, month=month, day=day_num)
+        except ValueError:
+            return None
+        if not match.group(3) and _at(day, hour, minute) < reference - timedelta(days=1):
+            day = day.replace(year=year + 1)
+    elif match := TEXT_DATE_RE.search(text):
+        year = int(match.group(3)) if match.group(3) else reference.year
+        try:
+            day = reference.replace(year=year, month=MONTHS[match.group(2)], day=int(match.group(1)))
+        except ValueError:
+            return None
+        if not match.group(3) and _at(day, hour, minute) < reference - timedelta(days=1):
+            day = day.replace(year=year + 1)
+    elif match := WEEKDAY_RE.search(text):
+        weekday = WEEKDAY_STEMS[match.group(1)]
+        # "до пятницы", сказанное в пятницу, - это следующая пятница
+        day = reference + timedelta(days=(weekday - reference.weekday()) % 7 or 7)
+    elif match := RELATIVE_DAY_RE.search(text):
+        day = reference + timedelta(days={"сегодня": 0, "завтра": 1, "послезавтра": 2}[match.group(1)])
+    elif match := END_OF_RE.search(text):
+        period = match.group(1)
+        if period == "дня":
+            day = reference
+        elif period == "недели":
+            day = reference + timedelta(days=(4 - reference.weekday()) % 7)
+        else:
+            next_month = (reference.replace(day=28) + timedelta(days=4)).replace(day=1)
+            day = next_month - timedelta(days=1)
+    elif match := WITHIN_RE.search(text):
+        amount = int(match.group(1) or 1)
+        unit = match.group(2)
+        if unit == "час":
+            return reference + timedelta(hours=amount)
+        return reference + timedelta(days=amount * (7 if unit == "недел" else 1))
+    elif clock:
+        # Только время: ближайшее такое время после постановки задачи
+        day = reference if _at(reference, hour, minute) > reference else reference + timedelta(days=1)
+
+    if day is None:
+        return None
+    return _at(day, hour, minute)
+
+
+class DeadlineIndex:
+    """
+    Очередь напоминаний о сроках: min-heap по времени напоминания.
+    Удаление ленивое - устаревшие записи (задача выполнена, удалена или срок
+    изменился) отбрасываются при извлечении, поэтому проверка не просматривает все задачи.
+    """
+
+    def __init__(self):
+        self._heap: List[Tuple[float, str]] = []
+        # id задачи -> (задача, актуальное время напоминания)
+        self.tasks: Dict[str, Tuple[Dict[str, Any], float]] = {}
+
+    def __len__(self) -> int:
+        return len(self.tasks)
+
+    def clear(self):
+        self._heap.clear()
+        self.tasks.clear()
+
+    def push(self, task: Dict[str, Any], remind_at: datetime):
+        remind_ts = remind_at.timestamp()
+        self.tasks[task['id']] = (task, remind_ts)
+        heapq.heappush(self._heap, (remind_ts, task['id']))
+
+    def discard(self, task_id: str):
+        self.tasks.pop(task_id, None)
+
+    def _current(self, remind_ts: float, task_id: str) -> Optional[Dict[str, Any]]:
+        """Задача записи кучи, если запись актуальна; неактуальные задачи убираются из индекса"""
+        entry = self.tasks.get(task_id)
+        if entry is None or entry[1] != remind_ts:
+            return None
+        task = entry[0]
+        if task.get('is_complete') or task.get('reminded_at'):
+            del self.tasks[task_id]
+            return None
+        return task
+
+    def next_due(self) -> Optional[float]:
+        """Время ближайшего напоминания (timestamp)"""
+        while self._heap and self._current(*self._heap[0]) is None:
+            heapq.heappop(self._heap)
+        return self._heap[0][0] if self._heap else None
+
+    def pop_due(self, now: datetime) -> List[Dict[str, Any]]:
+        """Задачи, время напоминания которых наступило"""
+        due = []
+        now_ts = now.timestamp()
+        while self._heap and self._heap[0][0] <= now_ts:
+            remind_ts, task_id = heapq.heappop(self._heap)
+            task = self._current(remind_ts, task_id)
+            if task is not None:
+                del self.tasks[task_id]
+                due.append(task)
+        return due
@@ -1,50 +1,81 @@
 import asyncio
 import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
 from typing import Optional
 from gigachat import GigaChat
 
 from config import CONFIG
+from metrics import LLM_ERRORS, LLM_LATENCY, LLM_REQUESTS, LLM_TOKENS
 
 logger = logging.getLogger(__name__)
 
 class GigaChatClient:
-    def __init__(self):
+    def __init__(self, max_workers: Optional[int] = None):
         self.config = CONFIG
+        # Собственный пул потоков для запросов (None - пул по умолчанию event loop)
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="gigachat") if max_workers else None
+        # Модель передается в каждом запросе, поэтому ее смена не требует нового клиента
+        self.model = self.config["bot"].get("gigachat_model", "GigaChat-2-Max")
         self.giga = GigaChat(
             scope='GIGACHAT_API_CORP',
             credentials=self.config["token"]["gigachat"],
-            verify_ssl_certs=False,
-            model="GigaChat-2-Max"
+            verify_ssl_certs=False
         )
+
+    def set_model(self, model: str):
+        """Смена модели при перезагрузке конфига (действует со следующего запроса)"""
+        if model != self.model:
+            logger.info(f"Модель GigaChat изменена: {self.model} -> {model}")
+            self.model = model
     
-    async def get_summary(self, prompt: str) -> Optional[str]:
+    async def get_summary(self, prompt: str, call_type: str = "other") -> Optional[str]:
         """
         Получение сводки от GigaChat
         
         Args:
             prompt: Промпт для создания сводки
+            call_type: Тип запроса для метрик (task_detection, completion_check, daily_summary, ...)
             
         Returns:
             Строка со сводкой или None в случае ошибки
         """
+        LLM_REQUESTS.inc(call_type=call_type)
+        started = time.perf_counter()
         try:
             # Создаем задачу для асинхронного выполнения
             loop = asyncio.get_event_loop()
             response = await loop.run_in_executor(
-                None, 
+                self.executor, 
                 self._make_request, 
                 prompt
             )
             
             if response and hasattr(response, 'choices') and response.choices:
+                self._record_usage(response, call_type)
                 return response.choices[0].message.content
             else:
+                LLM_ERRORS.inc(call_type=call_type)
                 logger.error("Пустой ответ от GigaChat")
                 return None
                 
         except Exception as e:
+            LLM_ERRORS.inc(call_type=call_type)
             logger.error(f"Ошибка при обращении к GigaChat: {e}")
             return None
+        finally:
+            LLM_LATENCY.observe(time.perf_counter() - started, call_type=call_type)
+
+    @staticmethod
+    def _record_usage(response, call_type: str):
+        """Учет токенов из ответа GigaChat"""
+        usage = getattr(response, 'usage', None)
+        if usage is None:
+            return
+        for kind in ('prompt_tokens', 'completion_tokens'):
+            tokens = getattr(usage, kind, None)
+            if tokens:
+                LLM_TOKENS.inc(tokens, call_type=call_type, kind=kind.split('_')[0])
     
     def _make_request(self, prompt: str):
         """
@@ -57,8 +88,11 @@ class GigaChatClient:
             Ответ от GigaChat
         """
         try:
-            # Используем метод chat с простой строкой
-            response = self.giga.chat(prompt)
+            # Модель указывается в запросе (см. set_model)
+            response = self.giga.chat({
+                "model": self.model,
+                "messages": [{"role": "user", "content": prompt}]
+            })
             return response
         except Exception as e:
             logger.error(f"Ошибка в синхронном запросе к GigaChat: {e}")
@@ -0,0 +1,66 @@
+import logging
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Deque, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class LatencyStats:
+    """Скользящее окно замеров задержки (в секундах) с перцентилями"""
+
+    def __init__(self, window: int = 1000):
+        self.samples: Deque[float] = deque(maxlen=window)
+        self.count = 0
+
+    def add(self, value: float):
+        self.samples.append(value)
+        self.count += 1
+
+    def percentile(self, q: float) -> Optional[float]:
+        if not self.samples:
+            return None
+        ordered = sorted(self.samples)
+        idx = min(len(ordered) - 1, int(round(q / 100 * (len(ordered) - 1))))
+        return ordered[idx]
+
+    def snapshot(self) -> Dict[str, Optional[float]]:
+        return {
+            'count': self.count,
+            'p50': self.percentile(50),
+            'p99': self.percentile(99),
+            'max': max(self.samples) if self.samples else None
+        }
+
+    def format(self) -> str:
+        snap = self.snapshot()
+        if not snap['count']:
+            return "нет данных"
+        return (f"n={snap['count']}, p50={snap['p50'] * 1000:.1f} мс, "
+                f"p99={snap['p99'] * 1000:.1f} мс, max={snap['max'] * 1000:.1f} мс")
+
+
+class PhaseTimer:
+    """Длительности фаз запуска; каждая фаза также попадает в метрику bot_startup_phase_seconds"""
+
+    def __init__(self):
+        self.phases: Dict[str, float] = {}
+
+    def record(self, name: str, seconds: float):
+        from metrics import STARTUP_PHASE_SECONDS
+
+        self.phases[name] = seconds
+        STARTUP_PHASE_SECONDS.set(seconds, phase=name)
+
+    @contextmanager
+    def phase(self, name: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - started)
+
+    def log(self, title: str):
+        timings = ", ".join(f"{name}={seconds * 1000:.0f} мс" for name, seconds in self.phases.items())
+        logger.info(f"{title}: {timings}")
@@ -0,0 +1,289 @@
+import logging
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from aiohttp import web
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+# Для задержек, измеренных по времени Telegram (message.date с точностью до секунды)
+COARSE_LATENCY_BUCKETS = (1, 2, 5, 10, 30, 60, 300, 900)
+SIZE_BUCKETS = (1_000, 5_000, 10_000, 50_000, 100_000, 500_000, 1_000_000, 5_000_000)
+
+LabelValues = Tuple[str, ...]
+LabelPairs = Sequence[Tuple[str, str]]
+# Строки значений по имени метрики (см. Registry.collect)
+Samples = Dict[str, List[str]]
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: LabelValues, extra: LabelPairs = ()) -> str:
+    pairs = list(zip(names, values))
+    pairs.extend(extra)
+    if not pairs:
+        return ""
+    escaped = (f'{k}="{_escape(v)}"' for k, v in pairs)
+    return "{" + ",".join(escaped) + "}"
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class Metric:
+    type_name = ""
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(labels)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        if set(labels) != set(self.label_names):
+            raise ValueError(f"Метрика {self.name} ожидает метки {self.label_names}, получено {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.label_names)
+
+    def samples(self, const_labels: LabelPairs = ()) -> List[str]:
+        """Строки значений; const_labels добавляются к каждой (например, номер шарда)"""
+        raise NotImplementedError
+
+    def render(self, extra_samples: Iterable[str] = ()) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type_name}"]
+        lines.extend(self.samples())
+        lines.extend(extra_samples)
+        return "\n".join(lines)
+
+
+class Counter(Metric):
+    type_name = "counter"
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = ()):
+        super().__init__(name, documentation, labels)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def samples(self, const_labels: LabelPairs = ()) -> List[str]:
+        with self._lock:
+            items = list(self._values.items())
+        return [
+            f"{self.name}{_format_labels(self.label_names, k, const_labels)} {_format_value(v)}" for k, v in items
+        ]
+
+
+class Gauge(Metric):
+    type_name = "gauge"
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = ()):
+        super().__init__(name, documentation, labels)
+        self._values: Dict[LabelValues, float] = {}
+        self._functions: Dict[LabelValues, Callable[[], float]] = {}
+
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def set_function(self, func: Callable[[], float], **labels):
+        """Значение вычисляется при каждом чтении метрик (например, размер очереди)"""
+        key = self._key(labels)
+        with self._lock:
+            self._functions[key] = func
+
+    def samples(self, const_labels: LabelPairs = ()) -> List[str]:
+        with self._lock:
+            values = dict(self._values)
+            functions = list(self._functions.items())
+        for key, func in functions:
+            try:
+                values[key] = func()
+            except Exception as e:
+                logger.error(f"Ошибка вычисления метрики {self.name}: {e}")
+        return [
+            f"{self.name}{_format_labels(self.label_names, k, const_labels)} {_format_value(v)}"
+            for k, v in values.items()
+        ]
+
+
+class Histogram(Metric):
+    type_name = "histogram"
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        # метки -> (счетчики по корзинам, сумма, количество)
+        self._values: Dict[LabelValues, Tuple[List[int], float, int]] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            counts, total, count = self._values.get(key) or ([0] * len(self.buckets), 0.0, 0)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+            self._values[key] = (counts, total + value, count + 1)
+
+    @contextmanager
+    def time(self, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def count(self, **labels) -> int:
+        entry = self._values.get(self._key(labels))
+        return entry[2] if entry else 0
+
+    def samples(self, const_labels: LabelPairs = ()) -> List[str]:
+        with self._lock:
+            items = [(k, list(c), s, n) for k, (c, s, n) in self._values.items()]
+        lines = []
+        for key, counts, total, count in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                labels = _format_labels(self.label_names, key, (*const_labels, ("le", _format_value(bound))))
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.label_names, key, const_labels)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+
+    def _register(self, metric: Metric) -> Metric:
+        if metric.name in self._metrics:
+            raise ValueError(f"Метрика {metric.name} уже зарегистрирована")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labels: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labels))
+
+    def gauge(self, name: str, documentation: str, labels: Sequence[str] = ()) -> Gauge:
+        return self._register(Gauge(name, documentation, labels))
+
+    def histogram(self, name: str, documentation: str, labels: Sequence[str] = (),
+                  buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, documentation, labels, buckets))
+
+    def collect(self, const_labels: LabelPairs = ()) -> Samples:
+        """Значения всех метрик с добавленными метками (для передачи из процесса-шарда)"""
+        return {name: metric.samples(const_labels) for name, metric in self._metrics.items()}
+
+    def render(self, extra: Iterable[Samples] = ()) -> str:
+        """Текстовый формат Prometheus; extra - значения из других процессов (см. collect)"""
+        extra = [samples for samples in extra if samples]
+        return "\n".join(
+            metric.render(line for samples in extra for line in samples.get(name, ()))
+            for name, metric in self._metrics.items()
+        ) + "\n"
+
+    def dump(self, path: str, extra: Iterable[Samples] = ()) -> bool:
+        """Запись метрик в файл (через временный файл и переименование)"""
+        try:
+            tmp_name = f"{path}.tmp"
+            with open(tmp_name, 'w', encoding='utf-8') as f:
+                f.write(self.render(extra))
+            os.replace(tmp_name, path)
+            return True
+        except OSError as e:
+            logger.error(f"Ошибка записи метрик в {path}: {e}")
+            return False
+
+
+REGISTRY = Registry()
+
+HANDLER_LATENCY = REGISTRY.histogram(
+    "bot_handler_latency_seconds", "Время обработки входящего сообщения")
+INGEST_LATENCY = REGISTRY.histogram(
+    "bot_ingest_latency_seconds", "Задержка от получения обновления webhook-сервером до сохранения")
+INGEST_DATE_LATENCY = REGISTRY.histogram(
+    "bot_ingest_date_latency_seconds", "Задержка от отправки сообщения до сохранения (по message.date, точность 1 с)",
+    ("mode",), COARSE_LATENCY_BUCKETS)
+MESSAGES_STORED = REGISTRY.counter(
+    "bot_messages_stored_total", "Сохранено сообщений")
+
+LLM_REQUESTS = REGISTRY.counter(
+    "bot_llm_requests_total", "Запросы к GigaChat", ("call_type",))
+LLM_ERRORS = REGISTRY.counter(
+    "bot_llm_errors_total", "Ошибки запросов к GigaChat", ("call_type",))
+LLM_LATENCY = REGISTRY.histogram(
+    "bot_llm_request_seconds", "Время запроса к GigaChat", ("call_type",))
+LLM_TOKENS = REGISTRY.counter(
+    "bot_llm_tokens_total", "Токены GigaChat", ("call_type", "kind"))
+
+STORAGE_SAVE_LATENCY = REGISTRY.histogram(
+    "bot_storage_save_seconds", "Время сохранения хранилища на диск", ("store",))
+STORAGE_LOAD_LATENCY = REGISTRY.histogram(
+    "bot_storage_load_seconds", "Время загрузки хранилища с диска", ("store",))
+STORAGE_BYTES_WRITTEN = REGISTRY.counter(
+    "bot_storage_bytes_written_total", "Записано байт в хранилище", ("store",))
+
+QUEUE_DEPTH = REGISTRY.gauge(
+    "bot_queue_depth", "Глубина очередей", ("queue",))
+SUMMARY_PROMPT_CHARS = REGISTRY.histogram(
+    "bot_summary_prompt_chars", "Размер промпта сводки в символах", ("summary",), SIZE_BUCKETS)
+EVENT_LOOP_LAG = REGISTRY.histogram(
+    "bot_event_loop_lag_seconds", "Задержка пробуждения event loop")
+STARTUP_PHASE_SECONDS = REGISTRY.gauge(
+    "bot_startup_phase_seconds", "Длительность фаз запуска", ("phase",))
+SCHEDULER_JOB_SECONDS = REGISTRY.histogram(
+    "bot_scheduler_job_seconds", "Длительность заданий планировщика", ("job",))
+SEARCH_LATENCY = REGISTRY.histogram(
+    "bot_search_seconds", "Время поиска по истории сообщений")
+CONFIG_RELOADS = REGISTRY.counter(
+    "bot_config_reloads_total", "Перезагрузки config.yaml", ("result",))
+
+
+class MetricsServer:
+    """Локальный HTTP-сервер с эндпоинтом /metrics"""
+
+    def __init__(self, listen: str = "127.0.0.1", port: int = 9108, registry: Registry = REGISTRY,
+                 collect_extra: Optional[Callable[[], Awaitable[List[Samples]]]] = None):
+        self.listen = listen
+        self.port = port
+        self.registry = registry
+        # Сбор метрик других процессов при каждом запросе (процессы-шарды)
+        self.collect_extra = collect_extra
+        self._runner: Optional[web.AppRunner] = None
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_get("/metrics", self._handle_metrics)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, self.listen, self.port).start()
+        logger.info(f"Метрики доступны на http://{self.listen}:{self.port}/metrics")
+
+    async def stop(self):
+        if self._runner:
+            await self._runner.cleanup()
+            self._runner = None
+
+    async def _handle_metrics(self, request: web.Request) -> web.Response:
+        extra = await self.collect_extra() if self.collect_extra is not None else []
+        return web.Response(text=self.registry.render(extra), content_type="text/plain", charset="utf-8")
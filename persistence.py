@@ -0,0 +1,94 @@
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Optional
+
+import storage_io
+
+logger = logging.getLogger(__name__)
+
+
+class DebouncedWriter:
+    """
+    Групповой коммит изменений на диск.
+
+    mark_dirty() только отмечает изменения; запись выполняется через delay секунд
+    после первого изменения или сразу после max_pending изменений. Снимок данных
+    берется в потоке event loop, сериализация и запись - в пуле storage_io;
+    коммиты одного writer выполняются строго по очереди. Если задан wait_ready,
+    коммит ждет его (например, окончания фоновой загрузки данных).
+    """
+
+    def __init__(self, name: str, snapshot: Callable[[], Any], write: Callable[[Any], bool],
+                 delay: float = 2.0, max_pending: int = 100,
+                 wait_ready: Optional[Callable[[], Awaitable]] = None):
+        self.name = name
+        self.wait_ready = wait_ready
+        self.snapshot = snapshot
+        self.write = write
+        self.delay = delay
+        self.max_pending = max_pending
+        self.pending = 0
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._lock: Optional[asyncio.Lock] = None
+        self._tasks = set()
+
+    def mark_dirty(self):
+        self.pending += 1
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # Вне event loop (например, при инициализации) пишем сразу
+            self._commit_sync()
+            return
+
+        if self.pending >= self.max_pending:
+            self._start_commit()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.delay, self._start_commit)
+
+    def _commit_sync(self) -> bool:
+        pending, self.pending = self.pending, 0
+        if self.write(self.snapshot()):
+            return True
+        self.pending += pending
+        return False
+
+    def _start_commit(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        task = asyncio.create_task(self.commit())
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def commit(self) -> bool:
+        """Запись накопленных изменений (если они есть)"""
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            if self.wait_ready is not None:
+                await self.wait_ready()
+            if not self.pending:
+                return True
+            pending, self.pending = self.pending, 0
+            data = self.snapshot()
+            loop = asyncio.get_running_loop()
+            try:
+                ok = await storage_io.run_io(self.write, data)
+            except Exception as e:
+                logger.error(f"Ошибка коммита {self.name}: {e}", exc_info=True)
+                ok = False
+
+            if not ok:
+                # Изменения не потеряны: повторим при следующем срабатывании таймера
+                self.pending += pending
+                if self._timer is None:
+                    self._timer = loop.call_later(self.delay, self._start_commit)
+            return ok
+
+    async def flush(self) -> bool:
+        """Немедленная запись (при остановке бота или по команде)"""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        return await self.commit()
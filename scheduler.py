@@ -0,0 +1,293 @@
+import asyncio
+import logging
+import os
+import time
+from abc import ABC, abstractmethod
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict, List, Optional, Set
+
+import storage_io
+from metrics import SCHEDULER_JOB_SECONDS
+
+logger = logging.getLogger(__name__)
+
+JobFunc = Callable[[], Awaitable[None]]
+
+WEEKDAYS = {
+    "monday": 0, "tuesday": 1, "wednesday": 2, "thursday": 3,
+    "friday": 4, "saturday": 5, "sunday": 6
+}
+
+
+def parse_time(value: str) -> tuple:
+    """Разбор строки времени формата HH:MM"""
+    hours, minutes = value.strip().split(":")
+    hours, minutes = int(hours), int(minutes)
+    if not (0 <= hours < 24 and 0 <= minutes < 60):
+        raise ValueError(f"Некорректное время: {value}")
+    return hours, minutes
+
+
+def parse_weekday(value) -> int:
+    """Разбор дня недели (номер 0-6 или английское название)"""
+    if isinstance(value, int):
+        if not 0 <= value <= 6:
+            raise ValueError(f"Некорректный день недели: {value}")
+        return value
+    try:
+        return WEEKDAYS[str(value).strip().lower()]
+    except KeyError:
+        raise ValueError(f"Некорректный день недели: {value}")
+
+
+class ScheduledJob(ABC):
+    """Задание планировщика с расчетом времени следующего запуска"""
+
+    def __init__(self, name: str, func: JobFunc, catch_up: bool = True):
+        self.name = name
+        self.func = func
+        self.catch_up = catch_up
+        self.last_run: Optional[datetime] = None
+        self.next_run: Optional[datetime] = None
+        self.last_duration: Optional[float] = None
+        self.runs = 0
+        self.failures = 0
+
+    @abstractmethod
+    def next_after(self, moment: datetime) -> datetime:
+        """Ближайший запуск строго после moment"""
+
+    @abstractmethod
+    def previous_before(self, moment: datetime) -> Optional[datetime]:
+        """Последний плановый запуск не позже moment"""
+
+    @abstractmethod
+    def describe(self) -> str:
+        """Описание расписания для логов"""
+
+
+class DailyJob(ScheduledJob):
+    def __init__(self, name: str, at: str, func: JobFunc, catch_up: bool = True):
+        super().__init__(name, func, catch_up)
+        self.at = at
+        self.hour, self.minute = parse_time(at)
+
+    def next_after(self, moment: datetime) -> datetime:
+        candidate = moment.replace(hour=self.hour, minute=self.minute, second=0, microsecond=0)
+        if candidate <= moment:
+            candidate += timedelta(days=1)
+        return candidate
+
+    def previous_before(self, moment: datetime) -> Optional[datetime]:
+        candidate = moment.replace(hour=self.hour, minute=self.minute, second=0, microsecond=0)
+        if candidate > moment:
+            candidate -= timedelta(days=1)
+        return candidate
+
+    def describe(self) -> str:
+        return f"ежедневно в {self.at}"
+
+
+class WeeklyJob(DailyJob):
+    def __init__(self, name: str, weekday, at: str, func: JobFunc, catch_up: bool = True):
+        super().__init__(name, at, func, catch_up)
+        self.weekday = parse_weekday(weekday)
+
+    def next_after(self, moment: datetime) -> datetime:
+        candidate = super().next_after(moment)
+        return candidate + timedelta(days=(self.weekday - candidate.weekday()) % 7)
+
+    def previous_before(self, moment: datetime) -> Optional[datetime]:
+        candidate = super().previous_before(moment)
+        return candidate - timedelta(days=(candidate.weekday() - self.weekday) % 7)
+
+    def describe(self) -> str:
+        return f"еженедельно (день {self.weekday}) в {self.at}"
+
+
+class IntervalJob(ScheduledJob):
+    def __init__(self, name: str, interval: timedelta, func: JobFunc, catch_up: bool = True):
+        super().__init__(name, func, catch_up)
+        if interval.total_seconds() <= 0:
+            raise ValueError("Интервал должен быть положительным")
+        self.interval = interval
+
+    def next_after(self, moment: datetime) -> datetime:
+        if self.last_run is None:
+            return moment + self.interval
+        candidate = self.last_run + self.interval
+        return candidate if candidate > moment else moment + self.interval
+
+    def previous_before(self, moment: datetime) -> Optional[datetime]:
+        if self.last_run is None:
+            return None
+        candidate = self.last_run + self.interval
+        return candidate if candidate <= moment else None
+
+    def describe(self) -> str:
+        return f"каждые {self.interval}"
+
+
+class AsyncScheduler:
+    """
+    Планировщик на asyncio: спит ровно до ближайшего запуска,
+    сохраняет время последних запусков и догоняет пропущенные после рестарта.
+
+    Задания выполняются отдельными задачами, поэтому долгая сводка не задерживает
+    напоминания и другие интервальные задания. Задания, назначенные на один и тот же
+    момент, выполняются друг за другом в порядке регистрации (очистка перед сводкой);
+    одно задание не запускается повторно, пока не завершился предыдущий запуск.
+    """
+
+    def __init__(self, state_file: str = 'scheduler_state.json'):
+        self.state_file = state_file
+        self.jobs: Dict[str, ScheduledJob] = {}
+        self._wakeup = asyncio.Event()
+        self._state = self._load_state()
+        # Ссылки на выполняющиеся задачи, чтобы их не собрал GC и их можно было отменить
+        self._running: Set[asyncio.Task] = set()
+        self._save_lock = asyncio.Lock()
+
+    def _load_state(self) -> Dict[str, Dict]:
+        """Загрузка времени последних запусков"""
+        try:
+            if os.path.exists(self.state_file):
+                data = storage_io.read_json_file(self.state_file)
+                if isinstance(data, dict):
+                    return data
+        except Exception as e:
+            logger.error(f"Ошибка загрузки состояния планировщика: {e}")
+        return {}
+
+    async def _save_state(self) -> bool:
+        """Сохранение времени последних запусков и длительностей"""
+        # Задания завершаются параллельно; блокировка не дает старому состоянию перезаписать новое
+        async with self._save_lock:
+            for job in self.jobs.values():
+                if job.last_run is not None:
+                    self._state[job.name] = {
+                        'last_run': job.last_run.isoformat(),
+                        'last_duration': job.last_duration,
+                        'runs': job.runs,
+                        'failures': job.failures
+                    }
+            try:
+                await storage_io.write_json(self.state_file, dict(self._state))
+                return True
+            except Exception as e:
+                logger.error(f"Ошибка сохранения состояния планировщика: {e}")
+                return False
+
+    def add_job(self, job: ScheduledJob) -> ScheduledJob:
+        """Регистрация задания (повторная регистрация заменяет старое)"""
+        saved = self._state.get(job.name, {})
+        if saved.get('last_run'):
+            try:
+                job.last_run = datetime.fromisoformat(saved['last_run'])
+            except ValueError:
+                logger.warning(f"Некорректное время запуска задания {job.name}: {saved['last_run']}")
+        job.runs = saved.get('runs', 0)
+        job.failures = saved.get('failures', 0)
+        job.last_duration = saved.get('last_duration')
+
+        now = datetime.now()
+        missed = job.previous_before(now)
+        if job.catch_up and job.last_run is not None and missed is not None and job.last_run < missed:
+            logger.info(f"Задание {job.name} пропустило запуск {missed.isoformat()}, будет выполнено сейчас")
+            # Время пропущенного запуска (уже наступило): задания одного момента догоняются вместе и по порядку
+            job.next_run = missed
+        else:
+            job.next_run = job.next_after(now)
+
+        self.jobs[job.name] = job
+        self._wakeup.set()
+        logger.info(f"Задание {job.name} запланировано {job.describe()}, следующий запуск: {job.next_run}")
+        return job
+
+    def every_day(self, name: str, at: str, func: JobFunc, catch_up: bool = True) -> ScheduledJob:
+        return self.add_job(DailyJob(name, at, func, catch_up))
+
+    def every_week(self, name: str, weekday, at: str, func: JobFunc, catch_up: bool = True) -> ScheduledJob:
+        return self.add_job(WeeklyJob(name, weekday, at, func, catch_up))
+
+    def every(self, name: str, interval: timedelta, func: JobFunc, catch_up: bool = True) -> ScheduledJob:
+        return self.add_job(IntervalJob(name, interval, func, catch_up))
+
+    def remove_job(self, name: str) -> bool:
+        if self.jobs.pop(name, None) is None:
+            return False
+        self._wakeup.set()
+        return True
+
+    def due_jobs(self, now: datetime) -> List[ScheduledJob]:
+        """Задания, время которых наступило, в порядке регистрации"""
+        return [job for job in self.jobs.values() if job.next_run is not None and job.next_run <= now]
+
+    async def run_job(self, job: ScheduledJob):
+        """Выполнение задания с замером длительности и логированием ошибок"""
+        started = time.perf_counter()
+        try:
+            await job.func()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            job.failures += 1
+            logger.error(f"Ошибка выполнения задания {job.name}: {e}", exc_info=True)
+        finally:
+            job.last_duration = time.perf_counter() - started
+            SCHEDULER_JOB_SECONDS.observe(job.last_duration, job=job.name)
+            job.runs += 1
+            job.last_run = datetime.now()
+            job.next_run = job.next_after(job.last_run)
+            self._wakeup.set()
+            logger.info(
+                f"Задание {job.name} выполнено за {job.last_duration:.3f} с, "
+                f"следующий запуск: {job.next_run}"
+            )
+            await self._save_state()
+
+    async def _run_group(self, jobs: List[ScheduledJob]):
+        for job in jobs:
+            await self.run_job(job)
+
+    def start_due(self, now: datetime) -> List[asyncio.Task]:
+        """Запуск наступивших заданий; задания одного момента - одной задачей, по очереди"""
+        groups: Dict[datetime, List[ScheduledJob]] = {}
+        for job in self.due_jobs(now):
+            groups.setdefault(job.next_run, []).append(job)
+            # Пока задание выполняется, следующий запуск не планируется (см. run_job)
+            job.next_run = None
+        started = []
+        for jobs in groups.values():
+            task = asyncio.create_task(self._run_group(jobs))
+            self._running.add(task)
+            task.add_done_callback(self._running.discard)
+            started.append(task)
+        return started
+
+    async def run(self):
+        """Основной цикл планировщика"""
+        try:
+            await self._loop()
+        finally:
+            for task in list(self._running):
+                task.cancel()
+            await asyncio.gather(*self._running, return_exceptions=True)
+
+    async def _loop(self):
+        while True:
+            self._wakeup.clear()
+            self.start_due(datetime.now())
+
+            pending = [job.next_run for job in self.jobs.values() if job.next_run is not None]
+            if not pending:
+                await self._wakeup.wait()
+                continue
+
+            delay = (min(pending) - datetime.now()).total_seconds()
+            if delay <= 0:
+                continue
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+            except asyncio.TimeoutError:
+                pass
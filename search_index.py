@@ -0,0 +1,147 @@
+import heapq
+import math
+import re
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+TOKEN_RE = re.compile(r"[0-9a-zа-яё]+", re.IGNORECASE)
+
+STOP_WORDS = {
+    "и", "в", "во", "не", "что", "он", "на", "я", "с", "со", "как", "а", "то", "все", "она", "так",
+    "его", "но", "да", "ты", "к", "у", "же", "вы", "за", "бы", "по", "только", "ее", "мне", "было",
+    "вот", "от", "меня", "еще", "нет", "о", "из", "ему", "ли", "если", "или", "ни", "быть", "был",
+    "до", "вас", "нибудь", "уже", "вам", "ведь", "там", "потом", "себя", "ничего", "ей", "они",
+    "тут", "где", "есть", "надо", "ней", "для", "мы", "тебя", "их", "чем", "была", "сам", "чтоб",
+    "без", "будто", "чего", "раз", "тоже", "себе", "под", "будет", "ж", "тогда", "кто", "этот",
+    "это", "эти", "этого", "той", "при", "the", "and", "of", "to", "in", "is", "a"
+}
+
+# Окончания для упрощенного стемминга (проверяются от длинных к коротким)
+RU_SUFFIXES = frozenset({
+    "ться", "тся", "ся", "сь",
+    "иями", "ями", "ами", "ого", "его", "ому", "ему", "ыми", "ими", "ешь", "ете", "ите", "йте",
+    "ой", "ей", "ий", "ый", "ая", "яя", "ое", "ее", "ые", "ие", "ов", "ев", "ах", "ях", "ом", "ем",
+    "ам", "ям", "ую", "юю", "ть", "ет", "ут", "ют", "ит", "ат", "ят", "ил", "ла", "ли", "ло", "те",
+    "а", "я", "о", "е", "ы", "и", "у", "ю", "ь", "й"
+})
+SUFFIX_LENGTHS = sorted({len(suffix) for suffix in RU_SUFFIXES}, reverse=True)
+MIN_STEM = 3
+
+
+@lru_cache(maxsize=200_000)
+def normalize_token(token: str) -> str:
+    """Нижний регистр, ё -> е и отсечение типичных русских окончаний"""
+    token = token.lower().replace("ё", "е")
+    if not ("а" <= token[0] <= "я"):
+        return token
+    # Возвратный постфикс и окончание снимаются по отдельности: "готовиться" -> "готов"
+    for _ in range(2):
+        for length in SUFFIX_LENGTHS:
+            if len(token) - length >= MIN_STEM and token[-length:] in RU_SUFFIXES:
+                token = token[:-length]
+                break
+        else:
+            break
+    return token
+
+
+def tokenize(text: str) -> List[str]:
+    """Токены для индекса: без стоп-слов, нормализованные"""
+    tokens = []
+    for raw in TOKEN_RE.findall((text or "").lower().replace("ё", "е")):
+        if raw in STOP_WORDS:
+            continue
+        tokens.append(normalize_token(raw))
+    return tokens
+
+
+class SearchIndex:
+    """
+    Инвертированный индекс в памяти по тексту, автору и топику сообщений.
+    Пополняется по одному сообщению, поиск - пересечение списков документов.
+    """
+
+    def __init__(self):
+        self.postings: Dict[str, Set[int]] = {}
+        self.docs: List[Dict] = []
+
+    def __len__(self) -> int:
+        return len(self.docs)
+
+    def clear(self):
+        self.postings.clear()
+        self.docs.clear()
+
+    def add(self, message: Dict):
+        author = message.get('username') or message.get('first_name') or ""
+        tokens = set(tokenize(message.get('text', "")))
+        tokens.update(tokenize(author))
+        tokens.update(tokenize(message.get('topic_name', "")))
+        if author:
+            tokens.add("@" + author.lower())
+        if not tokens:
+            return
+
+        doc_id = len(self.docs)
+        self.docs.append({
+            'chat_id': message.get('chat_id'),
+            'topic_name': message.get('topic_name', 'Основной чат'),
+            'author': author or (f"user_{message['user_id']}" if message.get('user_id') else "?"),
+            'timestamp': message.get('timestamp', ""),
+            'text': message.get('text', "")
+        })
+        for token in tokens:
+            self.postings.setdefault(token, set()).add(doc_id)
+
+    def add_many(self, messages: Iterable[Dict]):
+        for message in messages:
+            self.add(message)
+
+    def rebuild(self, messages_storage: Dict[int, Dict[int, List[Dict]]]):
+        self.clear()
+        for topics in messages_storage.values():
+            for messages in topics.values():
+                self.add_many(messages)
+
+    def _query_tokens(self, query: str) -> List[str]:
+        tokens = []
+        for raw in query.split():
+            if raw.startswith("@") and len(raw) > 1:
+                tokens.append(raw.lower())
+            else:
+                tokens.extend(tokenize(raw))
+        return list(dict.fromkeys(tokens))
+
+    def search(self, query: str, chat_id: Optional[int] = None, limit: int = 10) -> List[Dict]:
+        """
+        Поиск: сначала документы со всеми словами запроса, если таких нет - с любым.
+        Ранжирование по сумме IDF совпавших слов, затем по свежести.
+        """
+        tokens = self._query_tokens(query)
+        if not tokens:
+            return []
+
+        total = len(self.docs) or 1
+        postings = [(t, self.postings.get(t, set())) for t in tokens]
+        idf = {token: math.log(1 + total / (1 + len(docs))) for token, docs in postings}
+
+        # Фильтр по чату до выбора между пересечением и объединением: иначе совпадение
+        # всех слов в другом чате скрывает частичные совпадения в нужном
+        if chat_id is not None:
+            postings = [
+                (token, {doc_id for doc_id in docs if self.docs[doc_id]['chat_id'] == chat_id})
+                for token, docs in postings
+            ]
+        postings.sort(key=lambda item: len(item[1]))
+
+        candidates = set.intersection(*(docs for _, docs in postings)) if postings[0][1] else set()
+        if not candidates:
+            candidates = set().union(*(docs for _, docs in postings))
+
+        def rank(doc_id: int) -> Tuple[float, str]:
+            score = sum(idf[token] for token, docs in postings if doc_id in docs)
+            return score, self.docs[doc_id]['timestamp']
+
+        # Полная сортировка не нужна: отбираем только limit лучших
+        top = heapq.nlargest(limit, candidates, key=rank)
+        return [dict(self.docs[doc_id], score=rank(doc_id)[0]) for doc_id in top]
@@ -0,0 +1,461 @@
+import asyncio
+import itertools
+import json
+import logging
+import multiprocessing
+import os
+import signal
+import zlib
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from telegram import Bot, Update
+from telegram.ext import ContextTypes
+
+import storage_io
+from metrics import QUEUE_DEPTH, REGISTRY
+from task_archive import TaskArchive, archive_path
+from telegram_bot import TelegramSummaryBot, deferred_path
+
+logger = logging.getLogger(__name__)
+
+# Сбор метрик шардов не должен задерживать ответ /metrics дольше интервала опроса Prometheus
+SHARD_METRICS_TIMEOUT = 5
+
+
+def shard_for(chat_id: int, shards: int) -> int:
+    """Номер шарда для чата (стабилен между процессами и перезапусками)"""
+    return zlib.crc32(str(chat_id).encode()) % shards
+
+
+def shard_path(path: str, shard_id: int) -> str:
+    """history.json -> history.shard0.json"""
+    root, ext = os.path.splitext(path)
+    return f"{root}.shard{shard_id}{ext}"
+
+
+def partition_marker(history_file: str) -> str:
+    """history.json -> history.shards.json (признак завершенного разбиения)"""
+    root, ext = os.path.splitext(history_file)
+    return f"{root}.shards{ext}"
+
+
+def _read_archive_lines(path: str) -> List[bytes]:
+    if not os.path.exists(path):
+        return []
+    with open(path, 'rb') as f:
+        return [line for line in f if line.strip()]
+
+
+def _read_storage(history_file: str, tasks_file: str) -> Tuple[Dict[str, Dict], List[Dict], List[bytes], List[Dict]]:
+    """История, задачи, строки архива и очередь кандидатов в задачи одного набора файлов"""
+    history: Dict[str, Dict] = {}
+    if os.path.exists(history_file):
+        history = storage_io.read_json_file(history_file) or {}
+    tasks: List[Dict] = []
+    if os.path.exists(tasks_file):
+        tasks = storage_io.read_json_file(tasks_file) or []
+    deferred: List[Dict] = []
+    if os.path.exists(deferred_path(tasks_file)):
+        deferred = storage_io.read_json_file(deferred_path(tasks_file)) or []
+    return history, tasks, _read_archive_lines(archive_path(tasks_file)), deferred
+
+
+def _shard_files(history_file: str, tasks_file: str, shard_id: int) -> List[str]:
+    tasks = shard_path(tasks_file, shard_id)
+    return [
+        shard_path(history_file, shard_id), tasks, archive_path(tasks),
+        TaskArchive(archive_path(tasks)).index_path, deferred_path(tasks)
+    ]
+
+
+def _write_shards(history_file: str, tasks_file: str, shards: int, history: Dict[str, Dict], tasks: List[Dict],
+                  archive_lines: List[bytes], deferred: List[Dict]):
+    """Раскладка данных по файлам шардов (каждый файл пишется атомарно)"""
+    for shard_id in range(shards):
+        shard_tasks_file = shard_path(tasks_file, shard_id)
+        shard_history = {
+            chat_id: topics for chat_id, topics in history.items()
+            if shard_for(int(chat_id), shards) == shard_id
+        }
+        shard_tasks = [t for t in tasks if shard_for(int(t['chat_id']), shards) == shard_id]
+        shard_archive = [
+            line for line in archive_lines if shard_for(int(json.loads(line)['chat_id']), shards) == shard_id
+        ]
+        shard_deferred = [e for e in deferred if shard_for(int(e['message']['chat_id']), shards) == shard_id]
+        storage_io.atomic_write_json(shard_path(history_file, shard_id), shard_history)
+        storage_io.atomic_write_json(shard_tasks_file, shard_tasks)
+        archive = archive_path(shard_tasks_file)
+        if shard_archive or os.path.exists(archive):
+            storage_io.atomic_write_bytes(archive, b"".join(shard_archive))
+            # Смещения в старом индексе не соответствуют новому файлу - индекс строится при загрузке
+            index = TaskArchive(archive).index_path
+            if os.path.exists(index):
+                os.remove(index)
+        if shard_deferred or os.path.exists(deferred_path(shard_tasks_file)):
+            storage_io.atomic_write_json(deferred_path(shard_tasks_file), shard_deferred)
+
+
+def repartition_snapshot(history_file: str) -> str:
+    """history.json -> history.repartition.json (объединенные данные шардов на время перераспределения)"""
+    root, ext = os.path.splitext(history_file)
+    return f"{root}.repartition{ext}"
+
+
+def _repartition(history_file: str, tasks_file: str, partitioned: int, shards: int):
+    """
+    Перераспределение данных шардов при изменении их числа. Данные всех шардов сначала
+    объединяются в один файл (атомарно), и файлы шардов переписываются уже из него:
+    после сбоя посередине перераспределение продолжается из этого файла, а не из
+    частично переписанных шардов.
+    """
+    snapshot = repartition_snapshot(history_file)
+    if os.path.exists(snapshot):
+        data = storage_io.read_json_file(snapshot)
+    else:
+        history: Dict[str, Dict] = {}
+        tasks: List[Dict] = []
+        archive: Dict[str, str] = {}
+        deferred: List[Dict] = []
+        for shard_id in range(partitioned):
+            shard_history, shard_tasks, shard_archive, shard_deferred = _read_storage(
+                shard_path(history_file, shard_id), shard_path(tasks_file, shard_id)
+            )
+            history.update(shard_history)
+            tasks.extend(shard_tasks)
+            for line in shard_archive:
+                # В архиве действует последняя запись задачи
+                archive[json.loads(line)['id']] = line.decode('utf-8')
+            deferred.extend(shard_deferred)
+        data = {'history': history, 'tasks': tasks, 'archive': list(archive.values()), 'deferred': deferred}
+        storage_io.atomic_write_json(snapshot, data)
+
+    _write_shards(history_file, tasks_file, shards, data['history'], data['tasks'],
+                  [line.encode('utf-8') for line in data['archive']], data['deferred'])
+    for shard_id in range(shards, partitioned):
+        for path in _shard_files(history_file, tasks_file, shard_id):
+            if os.path.exists(path):
+                os.remove(path)
+
+
+def partition_storage(history_file: str, tasks_file: str, shards: int) -> bool:
+    """
+    Разбиение общих history.json, tasks.json, архива задач и очереди кандидатов
+    в задачи по шардам, а при изменении числа шардов - перераспределение файлов шардов
+    (блокирующая операция, вызывать через storage_io.run_io, до запуска процессов-шардов).
+
+    Каждый файл шарда пишется атомарно, признак завершения с числом шардов - последним;
+    после сбоя посередине разбиение повторяется: при первом разбиении из общих файлов,
+    которые не изменяются, при перераспределении - из объединенного файла repartition.
+    """
+    marker = partition_marker(history_file)
+    if os.path.exists(marker):
+        partitioned = storage_io.read_json_file(marker).get('shards')
+        if partitioned == shards:
+            if os.path.exists(repartition_snapshot(history_file)):
+                # Сбой после записи признака: перераспределение завершено, объединенный файл устарел
+                os.remove(repartition_snapshot(history_file))
+            return False
+        logger.info(f"Число шардов изменилось ({partitioned} -> {shards}), данные перераспределяются")
+        _repartition(history_file, tasks_file, partitioned, shards)
+        storage_io.atomic_write_json(marker, {'shards': shards})
+        os.remove(repartition_snapshot(history_file))
+        logger.info(f"История, задачи и архив задач перераспределены по {shards} шардам")
+        return True
+
+    shard_files = [path for i in range(shards) for path in (shard_path(history_file, i), shard_path(tasks_file, i))]
+    if all(os.path.exists(path) for path in shard_files):
+        # Разбиение выполнено до появления признака завершения - шарды уже работают со своими файлами
+        storage_io.atomic_write_json(marker, {'shards': shards})
+        return False
+
+    _write_shards(history_file, tasks_file, shards, *_read_storage(history_file, tasks_file))
+    storage_io.atomic_write_json(marker, {'shards': shards})
+    logger.info(f"История, задачи и архив задач разбиты на {shards} шардов")
+    return True
+
+
+async def _worker_call(bot: TelegramSummaryBot, shard_id: int, method: str, args: Tuple) -> Any:
+    """Вызовы, которые фронт может выполнять на шарде"""
+    if method == 'collect_metrics':
+        return REGISTRY.collect((('shard', str(shard_id)),))
+    if method == 'collect_analysis_data':
+        return await bot._collect_analysis_data(datetime.fromisoformat(args[0]), *args[1:])
+    if method == 'cleanup_old_tasks':
+        return await bot.cleanup_old_tasks()
+    if method == 'compact_history':
+        return await bot.compact_history()
+    if method == 'flush_storage':
+        return await bot.flush_storage()
+    if method == 'search_messages':
+        return await bot.search_messages(*args)
+    if method == 'process_deferred_tasks':
+        return await bot.process_deferred_tasks()
+    if method == 'collect_due_reminders':
+        return await bot.collect_due_reminders()
+    if method == 'reload_config':
+        return await bot.reload_config(args[0])
+    raise ValueError(f"Неизвестный вызов шарда: {method}")
+
+
+async def _handle_update(bot: TelegramSummaryBot, update: Update, semaphore: asyncio.Semaphore):
+    async with semaphore:
+        try:
+            await bot.handle_message(update, None)
+        except Exception as e:
+            logger.error(f"Ошибка обработки обновления {update.update_id}: {e}", exc_info=True)
+
+
+async def _handle_call(bot: TelegramSummaryBot, shard_id: int, outbox, request_id: int, method: str, args: Tuple):
+    try:
+        result = await _worker_call(bot, shard_id, method, args)
+        outbox.put(('result', request_id, shard_id, result, None))
+    except Exception as e:
+        logger.error(f"Шард {shard_id}: ошибка вызова {method}: {e}", exc_info=True)
+        outbox.put(('result', request_id, shard_id, None, str(e)))
+
+
+async def _worker_loop(shard_id: int, inbox, outbox, history_file: str, tasks_file: str):
+    bot = TelegramSummaryBot(history_file=history_file, tasks_file=tasks_file)
+    bot.start_background_load()
+    bot.register_queue_metrics()
+    telegram_bot = Bot(bot.bot_token)
+    llm_workers = bot.config["bot"].get("llm_workers") or 4
+    # Ограничиваем число одновременно обрабатываемых сообщений размером пула LLM;
+    # очередь семафора FIFO, поэтому порядок сохранения сообщений не меняется
+    semaphore = asyncio.Semaphore(llm_workers)
+    pending = set()
+    loop = asyncio.get_running_loop()
+    # Остановкой шардов управляет фронт; на SIGTERM шард сам завершается с записью данных
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    loop.add_signal_handler(signal.SIGTERM, inbox.put, ('stop',))
+    logger.info(f"Шард {shard_id} запущен (pid {os.getpid()})")
+
+    while True:
+        command = await loop.run_in_executor(None, inbox.get)
+        kind = command[0]
+
+        if kind == 'update':
+            update = Update.de_json(command[1], telegram_bot)
+            task = asyncio.create_task(_handle_update(bot, update, semaphore))
+            pending.add(task)
+            task.add_done_callback(pending.discard)
+
+        elif kind == 'call':
+            # Долгие вызовы (пакетная проверка задач, сбор данных для сводки) не задерживают прием сообщений
+            task = asyncio.create_task(_handle_call(bot, shard_id, outbox, *command[1:]))
+            pending.add(task)
+            task.add_done_callback(pending.discard)
+
+        elif kind == 'stop':
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+            await bot.content_extractor.stop()
+            bot.resolve_deferred_tasks()
+            await bot.flush_storage()
+            logger.info(f"Шард {shard_id} остановлен")
+            return
+
+
+def worker_main(shard_id: int, inbox, outbox, history_file: str, tasks_file: str):
+    """Точка входа процесса-шарда"""
+    asyncio.run(_worker_loop(shard_id, inbox, outbox, history_file, tasks_file))
+
+
+class ShardRouter:
+    """Запуск процессов-шардов и обмен с ними через очереди multiprocessing"""
+
+    def __init__(self, shards: int, history_file: str = 'history.json', tasks_file: str = 'tasks.json',
+                 call_timeout: float = 300, liveness_interval: float = 1.0):
+        self.shards = shards
+        self.call_timeout = call_timeout
+        self.liveness_interval = liveness_interval
+        self.history_file = history_file
+        self.tasks_file = tasks_file
+        self._context = multiprocessing.get_context('spawn')
+        self.inboxes = []
+        self.processes = []
+        self.outbox = None
+        self._request_ids = itertools.count(1)
+        self._pending: Dict[int, Tuple[asyncio.Future, Dict[int, Any]]] = {}
+        self._reader_task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        await storage_io.run_io(partition_storage, self.history_file, self.tasks_file, self.shards)
+        self.outbox = self._context.Queue()
+        for shard_id in range(self.shards):
+            inbox = self._context.Queue()
+            process = self._context.Process(
+                target=worker_main,
+                args=(shard_id, inbox, self.outbox,
+                      shard_path(self.history_file, shard_id), shard_path(self.tasks_file, shard_id)),
+                name=f"summary-shard-{shard_id}",
+                daemon=True
+            )
+            process.start()
+            self.inboxes.append(inbox)
+            self.processes.append(process)
+            QUEUE_DEPTH.set_function(inbox.qsize, queue=f'shard{shard_id}')
+        self._reader_task = asyncio.create_task(self._read_results())
+        logger.info(f"Запущено {self.shards} процессов-шардов")
+
+    def route(self, chat_id: int, update_data: Dict):
+        self.inboxes[shard_for(chat_id, self.shards)].put(('update', update_data))
+
+    async def call_all(self, method: str, *args, timeout: Optional[float] = None) -> List[Any]:
+        """
+        Вызов метода на всех шардах; результаты в порядке номеров шардов.
+        Вместо результата шарда, процесс которого завершился или не ответил
+        за timeout секунд, возвращается None (с записью в лог), чтобы сводки
+        и команды работали с остальными шардами, а не ждали бесконечно.
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + (self.call_timeout if timeout is None else timeout)
+        request_id = next(self._request_ids)
+        future = loop.create_future()
+        results: Dict[int, Any] = {}
+        self._pending[request_id] = (future, results)
+        for shard_id, inbox in enumerate(self.inboxes):
+            if self.processes[shard_id].is_alive():
+                inbox.put(('call', request_id, method, args))
+            else:
+                logger.error(f"Шард {shard_id} не работает, вызов {method} пропущен")
+                results[shard_id] = None
+        try:
+            while len(results) < self.shards:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    missing = sorted(set(range(self.shards)) - set(results))
+                    logger.error(f"Шарды {missing} не ответили на вызов {method} вовремя")
+                    break
+                try:
+                    await asyncio.wait_for(asyncio.shield(future), min(remaining, self.liveness_interval))
+                except asyncio.TimeoutError:
+                    for shard_id in set(range(self.shards)) - set(results):
+                        if not self.processes[shard_id].is_alive():
+                            logger.error(f"Шард {shard_id} завершился, не ответив на вызов {method}")
+                            results[shard_id] = None
+        finally:
+            self._pending.pop(request_id, None)
+        return [results.get(i) for i in range(self.shards)]
+
+    async def _read_results(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            message = await loop.run_in_executor(None, self.outbox.get)
+            if message is None:
+                return
+            _, request_id, shard_id, result, error = message
+            entry = self._pending.get(request_id)
+            if entry is None:
+                continue
+            future, results = entry
+            if error is not None:
+                logger.error(f"Шард {shard_id} вернул ошибку: {error}")
+            results[shard_id] = result
+            if len(results) == self.shards and not future.done():
+                future.set_result(results)
+
+    async def stop(self, timeout: float = 30):
+        for inbox in self.inboxes:
+            inbox.put(('stop',))
+        loop = asyncio.get_running_loop()
+        for process in self.processes:
+            await loop.run_in_executor(None, process.join, timeout)
+        if self.outbox is not None:
+            self.outbox.put(None)
+
+
+class ShardedFrontBot(TelegramSummaryBot):
+    """
+    Фронт-процесс: принимает обновления, выполняет команды и расписание,
+    сообщения распределяет по шардам по хешу chat_id
+    """
+
+    def __init__(self, shards: int):
+        super().__init__(load_storage=False)
+        self.router = ShardRouter(
+            shards, self.history_file, self.tasks_file,
+            call_timeout=self.config["bot"].get("shard_call_timeout", 300)
+        )
+
+    async def handle_message(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        if not update.message or not update.message.chat:
+            return
+        chat_id = update.message.chat.id
+        if chat_id not in self.groups_dict:
+            return
+        self.router.route(chat_id, update.to_dict())
+
+    async def _collect_analysis_data(self, time_threshold: datetime,
+                                     wait_digests: bool = False) -> Tuple[List[Dict], List[Dict], List[Dict]]:
+        """Объединение данных для сводки со всех шардов (изложения готовятся на шардах)"""
+        analysis_messages, completed_tasks, active_tasks = [], [], []
+        results = await self.router.call_all('collect_analysis_data', time_threshold.isoformat(), wait_digests)
+        for result in results:
+            if not result:
+                continue
+            messages, completed, active = result
+            analysis_messages.extend(messages)
+            completed_tasks.extend(completed)
+            active_tasks.extend(active)
+        analysis_messages.sort(key=lambda m: m['time'])
+        return analysis_messages, completed_tasks, active_tasks
+
+    async def cleanup_old_tasks(self):
+        results = await self.router.call_all('cleanup_old_tasks')
+        return all(results)
+
+    async def compact_history(self) -> int:
+        results = await self.router.call_all('compact_history')
+        return sum(r or 0 for r in results)
+
+    async def process_deferred_tasks(self) -> int:
+        results = await self.router.call_all('process_deferred_tasks')
+        return sum(r or 0 for r in results)
+
+    async def collect_due_reminders(self) -> List[Dict]:
+        """Напоминания собираются на шардах, отправляет их фронт"""
+        reminders = []
+        for result in await self.router.call_all('collect_due_reminders'):
+            reminders.extend(result or [])
+        return reminders
+
+    async def search_messages(self, query: str, chat_id: Optional[int] = None) -> List[Dict]:
+        """Поиск на всех шардах (IDF считается по шарду, поэтому ранжирование между шардами приблизительное)"""
+        found = []
+        for result in await self.router.call_all('search_messages', query, chat_id):
+            found.extend(result or [])
+        found.sort(key=lambda d: (d['score'], d['timestamp']), reverse=True)
+        return found[:self.search_results]
+
+    async def reload_config(self, new_config: Dict[str, Any]):
+        """Конфиг перечитывает фронт и передает шардам: группы и параметры задач меняются и там"""
+        await super().reload_config(new_config)
+        await self.router.call_all('reload_config', new_config)
+
+    def register_queue_metrics(self):
+        """Очереди кандидатов в задачи и кратких изложений есть только на шардах"""
+
+    async def collect_extra_metrics(self) -> List[Dict[str, List[str]]]:
+        """
+        Метрики шардов (обработка сообщений, GigaChat, хранилище) с меткой shard;
+        фронт отдает их вместе со своими. Не ответивший шард пропускается.
+        """
+        results = await self.router.call_all('collect_metrics', timeout=SHARD_METRICS_TIMEOUT)
+        return [samples for samples in results if samples]
+
+    async def _command_save(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Обработчик команды /save"""
+        if all(await self.router.call_all('flush_storage')):
+            await update.message.reply_text("✅ История сообщений сохранена")
+        else:
+            await update.message.reply_text("❌ Ошибка при сохранении")
+
+    async def start(self):
+        await self.router.start()
+        await super().start()
+
+    async def shutdown(self):
+        await super().shutdown()
+        await self.router.stop()
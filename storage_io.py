@@ -0,0 +1,154 @@
+import asyncio
+import json
+import logging
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Optional
+
+from metrics import EVENT_LOOP_LAG
+
+try:
+    import orjson
+except ImportError:  # orjson не обязателен, без него используется стандартный json
+    orjson = None
+
+logger = logging.getLogger(__name__)
+
+_executor: Optional[ThreadPoolExecutor] = None
+_workers = 4
+_use_orjson = orjson is not None
+
+
+def configure(workers: Optional[int] = None, json_backend: str = "auto"):
+    """
+    Настройка фасада: размер пула потоков ввода-вывода и сериализатор
+    (auto - orjson при наличии, orjson, json)
+    """
+    global _workers, _use_orjson, _executor
+    if workers:
+        _workers = workers
+        if _executor is not None:
+            _executor.shutdown(wait=False)
+            _executor = None
+    if json_backend == "orjson" and orjson is None:
+        logger.warning("orjson не установлен, используется стандартный json")
+    _use_orjson = orjson is not None and json_backend in ("auto", "orjson")
+
+
+def executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=_workers, thread_name_prefix="storage-io")
+    return _executor
+
+
+def dumps(data: Any) -> bytes:
+    """Сериализация в UTF-8 JSON с отступами (ключи-числа приводятся к строкам)"""
+    if _use_orjson:
+        return orjson.dumps(data, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS)
+    return json.dumps(data, ensure_ascii=False, indent=2).encode('utf-8')
+
+
+def loads(payload: bytes) -> Any:
+    if _use_orjson:
+        return orjson.loads(payload)
+    return json.loads(payload.decode('utf-8'))
+
+
+def atomic_write_bytes(path: str, payload: bytes) -> int:
+    """
+    Запись через временный файл + fsync + атомарное переименование.
+    При сбое на диске остается либо старая, либо новая версия файла целиком.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_name = tempfile.mkstemp(prefix=f".{os.path.basename(path)}.", suffix=".tmp", dir=directory)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(payload)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_name, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_name)
+        except OSError:
+            pass
+        raise
+
+    # fsync каталога фиксирует само переименование (на Windows недоступно)
+    try:
+        dir_fd = os.open(directory, os.O_RDONLY)
+        try:
+            os.fsync(dir_fd)
+        finally:
+            os.close(dir_fd)
+    except OSError:
+        pass
+    return len(payload)
+
+
+def atomic_write_json(path: str, data: Any) -> int:
+    """Атомарная запись JSON, возвращает число записанных байт"""
+    return atomic_write_bytes(path, dumps(data))
+
+
+def read_json_file(path: str) -> Any:
+    with open(path, 'rb') as f:
+        return loads(f.read())
+
+
+def append_line_file(path: str, line: str):
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write(line + "\n")
+
+
+async def run_io(func: Callable, *args) -> Any:
+    """Выполнение блокирующей операции с диском в пуле ввода-вывода"""
+    return await asyncio.get_running_loop().run_in_executor(executor(), func, *args)
+
+
+async def read_json(path: str) -> Any:
+    return await run_io(read_json_file, path)
+
+
+async def write_json(path: str, data: Any) -> int:
+    """Атомарная запись JSON вне event loop"""
+    return await run_io(atomic_write_json, path, data)
+
+
+async def append_line(path: str, line: str):
+    await run_io(append_line_file, path, line)
+
+
+class LoopLagMonitor:
+    """
+    Замер задержки event loop: задача засыпает на interval и проверяет,
+    насколько позже она проснулась. Блокировка дольше threshold логируется.
+    """
+
+    def __init__(self, interval: float = 0.1, threshold: float = 0.25):
+        self.interval = interval
+        self.threshold = threshold
+        self.max_lag = 0.0
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _run(self):
+        while True:
+            started = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, time.perf_counter() - started - self.interval)
+            EVENT_LOOP_LAG.observe(lag)
+            self.max_lag = max(self.max_lag, lag)
+            if lag > self.threshold:
+                logger.warning(f"Event loop был заблокирован на {lag * 1000:.0f} мс")
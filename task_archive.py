@@ -0,0 +1,161 @@
+import json
+import logging
+import os
+import threading
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional
+
+import storage_io
+
+logger = logging.getLogger(__name__)
+
+
+def archive_path(tasks_file: str) -> str:
+    """tasks.json -> tasks.archive.jsonl"""
+    return os.path.splitext(tasks_file)[0] + ".archive.jsonl"
+
+
+def task_time(task: Dict[str, Any], field: str) -> Optional[datetime]:
+    """Время из поля задачи (created_at, completed_at, archived_at) с часовым поясом"""
+    value = task.get(field)
+    if not value:
+        return None
+    try:
+        moment = datetime.fromisoformat(value)
+    except ValueError:
+        return None
+    return moment if moment.tzinfo else moment.replace(tzinfo=timezone.utc)
+
+
+class TaskArchive:
+    """
+    Архив задач на диске: JSONL-файл (одна задача на строку, только дозапись)
+    и индекс id -> смещение, статус и даты. Индекс держится в памяти и пишется
+    рядом с архивом; по нему запросы читают с диска только нужные строки.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.index_path = os.path.splitext(path)[0] + ".index.json"
+        self.index: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def __contains__(self, task_id: str) -> bool:
+        return task_id in self.index
+
+    @staticmethod
+    def _entry(task: Dict[str, Any], offset: int, length: int) -> Dict[str, Any]:
+        return {
+            'offset': offset,
+            'length': length,
+            'status': task.get('status'),
+            'chat_id': task.get('chat_id'),
+            'created_at': task.get('created_at'),
+            'completed_at': task.get('completed_at'),
+            'archived_at': task.get('archived_at')
+        }
+
+    def load(self):
+        """Загрузка индекса; если он отстает от архива (сбой между записями), индекс строится заново"""
+        archive_size = os.path.getsize(self.path) if os.path.exists(self.path) else 0
+        if os.path.exists(self.index_path):
+            try:
+                data = storage_io.read_json_file(self.index_path)
+                if data.get('size') == archive_size:
+                    with self._lock:
+                        self.index = data['tasks']
+                    return
+            except Exception as e:
+                logger.error(f"Ошибка чтения индекса архива {self.index_path}: {e}")
+        self._rebuild_index()
+
+    def _rebuild_index(self):
+        index = {}
+        if os.path.exists(self.path):
+            offset = 0
+            with open(self.path, 'rb') as f:
+                for line in f:
+                    try:
+                        task = json.loads(line)
+                        index[task['id']] = self._entry(task, offset, len(line))
+                    except (ValueError, KeyError):
+                        logger.warning(f"Пропущена поврежденная строка архива {self.path} (смещение {offset})")
+                    offset += len(line)
+            logger.info(f"Индекс архива задач перестроен: {len(index)} задач")
+        with self._lock:
+            self.index = index
+        self._write_index()
+
+    def _write_index(self):
+        size = os.path.getsize(self.path) if os.path.exists(self.path) else 0
+        with self._lock:
+            data = {'size': size, 'tasks': dict(self.index)}
+        storage_io.atomic_write_json(self.index_path, data)
+
+    def append(self, tasks: Iterable[Dict[str, Any]]) -> int:
+        """Дозапись задач в архив (блокирующая операция, вызывать через storage_io.run_io)"""
+        entries = {}
+        with open(self.path, 'ab') as f:
+            offset = f.tell()
+            for task in tasks:
+                line = (json.dumps(task, ensure_ascii=False) + "\n").encode('utf-8')
+                f.write(line)
+                entries[task['id']] = self._entry(task, offset, len(line))
+                offset += len(line)
+            f.flush()
+            os.fsync(f.fileno())
+        with self._lock:
+            self.index.update(entries)
+        self._write_index()
+        return len(entries)
+
+    def _read(self, entries: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        tasks = []
+        with open(self.path, 'rb') as f:
+            for entry in sorted(entries, key=lambda e: e['offset']):
+                f.seek(entry['offset'])
+                tasks.append(json.loads(f.read(entry['length'])))
+        return tasks
+
+    def get(self, task_id: str) -> Optional[Dict[str, Any]]:
+        entry = self.index.get(task_id)
+        return self._read([entry])[0] if entry else None
+
+    def query(self, status: Optional[str] = None, since: Optional[datetime] = None,
+              field: str = 'completed_at', chat_id: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Задачи архива по статусу, группе и времени поля field (с диска читаются только подходящие)"""
+        with self._lock:
+            candidates = list(self.index.values())
+        selected = []
+        for entry in candidates:
+            if status is not None and entry['status'] != status:
+                continue
+            if chat_id is not None and entry['chat_id'] != chat_id:
+                continue
+            if since is not None:
+                moment = task_time(entry, field)
+                if moment is None or moment <= since:
+                    continue
+            selected.append(entry)
+        return self._read(selected) if selected else []
+
+    def purge(self, before: datetime) -> int:
+        """Удаление из архива задач, заархивированных раньше before (перезапись файла)"""
+        with self._lock:
+            entries = list(self.index.items())
+        expired = {task_id for task_id, entry in entries
+                   if (task_time(entry, 'archived_at') or before) < before}
+        if not expired:
+            return 0
+
+        kept = [entry for task_id, entry in entries if task_id not in expired]
+        payload = b"".join(
+            (json.dumps(task, ensure_ascii=False) + "\n").encode('utf-8') for task in self._read(kept)
+        ) if kept else b""
+        storage_io.atomic_write_bytes(self.path, payload)
+        # Индекс строится по новому файлу, чтобы смещения соответствовали ему
+        self._rebuild_index()
+        return len(expired)
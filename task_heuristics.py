@@ -0,0 +1,125 @@
+import re
+from typing import Any, Dict, Optional
+
+# Минимальная уверенность, с которой сообщение вообще считается кандидатом в задачи
+MIN_CONFIDENCE = 0.35
+
+MENTION_RE = re.compile(r"@([A-Za-z0-9_]{3,32})")
+
+# Повелительное наклонение: распространенные глаголы рабочих поручений (ед. ч.)
+# и формы на -йте/-ите/-ьте (мн. ч. / вежливая форма)
+IMPERATIVES = (
+    "сделай", "подготовь", "проверь", "отправь", "пришли", "посмотри", "напиши", "позвони", "созвонись",
+    "обнови", "добавь", "исправь", "согласуй", "оформи", "заведи", "собери", "уточни", "передай", "закрой",
+    "запусти", "настрой", "разберись", "почини", "выложи", "скинь", "загрузи", "подпиши", "оплати",
+    "организуй", "назначь", "распечатай", "напомни", "ответь", "глянь", "изучи", "посчитай", "опиши",
+    "составь", "внеси", "занеси", "проконтролируй", "подключи", "удали", "перенеси", "дай", "найди"
+)
+IMPERATIVE_RE = re.compile(
+    r"\b(?:" + "|".join(IMPERATIVES) + r")(?:те)?\b|\b[а-яё]{3,}(?:йте|ите|ьте)\b", re.IGNORECASE
+)
+# Слова на -йте/-ите, которые не являются глаголами
+NOT_IMPERATIVE = {"сайте", "лайте", "вайте", "чайте", "давайте"}
+
+MODAL_RE = re.compile(
+    r"\b(?:нужно|надо|необходимо|требуется|прошу|просьба|поручаю|поручение|не\s+забудь(?:те)?|"
+    r"давай(?:те)?|должен|должна|должны|обязательно|todo)\b|\bзадача\s*:",
+    re.IGNORECASE
+)
+
+WEEKDAY_WORDS = (r"понедельник[ау]?|вторник[ау]?|сред[аыуе]|четверг[ау]?|пятниц[аыуе]|"
+                 r"суббот[аыуе]|воскресень[еяю]")
+MONTH_WORDS = r"января|февраля|марта|апреля|мая|июня|июля|августа|сентября|октября|ноября|декабря"
+DEADLINE_RE = re.compile(
+    r"\b(?:"
+    rf"(?:до|к|ко)\s+(?:{WEEKDAY_WORDS})"
+    r"|(?:до|к|в)\s+\d{1,2}[:.]\d{2}\b"
+    r"|(?:до|к)\s+\d{1,2}[./]\d{1,2}(?:[./]\d{2,4})?"
+    rf"|(?:до|к)\s+\d{{1,2}}\s+(?:{MONTH_WORDS})"
+    r"|(?:до|к)\s+(?:концу|конца)\s+(?:дня|недели|месяца|года)"
+    r"|(?:сегодня|завтра|послезавтра)(?:\s+(?:до|к)\s+\d{1,2}(?::\d{2})?)?"
+    r"|в\s+течени[ея]\s+(?:\d+\s+)?(?:час[аов]*|дн[еяй]{1,2}|недел[иьюя])"
+    r"|asap|срочно|дедлайн"
+    r")\b",
+    re.IGNORECASE
+)
+
+# Отчеты о выполнении и вопросы - скорее не новые поручения
+DONE_RE = re.compile(r"\b(?:готово|сделано|сделал[аи]?|выполнено|выполнил[аи]?|закрыл[аи]?|готов[аы]?)\b",
+                     re.IGNORECASE)
+# Точка перед цифрой (даты "25.06", время "11.30") предложение не завершает
+SENTENCE_RE = re.compile(r"(?:[^.!?\n]|\.(?=\d))+[.!?]?")
+
+WEIGHTS = {
+    'imperative_lead': 0.45,  # глагол в начале предложения (после обращения)
+    'imperative': 0.25,
+    'modal': 0.35,
+    'deadline': 0.3,
+    'mention': 0.15,
+    'done': -0.4,
+    'question': -0.15
+}
+
+
+def _is_imperative(match: re.Match) -> bool:
+    return match.group(0).lower() not in NOT_IMPERATIVE
+
+
+def _lead_position(sentence: str, start: int) -> bool:
+    """Глагол стоит первым словом предложения (не считая обращений и "пожалуйста")"""
+    head = MENTION_RE.sub("", sentence[:start])
+    head = re.sub(r"\b(?:пожалуйста|плиз|коллеги|ребята)\b|[,:\s-]", "", head, flags=re.IGNORECASE)
+    return not head or head[0].isupper() and head.isalpha() and len(head) < 20
+
+
+def extract_task(text: str, author: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    """
+    Эвристическое выделение поручения без LLM: обращения (@username), глаголы
+    в повелительном наклонении, модальные слова и сроки ("до пятницы", "к 15:00").
+
+    Возвращает словарь в формате ответа GigaChat (is_task, task_text, assignee,
+    deadline) с полем confidence от 0 до 1 или None, если признаков поручения нет.
+    """
+    text = (text or "").strip()
+    if len(text.split()) < 2:
+        return None
+
+    score = 0.0
+    task_sentence = None
+    for sentence_match in SENTENCE_RE.finditer(text):
+        sentence = sentence_match.group(0)
+        sentence_score = 0.0
+        for match in IMPERATIVE_RE.finditer(sentence):
+            if _is_imperative(match):
+                lead = _lead_position(sentence, match.start())
+                sentence_score = WEIGHTS['imperative_lead'] if lead else WEIGHTS['imperative']
+                break
+        if MODAL_RE.search(sentence):
+            sentence_score += WEIGHTS['modal']
+        if sentence_score > score:
+            score, task_sentence = sentence_score, sentence
+
+    deadline_match = DEADLINE_RE.search(text)
+    if deadline_match:
+        score += WEIGHTS['deadline']
+
+    mentions = [m for m in MENTION_RE.findall(text) if not author or m.lower() != author.lower()]
+    if mentions:
+        score += WEIGHTS['mention']
+    if DONE_RE.search(text):
+        score += WEIGHTS['done']
+    if text.endswith("?"):
+        score += WEIGHTS['question']
+
+    score = min(score, 1.0)
+    if score < MIN_CONFIDENCE or task_sentence is None:
+        return None
+
+    task_text = MENTION_RE.sub("", task_sentence).strip(" ,:-")
+    return {
+        'is_task': True,
+        'task_text': task_text[:200] or text[:200],
+        'assignee': f"@{mentions[0]}" if mentions else None,
+        'deadline': deadline_match.group(0) if deadline_match else None,
+        'confidence': round(score, 2)
+    }
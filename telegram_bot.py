@@ -2,17 +2,32 @@ import asyncio
 import json
 import logging
 import os
-import schedule
+import signal
 import time
 from datetime import datetime, timedelta, timezone
-from typing import Dict, List, Optional, Any
+from typing import Dict, List, Optional, Any, Tuple
 
 from telegram import Update
 from telegram.ext import Application, ContextTypes, CommandHandler, MessageHandler, filters
 from telegram.error import TelegramError
 
-from config import CONFIG
+from analytics import compute_activity, format_activity
+from content_digest import MEDIA_LABELS, ContentExtractor, decode_document, is_text_document, shorten
+from deadlines import DeadlineIndex, parse_deadline
 from gigachat_client import GigaChatClient
+from task_heuristics import extract_task
+import storage_io
+from config import CONFIG, CONFIG_LOAD_SECONDS, config_path
+from config_watcher import ConfigWatcher, merge_reloadable
+from latency import LatencyStats, PhaseTimer
+from metrics import (
+    HANDLER_LATENCY, INGEST_DATE_LATENCY, INGEST_LATENCY, MESSAGES_STORED, QUEUE_DEPTH, REGISTRY, STORAGE_BYTES_WRITTEN,
+    SEARCH_LATENCY, STORAGE_LOAD_LATENCY, STORAGE_SAVE_LATENCY, SUMMARY_PROMPT_CHARS, MetricsServer
+)
+from persistence import DebouncedWriter
+from scheduler import AsyncScheduler, parse_time
+from search_index import SearchIndex
+from task_archive import TaskArchive, archive_path, task_time
 
 # Настройка логирования
 logging.basicConfig(
@@ -21,46 +36,201 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+
+def deferred_path(tasks_file: str) -> str:
+    """tasks.json -> tasks.deferred.json (кандидаты в задачи, ожидающие проверки GigaChat)"""
+    return os.path.splitext(tasks_file)[0] + ".deferred.json"
+
 class TelegramSummaryBot:
-    def __init__(self):
+    def __init__(self, history_file: str = 'history.json', tasks_file: str = 'tasks.json',
+                 load_storage: bool = True, giga_client: Optional[GigaChatClient] = None):
+        init_started = time.perf_counter()
         self.config = CONFIG
+        self.history_file = history_file
+        self.tasks_file = tasks_file
         self.bot_token = self.config["token"]["telegram"]
-        self.groups_config = self.config.get("groups", [])
-        self.max_messages = self.config["bot"]["max_messages_per_group"]
-        self.summary_time = self.config["bot"]["summary_time"]
-        self.language = self.config["bot"]["summary_language"]
+        self.update_mode = self.config["bot"].get("update_mode", "polling")
+        self.webhook_config = self.config.get("webhook") or {}
+        self.metrics_config = self.config.get("metrics") or {}
+        # При ленивой загрузке история читается в фоне уже после запуска приема обновлений
+        self.lazy_load = load_storage and self.config["bot"].get("lazy_history_load", False)
+        self.startup = PhaseTimer()
+        self.startup.record("config", CONFIG_LOAD_SECONDS)
+        # Весь ввод-вывод хранилища выполняется в отдельном пуле потоков (см. storage_io)
+        storage_io.configure(self.config["bot"].get("io_workers"), self.config["bot"].get("json_backend", "auto"))
+        self.loop_lag_monitor = storage_io.LoopLagMonitor()
         
         self.messages_storage: Dict[int, Dict[int, List[Dict]]] = {}
         self.tasks_storage: List[Dict[str, Any]] = []
-        self.load_tasks_from_file()
-        self.groups_dict = {group["id"]: group for group in self.groups_config}
-        self.giga_client = GigaChatClient()
+        # Инвертированный индекс для /search, пополняется вместе с messages_storage
+        self.search_index = SearchIndex()
+        # Кандидаты в задачи, ожидающие пакетной проверки GigaChat (режим hybrid);
+        # очередь ограничена task_deferred_limit и сохраняется рядом с задачами
+        self.deferred_task_checks: List[Tuple[Dict[str, Any], Dict[str, Any]]] = []
+        self.deferred_file = deferred_path(tasks_file)
+        # Напоминания о сроках задач (очередь по времени напоминания, см. deadlines.DeadlineIndex)
+        self.deadline_index = DeadlineIndex()
+        # Хранение задач: открытые и недавно выполненные в памяти, остальные в архиве на диске
+        self.task_archive = TaskArchive(archive_path(tasks_file))
+        # Изменения копятся и записываются на диск группой (см. persistence.DebouncedWriter)
+        # Пока данные не загружены, запись на диск откладывается, иначе файл перезапишется неполными данными
+        self.tasks_ready = asyncio.Event()
+        self.history_ready = asyncio.Event()
+        self.history_writer = DebouncedWriter(
+            "history", self._history_snapshot, self._write_history,
+            wait_ready=self.history_ready.wait
+        )
+        self.tasks_writer = DebouncedWriter(
+            "tasks", self._tasks_snapshot, self._write_tasks,
+            wait_ready=self.tasks_ready.wait
+        )
+        self.deferred_writer = DebouncedWriter(
+            "deferred_tasks", self._deferred_snapshot, self._write_deferred,
+            wait_ready=self.tasks_ready.wait
+        )
+        # Краткие изложения длинных сообщений и документов готовятся в фоне (см. content_digest)
+        self.content_extractor = ContentExtractor(
+            self._summarize_content, workers=self.config["bot"].get("digest_workers", 2)
+        )
+        # Параметры, которые можно менять без перезапуска (см. reload_config)
+        self._apply_settings(self._read_settings(self.config))
+        self._stop_event: Optional[asyncio.Event] = None
+        self._load_task: Optional[asyncio.Task] = None
+        if load_storage and not self.lazy_load:
+            self.task_archive.load()
+            self.load_tasks_from_file()
+            self._merge_loaded_deferred(self._read_deferred())
+        self.giga_client = giga_client or GigaChatClient(max_workers=self.config["bot"].get("llm_workers"))
         self.application = None
+        self.scheduler = AsyncScheduler()
+        self.webhook_server = None
+        self.metrics_server = None
+        self.scheduler_task = None
+        self.config_watcher: Optional[ConfigWatcher] = None
+        # Зарегистрированные задания планировщика: имя -> параметры расписания
+        self._job_specs: Dict[str, Tuple] = {}
+        # Задержка "сообщение отправлено -> сохранено" (по message.date, точность до секунды)
+        self.ingest_latency = LatencyStats()
+        # Задержка "обновление получено webhook-сервером -> сохранено"
+        self.webhook_latency = LatencyStats()
 
         # Инициализация хранилища из JSON при запуске
-        self.load_history_from_file()
+        if load_storage and not self.lazy_load:
+            self.load_history_from_file()
+            with self.startup.phase("search_index"):
+                self.search_index.rebuild(self.messages_storage)
+        if not self.lazy_load:
+            self.tasks_ready.set()
+            self.history_ready.set()
+        self.startup.record("init", time.perf_counter() - init_started)
+
+    @staticmethod
+    def _read_settings(config: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Параметры из конфига (при запуске и при перезагрузке). Все значения
+        вычисляются здесь, до применения: ошибка не оставляет бота настроенным наполовину.
+        """
+        bot_config = config["bot"]
+        groups_config = config.get("groups") or []
+        groups_dict = {group["id"]: group for group in groups_config}
+        return {
+            'groups_config': groups_config,
+            'max_messages': bot_config["max_messages_per_group"],
+            'summary_time': bot_config["summary_time"],
+            'language': bot_config["summary_language"],
+            'weekly_summary_day': bot_config.get("weekly_summary_day"),
+            'weekly_summary_time': bot_config.get("weekly_summary_time"),
+            'history_retention_days': bot_config.get("history_retention_days"),
+            'search_results': bot_config.get("search_results", 10),
+            # Кто может искать по всем группам из личного чата с ботом
+            'admin_user_ids': set(bot_config.get("admin_user_ids") or []),
+            # Выявление задач: llm, hybrid или heuristic (см. analyze_for_tasks)
+            'task_detection': bot_config.get("task_detection", "llm"),
+            'task_confidence': bot_config.get("task_confidence", 0.7),
+            'task_batch_size': bot_config.get("task_batch_size", 20),
+            'task_deferred_limit': bot_config.get("task_deferred_limit", 500),
+            'reminders_enabled': bot_config.get("reminders", True),
+            'reminder_lead': timedelta(minutes=bot_config.get("reminder_lead_minutes", 60)),
+            'deadline_default_time': parse_time(bot_config.get("deadline_default_time", "18:00")),
+            'task_completed_days': bot_config.get("task_completed_days", 7),
+            'task_open_days': bot_config.get("task_open_days", 30),
+            'task_archive_days': bot_config.get("task_archive_days"),
+            'digest_threshold': bot_config.get("digest_threshold", 600),
+            'digest_wait': bot_config.get("digest_wait", 30),
+            'document_max_bytes': bot_config.get("document_max_bytes", 100_000),
+            'digest_chunk_chars': bot_config.get("digest_chunk_chars", 3000),
+            'digest_max_chars': bot_config.get("digest_max_chars", 400),
+            'loop_lag_threshold': bot_config.get("loop_lag_threshold", 0.25),
+            'commit_interval': bot_config.get("commit_interval", 2.0),
+            'commit_max_pending': bot_config.get("commit_max_pending", 100),
+            # Индексы маршрутизации строятся целиком и подменяются вместе с остальными параметрами,
+            # поэтому handle_message видит либо старую, либо новую конфигурацию групп
+            'groups_dict': groups_dict,
+            'topic_names': {
+                group_id: {topic["id"]: topic["name"] for topic in group.get("topics") or []}
+                for group_id, group in groups_dict.items()
+            }
+        }
 
-    def load_tasks_from_file(self, filename: str = 'tasks.json') -> bool:
+    def _apply_settings(self, settings: Dict[str, Any]):
+        """Применение параметров из _read_settings (без await, поэтому атомарно для event loop)"""
+        settings = dict(settings)
+        self.content_extractor.chunk_chars = settings.pop('digest_chunk_chars')
+        self.content_extractor.max_chars = settings.pop('digest_max_chars')
+        self.loop_lag_monitor.threshold = settings.pop('loop_lag_threshold')
+        commit_interval, commit_max_pending = settings.pop('commit_interval'), settings.pop('commit_max_pending')
+        for writer in (self.history_writer, self.tasks_writer, self.deferred_writer):
+            writer.delay = commit_interval
+            writer.max_pending = commit_max_pending
+        for name, value in settings.items():
+            setattr(self, name, value)
+
+    async def reload_config(self, new_config: Dict[str, Any]):
+        """Применение измененного config.yaml без перезапуска (вызывается ConfigWatcher)"""
+        merged = merge_reloadable(self.config, new_config)
+        settings = self._read_settings(merged)
+        old_groups = set(self.groups_dict)
+        old_lead, old_reminders = self.reminder_lead, self.reminders_enabled
+        old_detection = self.task_detection
+        # CONFIG меняется на месте: его же читают GigaChatClient и остальные модули
+        self.config.clear()
+        self.config.update(merged)
+        self._apply_settings(settings)
+
+        if (self.reminder_lead, self.reminders_enabled) != (old_lead, old_reminders):
+            self.deadline_index.clear()
+            for task in self.tasks_storage:
+                self._track_deadline(task)
+        if isinstance(self.giga_client, GigaChatClient):
+            self.giga_client.set_model(self.config["bot"].get("gigachat_model", "GigaChat-2-Max"))
+        if self.scheduler_task is not None:
+            self.schedule_tasks(catch_up=False)
+        if old_detection == "hybrid" and self.task_detection != "hybrid":
+            # Пакетная проверка больше не запускается: накопленные кандидаты принимаются по эвристике
+            resolved = self.resolve_deferred_tasks()
+            if resolved:
+                logger.info(f"Режим {self.task_detection}: принято по эвристике {resolved} отложенных задач")
+
+        added, removed = set(self.groups_dict) - old_groups, old_groups - set(self.groups_dict)
+        logger.info(
+            f"Конфиг перезагружен: групп {len(self.groups_dict)}"
+            + (f", добавлены {sorted(added)}" if added else "")
+            + (f", удалены {sorted(removed)}" if removed else "")
+        )
+
+    def load_tasks_from_file(self, filename: Optional[str] = None) -> bool:
         """Загрузка задач с сохранением существующих"""
+        filename = filename or self.tasks_file
         try:
             if os.path.exists(filename):
-                with open(filename, 'r', encoding='utf-8') as f:
-                    existing_tasks = json.load(f)
-                    
-                # Проверяем, что файл не пустой и содержит корректные данные
-                if isinstance(existing_tasks, list) and len(existing_tasks) > 0:
-                    # Объединяем с текущими задачами (без дубликатов)
-                    existing_ids = {t['id'] for t in self.tasks_storage}
-                    for task in existing_tasks:
-                        if task.get('id') and task['id'] not in existing_ids:
-                            self.tasks_storage.append(task)
+                with STORAGE_LOAD_LATENCY.time(store='tasks'):
+                    existing_tasks = storage_io.read_json_file(filename)
                     
-                    logger.info(f"Загружено {len(existing_tasks)} задач из файла (без дубликатов)")
+                if self._merge_loaded_tasks(existing_tasks):
                     return True
             
             # Если файла нет или он пустой, создаем новый
-            with open(filename, 'w', encoding='utf-8') as f:
-                json.dump(self.tasks_storage, f, ensure_ascii=False, indent=2)
+            storage_io.atomic_write_json(filename, self.tasks_storage)
                 
             return True
             
@@ -68,21 +238,45 @@ class TelegramSummaryBot:
             logger.error(f"Ошибка загрузки задач: {e}")
             return False
 
-    def save_tasks_to_json(self, filename: str = 'tasks.json') -> bool:
+    def _merge_loaded_tasks(self, existing_tasks: Any) -> bool:
+        """Объединение задач из файла с задачами в памяти"""
+        # Проверяем, что файл не пустой и содержит корректные данные
+        if isinstance(existing_tasks, list) and len(existing_tasks) > 0:
+            # Объединяем с текущими задачами (без дубликатов)
+            existing_ids = {t['id'] for t in self.tasks_storage}
+            for task in existing_tasks:
+                # Задача могла остаться в файле, если сбой произошел сразу после архивации
+                if task.get('id') and task['id'] not in existing_ids and task['id'] not in self.task_archive:
+                    self.tasks_storage.append(task)
+                    self._track_deadline(task)
+            
+            logger.info(f"Загружено {len(existing_tasks)} задач из файла (без дубликатов)")
+            return True
+        return False
+
+    def _tasks_snapshot(self) -> List[Dict[str, Any]]:
+        """Копия задач для записи в фоновом потоке"""
+        return [dict(task) for task in self.tasks_storage]
+
+    def _write_tasks(self, tasks: List[Dict[str, Any]], filename: Optional[str] = None) -> bool:
         """Сохраняет задачи в файл, обновляя существующие и добавляя новые"""
+        filename = filename or self.tasks_file
         try:
             # Загружаем текущие задачи из файла
             existing_tasks = []
             if os.path.exists(filename):
-                with open(filename, 'r', encoding='utf-8') as f:
-                    existing_tasks = json.load(f)
+                existing_tasks = storage_io.read_json_file(filename)
+            
+            # Заархивированные задачи из файла убираются
+            loaded_count = len(existing_tasks)
+            existing_tasks = [task for task in existing_tasks if task['id'] not in self.task_archive]
             
             # Создаем словарь для быстрого доступа к существующим задачам
             existing_tasks_dict = {task['id']: task for task in existing_tasks}
-            updated = False
+            updated = len(existing_tasks) != loaded_count
             
             # Обновляем или добавляем задачи
-            for task in self.tasks_storage:
+            for task in tasks:
                 if task['id'] in existing_tasks_dict:
                     # Если задача уже существует, проверяем нужно ли обновить
                     existing_task = existing_tasks_dict[task['id']]
@@ -90,7 +284,8 @@ class TelegramSummaryBot:
                     # Особенно важно проверить is_complete и другие ключевые поля
                     if (existing_task.get('is_complete') != task.get('is_complete') or
                         existing_task.get('status') != task.get('status') or
-                        existing_task.get('completed_at') != task.get('completed_at')):
+                        existing_task.get('completed_at') != task.get('completed_at') or
+                        existing_task.get('reminded_at') != task.get('reminded_at')):
                         
                         # Находим индекс задачи в списке и заменяем её
                         idx = next(i for i, t in enumerate(existing_tasks) if t['id'] == task['id'])
@@ -103,8 +298,9 @@ class TelegramSummaryBot:
             
             # Сохраняем только если были изменения
             if updated or not os.path.exists(filename):
-                with open(filename, 'w', encoding='utf-8') as f:
-                    json.dump(existing_tasks, f, ensure_ascii=False, indent=2)
+                with STORAGE_SAVE_LATENCY.time(store='tasks'):
+                    written = storage_io.atomic_write_json(filename, existing_tasks)
+                STORAGE_BYTES_WRITTEN.inc(written, store='tasks')
                 logger.info(f"Задачи сохранены в {filename} (обновлено: {updated})")
             
             return True
@@ -114,12 +310,44 @@ class TelegramSummaryBot:
             return False
         
     async def analyze_for_tasks(self, message_data: Dict[str, Any]) -> bool:
-        """Анализ сообщения на наличие задач через GigaChat с обработкой ошибок"""
+        """
+        Поиск поручения в сообщении. Режим задается bot.task_detection:
+        llm - GigaChat, при его ошибке эвристика; heuristic - только эвристика;
+        hybrid - эвристика первым проходом, неуверенные кандидаты проверяются GigaChat пакетом.
+        """
         try:
             if not message_data.get('text'):
                 return False
 
-            prompt = f"""Проанализируй текст сообщения на наличие задач/поручений. Ответь ТОЛЬКО в формате JSON:
+            guess = extract_task(message_data['text'], message_data.get('username'))
+            if self.task_detection == "heuristic":
+                return self._add_detected_task(message_data, guess, source='heuristic') if guess else False
+
+            if self.task_detection == "hybrid":
+                if guess is None:
+                    return False
+                if guess['confidence'] >= self.task_confidence:
+                    return self._add_detected_task(message_data, guess, source='heuristic')
+                return self._defer_task_check(message_data, guess)
+
+            task_data = await self._detect_task_llm(message_data)
+            if task_data is None:
+                # GigaChat недоступен или ответил некорректно - не теряем задачу
+                if guess:
+                    logger.info("GigaChat недоступен, задача определена эвристикой")
+                    return self._add_detected_task(message_data, guess, source='heuristic')
+                return False
+            if not task_data.get('is_task', False):
+                return False
+            return self._add_detected_task(message_data, task_data, source='llm')
+
+        except Exception as e:
+            logger.error(f"Критическая ошибка анализа задачи: {e}", exc_info=True)
+            return False
+
+    async def _detect_task_llm(self, message_data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Ответ GigaChat по одному сообщению; None - GigaChat недоступен или ответ не разобран"""
+        prompt = f"""Проанализируй текст сообщения на наличие задач/поручений. Ответь ТОЛЬКО в формате JSON:
             {{
                 "is_task": bool,
                 "task_text": str | null,
@@ -132,70 +360,226 @@ class TelegramSummaryBot:
             - Текст: "{message_data['text']}"
             """
 
-            response = await self.giga_client.get_summary(prompt)
-            if not response:
-                return False
+        response = await self.giga_client.get_summary(prompt, call_type="task_detection")
+        if not response:
+            return None
 
-            # Удаляем возможные некорректные символы перед парсингом
-            response = response.strip()
-            if not response.startswith('{') or not response.endswith('}'):
-                logger.error(f"Некорректный формат ответа: {response}")
-                return False
+        # Удаляем возможные некорректные символы перед парсингом
+        response = response.strip()
+        if not response.startswith('{') or not response.endswith('}'):
+            logger.error(f"Некорректный формат ответа: {response}")
+            return None
 
+        try:
+            task_data = json.loads(response)
+        except json.JSONDecodeError as e:
+            logger.error(f"Ошибка парсинга JSON: {e}\nОтвет: {response}")
+            return None
+
+        return task_data if isinstance(task_data, dict) else None
+
+    def _add_detected_task(self, message_data: Dict[str, Any], task_data: Dict[str, Any], source: str) -> bool:
+        """Создание задачи по ответу GigaChat или эвристики"""
+        task = {
+            'id': f"task_{int(datetime.now().timestamp())}_{message_data['id']}",
+            'created_at': message_data['timestamp'],
+            'author': message_data['username'] or 'Unknown',
+            'text': task_data.get('task_text', 'Не указано'),
+            'assignee': task_data.get('assignee'),
+            'deadline': task_data.get('deadline'),
+            'status': 'new',
+            'is_complete': False,  # Добавляем явно
+            'source': source,
+            'source_msg_id': message_data['id'],
+            'chat_id': message_data['chat_id'],
+            'topic_id': message_data['topic_id']
+        }
+        if 'confidence' in task_data:
+            task['confidence'] = task_data['confidence']
+
+        # Валидация обязательных полей
+        if not task['text'] or task['text'] == 'Не указано':
+            return False
+
+        self.tasks_storage.append(task)
+        self._track_deadline(task)
+        self.tasks_writer.mark_dirty()
+        logger.info(f"Выявлена новая задача: {task}")
+        return True
+
+    def _track_deadline(self, task: Dict[str, Any]):
+        """Разбор срока задачи в deadline_at и постановка напоминания в очередь"""
+        if task.get('is_complete'):
+            return
+        if not task.get('deadline_at'):
             try:
-                task_data = json.loads(response)
-            except json.JSONDecodeError as e:
-                logger.error(f"Ошибка парсинга JSON: {e}\nОтвет: {response}")
-                return False
+                created = datetime.fromisoformat(task['created_at'])
+                if created.tzinfo is None:
+                    created = created.replace(tzinfo=timezone.utc)
+            except (KeyError, ValueError):
+                return
+            deadline_at = parse_deadline(task.get('deadline'), created, self.deadline_default_time)
+            if deadline_at is None:
+                return
+            task['deadline_at'] = deadline_at.isoformat()
+
+        if not self.reminders_enabled or task.get('reminded_at'):
+            return
+        deadline_at = datetime.fromisoformat(task['deadline_at'])
+        # О просроченных задачах (например, после долгого простоя) не напоминаем
+        if deadline_at > datetime.now(timezone.utc):
+            self.deadline_index.push(task, deadline_at - self.reminder_lead)
+
+    async def collect_due_reminders(self) -> List[Dict[str, Any]]:
+        """Напоминания, время которых наступило (задачи помечаются reminded_at)"""
+        await self.tasks_ready.wait()
+        now = datetime.now(timezone.utc)
+        reminders = []
+        for task in self.deadline_index.pop_due(now):
+            task['reminded_at'] = now.isoformat()
+            deadline_at = datetime.fromisoformat(task['deadline_at']).astimezone()
+            text = f"⏰ Напоминание о сроке\n{task['text']}\nСрок: {deadline_at.strftime('%d.%m %H:%M')}"
+            if task.get('assignee'):
+                text += f"\nОтветственный: {task['assignee']}"
+            reminders.append({'chat_id': task['chat_id'], 'topic_id': task.get('topic_id'), 'text': text})
+        if reminders:
+            self.tasks_writer.mark_dirty()
+        return reminders
+
+    async def send_due_reminders(self):
+        """Отправка напоминаний в топик, где была поставлена задача"""
+        for reminder in await self.collect_due_reminders():
+            try:
+                await self.application.bot.send_message(
+                    chat_id=reminder['chat_id'],
+                    message_thread_id=reminder['topic_id'] or None,
+                    text=reminder['text'],
+                    parse_mode=None
+                )
+            except Exception as e:
+                logger.error(f"Ошибка отправки напоминания в {reminder['chat_id']}: {e}")
+
+    def _defer_task_check(self, message_data: Dict[str, Any], guess: Dict[str, Any]) -> bool:
+        """
+        Постановка кандидата в очередь пакетной проверки. Если очередь заполнена,
+        самый старый кандидат принимается по эвристике (возвращает, добавлена ли задача)
+        """
+        self.deferred_task_checks.append((message_data, guess))
+        added = False
+        while len(self.deferred_task_checks) > self.task_deferred_limit:
+            oldest_message, oldest_guess = self.deferred_task_checks.pop(0)
+            added |= self._add_detected_task(oldest_message, oldest_guess, source='heuristic')
+        self.deferred_writer.mark_dirty()
+        return added
+
+    async def process_deferred_tasks(self) -> int:
+        """
+        Пакетная проверка отложенных кандидатов (режим hybrid): один запрос к GigaChat
+        на task_batch_size сообщений. Если GigaChat недоступен, пакет возвращается в начало
+        очереди; кандидаты, на которые GigaChat не ответил, принимаются по эвристике.
+        """
+        added = 0
+        while self.deferred_task_checks:
+            # Пакет забирается из очереди до запроса: пока ждем ответ, очередь может меняться
+            batch = self.deferred_task_checks[:self.task_batch_size]
+            del self.deferred_task_checks[:len(batch)]
+            try:
+                results = await self._detect_tasks_batch([message_data for message_data, _ in batch])
+            except BaseException:
+                # Отмена при остановке (или ошибка) - пакет возвращается, чтобы его приняли
+                # resolve_deferred_tasks и запись очереди на диск
+                self.deferred_task_checks[:0] = batch
+                raise
+            if results is None:
+                self.deferred_task_checks[:0] = batch
+                logger.warning(f"Пакетная проверка задач не удалась, в очереди {len(self.deferred_task_checks)}")
+                break
+            for (message_data, guess), task_data in zip(batch, results):
+                if task_data is None:
+                    added += self._add_detected_task(message_data, guess, source='heuristic')
+                elif task_data.get('is_task'):
+                    added += self._add_detected_task(message_data, task_data, source='llm')
+            self.deferred_writer.mark_dirty()
+        if added:
+            logger.info(f"Пакетная проверка: добавлено задач: {added}")
+        return added
+
+    async def _detect_tasks_batch(self, messages: List[Dict[str, Any]]) -> Optional[List[Optional[Dict]]]:
+        """Ответы GigaChat по списку сообщений в том же порядке; None - запрос не удался"""
+        numbered = "\n".join(
+            f"{i}. Автор: {m['username']}. Текст: \"{m['text']}\"" for i, m in enumerate(messages, 1)
+        )
+        prompt = f"""Проанализируй каждое сообщение на наличие задач/поручений. Ответь ТОЛЬКО JSON-массивом,
+            по одному объекту на сообщение:
+            [{{"n": int, "is_task": bool, "task_text": str | null, "assignee": str | null, "deadline": str | null}}]
 
-            if not isinstance(task_data, dict) or not task_data.get('is_task', False):
-                return False
+            Сообщения:
+            {numbered}
+            """
 
-            # Создаем новую задачу
-            task = {
-                'id': f"task_{int(datetime.now().timestamp())}",
-                'created_at': message_data['timestamp'],
-                'author': message_data['username'] or 'Unknown',
-                'text': task_data.get('task_text', 'Не указано'),
-                'assignee': task_data.get('assignee'),
-                'deadline': task_data.get('deadline'),
-                'status': 'new',
-                'is_complete': False,  # Добавляем явно
-                'source_msg_id': message_data['id'],
-                'chat_id': message_data['chat_id'],
-                'topic_id': message_data['topic_id']
-            }
+        response = await self.giga_client.get_summary(prompt, call_type="task_batch")
+        if not response:
+            return None
+        response = response.strip()
+        try:
+            items = json.loads(response[response.index('['):response.rindex(']') + 1])
+        except ValueError as e:
+            logger.error(f"Ошибка парсинга пакетного ответа: {e}\nОтвет: {response}")
+            return None
 
-            # Валидация обязательных полей
-            if not task['text'] or task['text'] == 'Не указано':
-                return False
+        by_number = {item.get('n'): item for item in items if isinstance(item, dict)}
+        return [by_number.get(i) for i in range(1, len(messages) + 1)]
 
-            self.tasks_storage.append(task)
-            self.save_tasks_to_json()
-            logger.info(f"Выявлена новая задача: {task}")
-            return True
+    def resolve_deferred_tasks(self) -> int:
+        """При остановке непроверенные кандидаты принимаются по эвристике, чтобы не потерять задачи"""
+        added = 0
+        for message_data, guess in self.deferred_task_checks:
+            added += self._add_detected_task(message_data, guess, source='heuristic')
+        if self.deferred_task_checks:
+            self.deferred_task_checks.clear()
+            self.deferred_writer.mark_dirty()
+        return added
 
+    def _deferred_snapshot(self) -> List[Dict[str, Any]]:
+        return [{'message': dict(message_data), 'guess': guess} for message_data, guess in self.deferred_task_checks]
+
+    def _write_deferred(self, entries: List[Dict[str, Any]]) -> bool:
+        """Сохранение очереди кандидатов, чтобы после сбоя они не потерялись"""
+        try:
+            storage_io.atomic_write_json(self.deferred_file, entries)
+            return True
         except Exception as e:
-            logger.error(f"Критическая ошибка анализа задачи: {e}", exc_info=True)
+            logger.error(f"Ошибка сохранения очереди кандидатов в задачи: {e}")
             return False
 
-    def load_history_from_file(self, filename: str = 'history.json') -> int:
+    def _read_deferred(self) -> Any:
+        try:
+            if os.path.exists(self.deferred_file):
+                return storage_io.read_json_file(self.deferred_file)
+        except Exception as e:
+            logger.error(f"Ошибка загрузки очереди кандидатов в задачи: {e}")
+        return []
+
+    def _merge_loaded_deferred(self, entries: Any):
+        """Кандидаты, не проверенные до остановки (сбоя), возвращаются в очередь"""
+        if not isinstance(entries, list) or not entries:
+            return
+        loaded = [
+            (entry['message'], entry['guess']) for entry in entries
+            if isinstance(entry, dict) and isinstance(entry.get('message'), dict) and isinstance(entry.get('guess'), dict)
+        ]
+        self.deferred_task_checks[:0] = loaded
+        logger.info(f"Загружено {len(loaded)} кандидатов в задачи, ожидающих проверки")
+
+    def load_history_from_file(self, filename: Optional[str] = None) -> int:
         """Загрузка всех сообщений из JSON файла"""
+        filename = filename or self.history_file
         try:
             if os.path.exists(filename):
-                with open(filename, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                
-                total = 0
-                for chat_id_str, topics in data.items():
-                    chat_id = int(chat_id_str)
-                    self.messages_storage[chat_id] = {}
-                    
-                    for topic_id_str, messages in topics.items():
-                        topic_id = int(topic_id_str)
-                        self.messages_storage[chat_id][topic_id] = messages
-                        total += len(messages)
+                with STORAGE_LOAD_LATENCY.time(store='history'):
+                    data = storage_io.read_json_file(filename)
                 
+                total = self._merge_loaded_history(data)
                 logger.info(f"Загружено {total} сообщений из {filename}")
                 return total
             return 0
@@ -203,11 +587,146 @@ class TelegramSummaryBot:
             logger.error(f"Ошибка загрузки из {filename}: {e}")
             return 0
 
-    def save_messages_to_json(self, filename: str = 'history.json') -> bool:
+    def _merge_loaded_history(self, data: Dict[str, Dict[str, List[Dict]]]) -> int:
+        """
+        Добавление сообщений из файла в хранилище. Сообщения, полученные
+        во время фоновой загрузки, остаются после загруженных.
+        """
+        total = 0
+        for chat_id_str, topics in data.items():
+            chat_id = int(chat_id_str)
+            chat_storage = self.messages_storage.setdefault(chat_id, {})
+            
+            for topic_id_str, messages in topics.items():
+                topic_id = int(topic_id_str)
+                chat_storage[topic_id] = messages + chat_storage.get(topic_id, [])
+                total += len(messages)
+                self._queue_missing_digests(messages)
+        return total
+
+    def _queue_missing_digests(self, messages: List[Dict[str, Any]]):
+        """
+        Длинные сообщения за последнюю неделю без краткого изложения (остановка
+        до его готовности, ошибка GigaChat - тогда есть только digest_partial,
+        или история до появления изложений) ставятся в очередь заново
+        """
+        week_ago = datetime.now(timezone.utc) - timedelta(days=7)
+        for message in messages:
+            if message.get('digest') or len(message.get('text') or "") <= self.digest_threshold:
+                continue
+            try:
+                moment = datetime.fromisoformat(message['timestamp'])
+            except (KeyError, ValueError):
+                continue
+            if (moment if moment.tzinfo else moment.replace(tzinfo=timezone.utc)) > week_ago:
+                self._queue_digest(message)
+
+    def _queue_digest(self, message: Dict[str, Any], document: Optional[Any] = None):
+        """Постановка сообщения в очередь кратких изложений"""
+        # Ключи задаются сразу: запись истории в другом потоке не должна видеть изменение размера словаря
+        message['digest'] = None
+        message.setdefault('digest_partial', None)
+        load_document = (lambda: self._download_document(document)) if document is not None else None
+        self.content_extractor.submit(message, load_document, on_done=lambda _: self.history_writer.mark_dirty())
+
+    @staticmethod
+    async def _download_document(document) -> str:
+        file = await document.get_file()
+        return decode_document(bytes(await file.download_as_bytearray()))
+
+    async def _summarize_content(self, prompt: str) -> Optional[str]:
+        return await self.giga_client.get_summary(prompt, call_type="digest")
+
+    async def load_storage_async(self):
+        """Фоновая загрузка задач и истории в пуле ввода-вывода"""
+        started = time.perf_counter()
+        try:
+            await storage_io.run_io(self.task_archive.load)
+            if os.path.exists(self.tasks_file):
+                with STORAGE_LOAD_LATENCY.time(store='tasks'):
+                    existing_tasks = await storage_io.read_json(self.tasks_file)
+                self._merge_loaded_tasks(existing_tasks)
+            else:
+                await storage_io.write_json(self.tasks_file, self.tasks_storage)
+            self._merge_loaded_deferred(await storage_io.run_io(self._read_deferred))
+        except Exception as e:
+            logger.error(f"Ошибка загрузки задач: {e}")
+        finally:
+            self.tasks_ready.set()
+            self.startup.record("tasks_load", time.perf_counter() - started)
+
+        started = time.perf_counter()
+        data = {}
+        try:
+            if os.path.exists(self.history_file):
+                with STORAGE_LOAD_LATENCY.time(store='history'):
+                    data = await storage_io.read_json(self.history_file)
+                total = self._merge_loaded_history(data)
+                logger.info(f"Загружено {total} сообщений из {self.history_file} (в фоне)")
+        except Exception as e:
+            logger.error(f"Ошибка загрузки из {self.history_file}: {e}")
+        finally:
+            self.history_ready.set()
+            self.startup.record("history_load", time.perf_counter() - started)
+
+        # Сообщения, полученные во время загрузки, уже проиндексированы в handle_message
+        with self.startup.phase("search_index"):
+            await self._index_messages(data)
+        self.startup.log("Фоновая загрузка данных завершена")
+
+    def start_background_load(self):
+        self.content_extractor.start()
+        if self.lazy_load and self._load_task is None:
+            self._load_task = asyncio.create_task(self.load_storage_async())
+
+    async def _index_messages(self, data: Dict[Any, Dict[Any, List[Dict]]], chunk: int = 2000):
+        """Индексация сообщений порциями, чтобы не блокировать event loop"""
+        indexed = 0
+        for topics in data.values():
+            for messages in topics.values():
+                for message in messages:
+                    self.search_index.add(message)
+                    indexed += 1
+                    if indexed % chunk == 0:
+                        await asyncio.sleep(0)
+
+    async def rebuild_search_index(self):
+        """Полная перестройка индекса по текущей истории (например, после очистки)"""
+        self.search_index.clear()
+        await self._index_messages(self._history_snapshot())
+        logger.info(f"Поисковый индекс перестроен: {len(self.search_index)} сообщений")
+
+    async def search_messages(self, query: str, chat_id: Optional[int] = None) -> List[Dict]:
+        """Поиск по истории; chat_id ограничивает выдачу одной группой"""
+        await self.history_ready.wait()
+        with SEARCH_LATENCY.time():
+            return self.search_index.search(query, chat_id=chat_id, limit=self.search_results)
+
+    async def wait_storage_ready(self):
+        await self.tasks_ready.wait()
+        await self.history_ready.wait()
+
+    def _history_snapshot(self) -> Dict[int, Dict[int, List[Dict]]]:
+        """Копия структуры хранилища (сами сообщения не копируются: после сохранения в них меняется только значение digest)"""
+        return {
+            chat_id: {topic_id: list(messages) for topic_id, messages in topics.items()}
+            for chat_id, topics in self.messages_storage.items()
+        }
+
+    async def flush_storage(self) -> bool:
+        """Немедленная запись всех накопленных изменений"""
+        history_ok = await self.history_writer.flush()
+        tasks_ok = await self.tasks_writer.flush()
+        deferred_ok = await self.deferred_writer.flush()
+        return history_ok and tasks_ok and deferred_ok
+
+    def _write_history(self, snapshot: Dict[int, Dict[int, List[Dict]]], filename: Optional[str] = None) -> bool:
         """Сохранение всех сообщений в JSON файл"""
+        filename = filename or self.history_file
         try:
-            with open(filename, 'w', encoding='utf-8') as f:
-                json.dump(self.messages_storage, f, ensure_ascii=False, indent=2)
+            with STORAGE_SAVE_LATENCY.time(store='history'):
+                written = storage_io.atomic_write_json(filename, snapshot)
+            STORAGE_BYTES_WRITTEN.inc(written, store='history')
             logger.info(f"Сообщения сохранены в {filename}")
             return True
         except Exception as e:
@@ -217,6 +736,7 @@ class TelegramSummaryBot:
     async def check_task_completion(self, message_data: Dict[str, Any]) -> bool:
         """Проверяет, содержит ли сообщение явное подтверждение выполнения задачи"""
         try:
+            await self.tasks_ready.wait()
             if not self.tasks_storage or not message_data.get('text'):
                 return False
 
@@ -256,7 +776,7 @@ class TelegramSummaryBot:
     Автор: {message_data['username']}
     """
 
-            response = await self.giga_client.get_summary(prompt)
+            response = await self.giga_client.get_summary(prompt, call_type="completion_check")
             if not response:
                 return False
 
@@ -294,11 +814,26 @@ class TelegramSummaryBot:
                         'completion_confidence': result['confidence'],
                         'status': 'completed'
                     })
-                    self.save_tasks_to_json()
+                    self.tasks_writer.mark_dirty()
                     
                     logger.info(f"Задача {task_id} помечена выполненной (уверенность: {result['confidence']})")
                     return True
 
+            if task_id in self.task_archive:
+                # Задача ушла в архив, пока GigaChat проверял сообщение - дописываем выполненную версию
+                archived_task = await storage_io.run_io(self.task_archive.get, task_id)
+                if archived_task and not archived_task.get('is_complete'):
+                    archived_task.update({
+                        'is_complete': True,
+                        'completed_at': message_data['timestamp'],
+                        'completed_by': message_data['username'],
+                        'completion_confidence': result['confidence'],
+                        'status': 'completed'
+                    })
+                    await storage_io.run_io(self.task_archive.append, [archived_task])
+                    logger.info(f"Задача {task_id} из архива помечена выполненной")
+                    return True
+
             return False
 
         except Exception as e:
@@ -311,92 +846,168 @@ class TelegramSummaryBot:
             return
 
         chat_id = update.message.chat.id
-        if chat_id not in self.groups_dict:
+        # Одно чтение индекса: при перезагрузке конфига он подменяется целиком
+        topics = self.topic_names.get(chat_id)
+        if topics is None:
             return
 
         # Определяем topic_id (0 - основной чат)
         topic_id = getattr(update.message, 'message_thread_id', 0)
         
         # Проверяем, что топик есть в конфиге (если это не основной чат)
-        if topic_id != 0 and topic_id not in [t['id'] for t in self.groups_dict[chat_id].get('topics', [])]:
+        if topic_id != 0 and topic_id not in topics:
             return
 
-        # Создаем запись сообщения
-        message_data = {
-            'id': update.message.message_id,
-            'text': update.message.text or update.message.caption or "",
-            'user_id': update.message.from_user.id if update.message.from_user else None,
-            'username': update.message.from_user.username if update.message.from_user else None,
-            'first_name': update.message.from_user.first_name if update.message.from_user else None,
-            'timestamp': update.message.date.isoformat(),
-            'chat_id': chat_id,
-            'topic_id': topic_id,
-            'topic_name': next(
-                (t['name'] for t in self.groups_dict[chat_id].get('topics', []) if t['id'] == topic_id),
-                'Основной чат'
-            )
+        started = time.perf_counter()
+        try:
+            # Создаем запись сообщения
+            message_data = {
+                'id': update.message.message_id,
+                'text': update.message.text or update.message.caption or "",
+                'user_id': update.message.from_user.id if update.message.from_user else None,
+                'username': update.message.from_user.username if update.message.from_user else None,
+                'first_name': update.message.from_user.first_name if update.message.from_user else None,
+                'timestamp': update.message.date.isoformat(),
+                'chat_id': chat_id,
+                'topic_id': topic_id,
+                'topic_name': topics.get(topic_id, 'Основной чат')
+            }
+            media = next((kind for kind in MEDIA_LABELS if getattr(update.message, kind, None)), None)
+            if media:
+                message_data['media'] = media
+            document = update.message.document
+            if document is not None:
+                message_data['document'] = {
+                    'name': document.file_name, 'mime_type': document.mime_type, 'size': document.file_size
+                }
+                if not is_text_document(document.file_name, document.mime_type) or \
+                        (document.file_size or 0) > self.document_max_bytes:
+                    document = None
+            # Длинный текст и текстовые документы сжимаются в фоне, прием сообщения их не ждет
+            if document is not None or len(message_data['text']) > self.digest_threshold:
+                self._queue_digest(message_data, document)
+
+            # Сохраняем сообщение в историю
+            if chat_id not in self.messages_storage:
+                self.messages_storage[chat_id] = {}
+            if topic_id not in self.messages_storage[chat_id]:
+                self.messages_storage[chat_id][topic_id] = []
+
+            self.messages_storage[chat_id][topic_id].append(message_data)
+            self.search_index.add(message_data)
+            self.history_writer.mark_dirty()
+            MESSAGES_STORED.inc()
+            self._record_ingest_latency(update)
+
+            # Анализируем на наличие задач
+            await self.analyze_for_tasks(message_data)
+
+            # Проверяем на выполнение существующих задач
+            await self.check_task_completion(message_data)
+        finally:
+            # Обработчики, завершившиеся исключением, тоже учитываются в задержке
+            HANDLER_LATENCY.observe(time.perf_counter() - started)
+
+    def _record_ingest_latency(self, update: Update):
+        """Учет задержки от получения обновления до сохранения сообщения"""
+        stored = time.perf_counter()
+        delay = (datetime.now(timezone.utc) - update.message.date).total_seconds()
+        self.ingest_latency.add(max(delay, 0.0))
+        # message.date хранит целые секунды: отдельная грубая серия, не смешивается с точной
+        INGEST_DATE_LATENCY.observe(max(delay, 0.0), mode=self.update_mode)
+
+        if self.webhook_server:
+            received = self.webhook_server.pop_received_at(update.update_id)
+            if received is not None:
+                self.webhook_latency.add(stored - received)
+                INGEST_LATENCY.observe(stored - received)
+
+        if self.ingest_latency.count % 100 == 0:
+            logger.info(f"Задержка сохранения ({self.update_mode}): {self.ingest_latency.format()}")
+            if self.webhook_server:
+                logger.info(f"Задержка webhook -> сохранение: {self.webhook_latency.format()}")
+
+    def ingest_stats(self) -> Dict[str, Any]:
+        """Статистика задержек приема сообщений"""
+        return {
+            'mode': self.update_mode,
+            'date_to_stored': self.ingest_latency.snapshot(),
+            'received_to_stored': self.webhook_latency.snapshot()
         }
 
-        # Сохраняем сообщение в историю
-        if chat_id not in self.messages_storage:
-            self.messages_storage[chat_id] = {}
-        if topic_id not in self.messages_storage[chat_id]:
-            self.messages_storage[chat_id][topic_id] = []
-        
-        self.messages_storage[chat_id][topic_id].append(message_data)
-        self.save_messages_to_json()
+    async def _collect_analysis_data(self, time_threshold: datetime,
+                                     wait_digests: bool = False) -> Tuple[List[Dict], List[Dict], List[Dict]]:
+        """
+        Сбор сообщений и задач для сводки начиная с time_threshold.
+        wait_digests - дождаться готовящихся кратких изложений (нужно только промпту сводки,
+        статистике достаточно уже сохраненных данных)
+        """
+        await self.wait_storage_ready()
+        if wait_digests:
+            # Ждем ограниченное время, иначе в промпт идет начало текста
+            await self.content_extractor.join(self.digest_wait)
+        # Собираем задачи
+        completed_tasks = [
+            t for t in self.tasks_storage 
+            if t.get('is_complete', False) and  # Используем is_complete
+            datetime.fromisoformat(t['completed_at']).replace(tzinfo=timezone.utc) > time_threshold
+        ]
 
-        # Анализируем на наличие задач
-        await self.analyze_for_tasks(message_data)
+        # Выполненные задачи старше task_completed_days уже в архиве - читаем его только в этом случае
+        if time_threshold < datetime.now(timezone.utc) - timedelta(days=self.task_completed_days):
+            in_memory = {t['id'] for t in completed_tasks}
+            archived = await storage_io.run_io(self.task_archive.query, 'completed', time_threshold)
+            completed_tasks.extend(t for t in archived if t['id'] not in in_memory)
 
-        # Проверяем на выполнение существующих задач
-        await self.check_task_completion(message_data)
+        active_tasks = [
+            t for t in self.tasks_storage 
+            if not t.get('is_complete', False)  # Используем is_complete
+        ]
+        
+        # Собираем сообщения
+        analysis_messages = []
+        for chat_id, topics in self.messages_storage.items():
+            for topic_id, messages in topics.items():
+                for msg in messages:
+                    try:
+                        msg_time = datetime.fromisoformat(msg['timestamp'])
+                        if msg_time.tzinfo is None:
+                            msg_time = msg_time.replace(tzinfo=timezone.utc)
+                        
+                        digest = msg.get('digest') or msg.get('digest_partial')
+                        if msg_time > time_threshold and (msg['text'].strip() or digest):
+                            analysis_messages.append({
+                                'text': msg['text'],
+                                # Начало текста вместо изложения, если GigaChat был недоступен
+                                'digest': digest,
+                                'media': msg.get('media'),
+                                'user': msg.get('username') or msg.get('first_name') or f"user_{msg['user_id']}",
+                                'time': msg['timestamp'],
+                                'topic': msg.get('topic_name', 'Основной чат'),
+                                'chat_id': chat_id
+                            })
+                    except Exception as e:
+                        logger.error(f"Ошибка обработки сообщения: {e}")
+
+        return analysis_messages, completed_tasks, active_tasks
 
     async def create_summary(self) -> Optional[str]:
         """Генерация детальной сводки через GigaChat"""
         try:
             # 1. Подготовка данных
             time_threshold = datetime.now(timezone.utc) - timedelta(hours=24)
-            
-            # Собираем задачи
-            completed_tasks = [
-                t for t in self.tasks_storage 
-                if t.get('is_complete', False) and  # Используем is_complete
-                datetime.fromisoformat(t['completed_at']).replace(tzinfo=timezone.utc) > time_threshold
-            ]
-
-            active_tasks = [
-                t for t in self.tasks_storage 
-                if not t.get('is_complete', False)  # Используем is_complete
-            ]
-            
-            # Собираем сообщения
-            analysis_messages = []
-            for chat_id, topics in self.messages_storage.items():
-                for topic_id, messages in topics.items():
-                    for msg in messages:
-                        try:
-                            msg_time = datetime.fromisoformat(msg['timestamp'])
-                            if msg_time.tzinfo is None:
-                                msg_time = msg_time.replace(tzinfo=timezone.utc)
-                            
-                            if msg_time > time_threshold and msg['text'].strip():
-                                analysis_messages.append({
-                                    'text': msg['text'],
-                                    'user': msg.get('username') or msg.get('first_name') or f"user_{msg['user_id']}",
-                                    'time': msg['timestamp'],
-                                    'topic': msg.get('topic_name', 'Основной чат')
-                                })
-                        except Exception as e:
-                            logger.error(f"Ошибка обработки сообщения: {e}")
+            analysis_messages, completed_tasks, active_tasks = await self._collect_analysis_data(
+                time_threshold, wait_digests=True
+            )
 
             if not analysis_messages and not completed_tasks and not active_tasks:
                 return None
 
             # 2. Формирование промпта
             prompt = self._create_summary_prompt(analysis_messages, completed_tasks, active_tasks)
+            SUMMARY_PROMPT_CHARS.observe(len(prompt), summary='daily')
             print(prompt)
-            summary = await self.giga_client.get_summary(prompt)
+            summary = await self.giga_client.get_summary(prompt, call_type="daily_summary")
             
             
             # 3. Постобработка результата
@@ -417,14 +1028,32 @@ class TelegramSummaryBot:
             logger.error(f"Ошибка создания сводки: {e}")
             return None
 
+    @staticmethod
+    def _message_line(msg: Dict[str, Any], limit: int = 100) -> str:
+        """Сообщение для промпта: краткое изложение, если оно есть, иначе начало текста"""
+        text = msg.get('digest') or shorten(msg['text'], limit)
+        return f"[{MEDIA_LABELS[msg['media']]}] {text}" if msg.get('media') in MEDIA_LABELS else text
+
+    @staticmethod
+    def _format_deadline(task: Dict[str, Any]) -> str:
+        """Срок задачи: исходная формулировка и распознанная дата"""
+        if not task.get('deadline_at'):
+            return task.get('deadline') or 'не указан'
+        deadline_at = datetime.fromisoformat(task['deadline_at']).astimezone().strftime('%d.%m %H:%M')
+        return f"{task['deadline']} ({deadline_at})" if task.get('deadline') else deadline_at
+
     def _create_summary_prompt(self, messages: List[Dict], completed_tasks: List[Dict], active_tasks: List[Dict]) -> str:
         """Формирование строгого промпта для GigaChat"""
+        activity = compute_activity(messages, completed_tasks, active_tasks,
+                                    since=datetime.now(timezone.utc) - timedelta(hours=24))
+        activity_text = "=== СТАТИСТИКА АКТИВНОСТИ (точные данные) ===\n" + format_activity(activity, by_day=False)
+
         tasks_text = "=== ПОРУЧЕНИЯ ===\n"
         tasks_text += "Завершённые:\n" + "\n".join(
             f"- {t['text']} (исполнил: {t.get('completed_by', '?')}, {datetime.fromisoformat(t['completed_at']).strftime('%H:%M')})"
             for t in completed_tasks
         ) + "\n\nТекущие:\n" + "\n".join(
-            f"- {t['text']} (ответственный: {t.get('assignee', 'не назначен')}, срок: {t.get('deadline', 'не указан')})"
+            f"- {t['text']} (ответственный: {t.get('assignee', 'не назначен')}, срок: {self._format_deadline(t)})"
             for t in active_tasks
         )
         
@@ -434,7 +1063,7 @@ class TelegramSummaryBot:
             topic = msg['topic']
             if topic not in topics:
                 topics[topic] = []
-            topics[topic].append(msg['text'][:100] + "...")
+            topics[topic].append(self._message_line(msg))
         
         for topic, msgs in topics.items():
             messages_text += f"\nТема: {topic} ({len(msgs)} сообщ.)\n"
@@ -443,6 +1072,8 @@ class TelegramSummaryBot:
         return f"""
     Сформируй официальную сводку за последние 24 часа на основе следующих данных:
 
+    {activity_text}
+
     {tasks_text}
 
     {messages_text}
@@ -452,7 +1083,7 @@ class TelegramSummaryBot:
     2. Без Markdown-разметки, используя буллеты для разделения, дублировать смайлы друг за другом нельзя
     3. Используй смайлы только для визуального разделения блоков (не более 3-х)
     4. Структура:
-    [Статистика активности]
+    [Статистика активности] - только цифры из блока СТАТИСТИКА АКТИВНОСТИ, не пересчитывай их
     [Выполненные поручения]
     [Текущие поручения]
     [Ключевые темы обсуждений] - только на базе текста который у тебя есть
@@ -481,23 +1112,58 @@ class TelegramSummaryBot:
     """
     
     async def cleanup_old_tasks(self):
-        """Очистка старых задач (старше 24 часов)"""
+        """
+        Жизненный цикл задач: выполненные дольше task_completed_days и открытые дольше
+        task_open_days (получают статус stale) переносятся из памяти в архив на диске.
+        Записи архива старше task_archive_days удаляются.
+        """
         try:
-            time_threshold = datetime.now(timezone.utc) - timedelta(hours=24)
-            initial_count = len(self.tasks_storage)
-            
-            self.tasks_storage = [
-                task for task in self.tasks_storage
-                if datetime.fromisoformat(task['created_at']).replace(tzinfo=timezone.utc) > time_threshold
-            ]
-            
-            removed_count = initial_count - len(self.tasks_storage)
-            if removed_count > 0:
-                self.save_tasks_to_json()
-                logger.info(f"Удалено {removed_count} старых задач")
+            await self.tasks_ready.wait()
+            now = datetime.now(timezone.utc)
+            completed_before = now - timedelta(days=self.task_completed_days)
+            open_before = now - timedelta(days=self.task_open_days) if self.task_open_days else None
+
+            archived, originals = [], []
+            for task in self.tasks_storage:
+                if task.get('is_complete', False):
+                    if (task_time(task, 'completed_at') or now) < completed_before:
+                        archived.append(dict(task, archived_at=now.isoformat()))
+                        originals.append(task)
+                elif open_before and (task_time(task, 'created_at') or now) < open_before:
+                    archived.append(dict(task, status='stale', archived_at=now.isoformat()))
+                    originals.append(task)
+
+            if archived:
+                # Сначала запись в архив, затем удаление из памяти: при сбое задача не теряется.
+                # Пока шла запись, задача могла быть отмечена выполненной - тогда дописывается
+                # новая версия (в индексе архива последняя запись задачи заменяет прежние)
+                written = dict(zip((task['id'] for task in archived), zip(originals, archived)))
+                pending = archived
+                while pending:
+                    await storage_io.run_io(self.task_archive.append, pending)
+                    pending = []
+                    for task_id, (task, copy) in written.items():
+                        if task.get('is_complete') == copy.get('is_complete') and \
+                                task.get('completed_at') == copy.get('completed_at'):
+                            continue
+                        written[task_id] = (task, dict(task, archived_at=now.isoformat()))
+                        pending.append(written[task_id][1])
+                archived = [copy for _, copy in written.values()]
+                archived_ids = set(written)
+                self.tasks_storage = [task for task in self.tasks_storage if task['id'] not in archived_ids]
+                for task_id in archived_ids:
+                    self.deadline_index.discard(task_id)
+                self.tasks_writer.mark_dirty()
+                stale = sum(1 for task in archived if task['status'] == 'stale')
+                logger.info(f"В архив перенесено задач: {len(archived)} (из них без выполнения: {stale})")
+
+            if self.task_archive_days:
+                purged = await storage_io.run_io(self.task_archive.purge, now - timedelta(days=self.task_archive_days))
+                if purged:
+                    logger.info(f"Из архива удалено задач: {purged}")
             return True
         except Exception as e:
-            logger.error(f"Ошибка очистки задач: {e}")
+            logger.error(f"Ошибка очистки задач: {e}", exc_info=True)
             return False
         
     async def _command_weekly_summary(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -514,46 +1180,18 @@ class TelegramSummaryBot:
         try:
             # 1. Подготовка данных за 7 дней
             time_threshold = datetime.now(timezone.utc) - timedelta(days=7)
-            
-            # Собираем задачи за неделю
-            completed_tasks = [
-                t for t in self.tasks_storage 
-                if t.get('is_complete', False) and
-                datetime.fromisoformat(t['completed_at']).replace(tzinfo=timezone.utc) > time_threshold
-            ]
-
-            active_tasks = [
-                t for t in self.tasks_storage 
-                if not t.get('is_complete', False)
-            ]
-            
-            # Собираем сообщения за неделю
-            analysis_messages = []
-            for chat_id, topics in self.messages_storage.items():
-                for topic_id, messages in topics.items():
-                    for msg in messages:
-                        try:
-                            msg_time = datetime.fromisoformat(msg['timestamp'])
-                            if msg_time.tzinfo is None:
-                                msg_time = msg_time.replace(tzinfo=timezone.utc)
-                            
-                            if msg_time > time_threshold and msg['text'].strip():
-                                analysis_messages.append({
-                                    'text': msg['text'],
-                                    'user': msg.get('username') or msg.get('first_name') or f"user_{msg['user_id']}",
-                                    'time': msg['timestamp'],
-                                    'topic': msg.get('topic_name', 'Основной чат')
-                                })
-                        except Exception as e:
-                            logger.error(f"Ошибка обработки сообщения: {e}")
+            analysis_messages, completed_tasks, active_tasks = await self._collect_analysis_data(
+                time_threshold, wait_digests=True
+            )
 
             if not analysis_messages and not completed_tasks and not active_tasks:
                 return None
 
             # 2. Формирование промпта для недельной сводки
             prompt = self._create_weekly_summary_prompt(analysis_messages, completed_tasks, active_tasks)
+            SUMMARY_PROMPT_CHARS.observe(len(prompt), summary='weekly')
             print(prompt)
-            summary = await self.giga_client.get_summary(prompt)
+            summary = await self.giga_client.get_summary(prompt, call_type="weekly_summary")
             # print(summary)
             # 3. Постобработка результата
             if summary:
@@ -576,12 +1214,16 @@ class TelegramSummaryBot:
         
     def _create_weekly_summary_prompt(self, messages: List[Dict], completed_tasks: List[Dict], active_tasks: List[Dict]) -> str:
         """Формирование строгого промпта для недельной сводки"""
+        activity = compute_activity(messages, completed_tasks, active_tasks,
+                                    since=datetime.now(timezone.utc) - timedelta(days=7))
+        activity_text = "=== СТАТИСТИКА АКТИВНОСТИ ЗА НЕДЕЛЮ (точные данные) ===\n" + format_activity(activity)
+
         tasks_text = "=== ПОРУЧЕНИЯ ЗА НЕДЕЛЮ ===\n"
         tasks_text += "Завершённые:\n" + "\n".join(
             f"- {t['text']} (исполнил: {t.get('completed_by', '?')}, {datetime.fromisoformat(t['completed_at']).strftime('%d.%m %H:%M')})"
             for t in completed_tasks
         ) + "\n\nТекущие:\n" + "\n".join(
-            f"- {t['text']} (ответственный: {t.get('assignee', 'не назначен')}, срок: {t.get('deadline', 'не указан')})"
+            f"- {t['text']} (ответственный: {t.get('assignee', 'не назначен')}, срок: {self._format_deadline(t)})"
             for t in active_tasks
         )
         
@@ -591,7 +1233,7 @@ class TelegramSummaryBot:
             topic = msg['topic']
             if topic not in topics:
                 topics[topic] = []
-            topics[topic].append(msg['text'][:100] + "...")
+            topics[topic].append(self._message_line(msg))
         
         for topic, msgs in topics.items():
             messages_text += f"\nТема: {topic} ({len(msgs)} сообщ.)\n"
@@ -600,6 +1242,8 @@ class TelegramSummaryBot:
         return f"""
     Сформируй официальную недельную сводку на основе следующих данных:
 
+    {activity_text}
+
     {tasks_text}
 
     {messages_text}
@@ -622,8 +1266,7 @@ class TelegramSummaryBot:
     - Для структурирования подразделов используй буллеты для четкой визуализации
     - Не пиши информацию сплошным текстом, используй перечисление с буллетами!
     - Указывай даты выполнения задач
-    - Отмечай динамику по дням недели
-    - Выделяй наиболее активных участников
+    - Отмечай динамику по дням недели и наиболее активных участников строго по блоку СТАТИСТИКА АКТИВНОСТИ, не пересчитывай цифры
     - Подчеркивай основные достижения и проблемы
     - Для выполненных поручений указывай детализацию, укажи имена топик и тд
     - Используй представленные ниже заголовки не меняя их
@@ -641,6 +1284,36 @@ class TelegramSummaryBot:
     Делай максимально информативно.
     """
 
+    async def compact_history(self) -> int:
+        """Удаление сообщений старше history_retention_days"""
+        if not self.history_retention_days:
+            return 0
+        await self.history_ready.wait()
+
+        time_threshold = datetime.now(timezone.utc) - timedelta(days=self.history_retention_days)
+        removed = 0
+        for chat_id, topics in self.messages_storage.items():
+            for topic_id, messages in topics.items():
+                kept = []
+                for msg in messages:
+                    try:
+                        msg_time = datetime.fromisoformat(msg['timestamp'])
+                        if msg_time.tzinfo is None:
+                            msg_time = msg_time.replace(tzinfo=timezone.utc)
+                    except (KeyError, ValueError):
+                        kept.append(msg)
+                        continue
+                    if msg_time > time_threshold:
+                        kept.append(msg)
+                removed += len(messages) - len(kept)
+                topics[topic_id] = kept
+
+        if removed > 0:
+            self.history_writer.mark_dirty()
+            logger.info(f"Удалено {removed} сообщений старше {self.history_retention_days} дней")
+            await self.rebuild_search_index()
+        return removed
+
     async def send_daily_summary(self):
         """Отправка ежедневной сводки только в будние дни"""
         today = datetime.now().weekday()
@@ -648,14 +1321,24 @@ class TelegramSummaryBot:
             logger.info("Сегодня выходной, сводка не отправляется")
             return
 
-        # Очищаем старые задачи перед формированием сводки
-        await self.cleanup_old_tasks()
-        
         summary = await self.create_summary()
         if not summary:
             logger.warning("Не удалось создать сводку")
             return
 
+        await self._broadcast(summary)
+
+    async def send_weekly_summary(self):
+        """Отправка недельной сводки"""
+        summary = await self.create_weekly_summary()
+        if not summary:
+            logger.warning("Не удалось создать недельную сводку")
+            return
+
+        await self._broadcast(summary)
+
+    async def _broadcast(self, summary: str):
+        """Рассылка сводки во все группы из конфига"""
         for group_id in self.groups_dict:
             try:
                 await self.application.bot.send_message(
@@ -674,6 +1357,8 @@ class TelegramSummaryBot:
             CommandHandler("summary", self._command_summary),
             CommandHandler("weekly_summary", self._command_weekly_summary),  # Новая команда
             CommandHandler("save", self._command_save),
+            CommandHandler("search", self._command_search),
+            CommandHandler("stats", self._command_stats),
             MessageHandler(filters.ALL, self.handle_message)
         ]
         for handler in handlers:
@@ -686,7 +1371,9 @@ class TelegramSummaryBot:
             "Команды:\n"
             "/summary - создать дневную сводку\n"
             "/weekly_summary - создать недельную сводку\n"
-            "/save - сохранить историю сообщений"
+            "/save - сохранить историю сообщений\n"
+            "/search <запрос> - поиск по истории (слова, @автор, название топика)\n"
+            "/stats [дней] - статистика активности (по умолчанию за 7 дней)"
         )
 
     async def _command_summary(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -700,42 +1387,273 @@ class TelegramSummaryBot:
 
     async def _command_save(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Обработчик команды /save"""
-        if self.save_messages_to_json():
+        if await self.flush_storage():
             await update.message.reply_text("✅ История сообщений сохранена")
         else:
             await update.message.reply_text("❌ Ошибка при сохранении")
 
-    def schedule_tasks(self):
-        """Настройка расписания задач"""
-        schedule.every().day.at(self.summary_time).do(
-            lambda: asyncio.create_task(self.send_daily_summary())
+    def _command_scope(self, update: Update) -> Tuple[bool, Optional[int]]:
+        """
+        Область команд, читающих историю: в настроенной группе - только эта группа,
+        в других чатах - все группы, но только для пользователей из bot.admin_user_ids
+        """
+        chat_id = update.message.chat.id
+        if chat_id in self.groups_dict:
+            return True, chat_id
+        user = update.message.from_user
+        return bool(user and user.id in self.admin_user_ids), None
+
+    async def _command_search(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Обработчик команды /search <запрос>"""
+        query = " ".join(context.args or []).strip()
+        if not query:
+            await update.message.reply_text("Использование: /search <запрос>")
+            return
+
+        allowed, chat_id = self._command_scope(update)
+        if not allowed:
+            await update.message.reply_text("⛔ Поиск доступен только в настроенных группах")
+            return
+        started = time.perf_counter()
+        results = await self.search_messages(query, chat_id)
+        elapsed = (time.perf_counter() - started) * 1000
+
+        if not results:
+            await update.message.reply_text(f"🔎 По запросу «{query}» ничего не найдено")
+            return
+
+        lines = [f"🔎 Найдено по запросу «{query}» ({elapsed:.0f} мс):", ""]
+        for item in results:
+            try:
+                when = datetime.fromisoformat(item['timestamp']).strftime('%d.%m %H:%M')
+            except ValueError:
+                when = "?"
+            text = item['text'].replace("\n", " ")
+            if len(text) > 200:
+                text = text[:200] + "…"
+            lines.append(f"• {when} @{item['author']} [{item['topic_name']}]: {text}")
+        await update.message.reply_text("\n".join(lines), parse_mode=None)
+
+    async def _command_stats(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Обработчик команды /stats [дней]"""
+        try:
+            days = int(context.args[0]) if context.args else 7
+        except ValueError:
+            await update.message.reply_text("Использование: /stats [число дней]")
+            return
+        days = max(1, min(days, 365))
+        allowed, chat_id = self._command_scope(update)
+        if not allowed:
+            await update.message.reply_text("⛔ Статистика доступна только в настроенных группах")
+            return
+
+        since = datetime.now(timezone.utc) - timedelta(days=days)
+        messages, completed_tasks, active_tasks = await self._collect_analysis_data(since)
+        # В группе показываем статистику только по ней
+        if chat_id is not None:
+            messages = [m for m in messages if m.get('chat_id') == chat_id]
+            completed_tasks = [t for t in completed_tasks if t.get('chat_id', chat_id) == chat_id]
+            active_tasks = [t for t in active_tasks if t.get('chat_id', chat_id) == chat_id]
+
+        report = compute_activity(messages, completed_tasks, active_tasks, since=since)
+        await update.message.reply_text(
+            f"📊 Статистика за {days} дн.\n\n{format_activity(report, by_day=days > 1)}", parse_mode=None
         )
+
+    def _schedule(self, name: str, func, kind: Optional[str], *args, catch_up: bool = True):
+        """
+        Регистрация задания, если его расписание изменилось (kind None - задание снимается).
+        Неизмененные задания не перерегистрируются, чтобы не сбивать их время запуска.
+        """
+        spec = (kind, *args) if kind else None
+        if self._job_specs.get(name) == spec:
+            return
+        if spec is None:
+            self._job_specs.pop(name, None)
+            if self.scheduler.remove_job(name):
+                logger.info(f"Задание {name} снято с расписания")
+            return
+        self._job_specs[name] = spec
+        if kind == "daily":
+            self.scheduler.every_day(name, *args, func, catch_up)
+        elif kind == "weekly":
+            self.scheduler.every_week(name, *args, func, catch_up)
+        else:
+            self.scheduler.every(name, *args, func, catch_up)
+
+    def schedule_tasks(self, catch_up: bool = True):
+        """
+        Настройка расписания задач. Повторный вызов (после перезагрузки конфига)
+        меняет только задания с новым расписанием; catch_up=False - новое время
+        действует со следующего наступления, пропущенные по нему запуски не догоняются.
+        """
+        # Очистка регистрируется первой, чтобы выполняться перед сводкой в то же время
+        self._schedule("cleanup_tasks", self.cleanup_old_tasks, "daily", self.summary_time, catch_up=catch_up)
+        self._schedule("daily_summary", self.send_daily_summary, "daily", self.summary_time, catch_up=catch_up)
         logger.info(f"Ежедневная сводка запланирована на {self.summary_time}")
 
+        weekly = self.weekly_summary_day is not None and self.weekly_summary_time
+        self._schedule(
+            "weekly_summary", self.send_weekly_summary, "weekly" if weekly else None,
+            self.weekly_summary_day, self.weekly_summary_time, catch_up=catch_up
+        )
+        self._schedule(
+            "compact_history", self.compact_history, "daily" if self.history_retention_days else None, "03:00",
+            catch_up=catch_up
+        )
+        self._schedule(
+            "deadline_reminders", self.send_due_reminders, "interval" if self.reminders_enabled else None,
+            timedelta(seconds=self.config["bot"].get("reminder_check_interval", 60)), catch_up=catch_up
+        )
+        self._schedule(
+            "task_batch", self.process_deferred_tasks, "interval" if self.task_detection == "hybrid" else None,
+            timedelta(seconds=self.config["bot"].get("task_batch_interval", 300)), catch_up=catch_up
+        )
+        self._schedule(
+            "dump_metrics", self.dump_metrics, "interval" if self.metrics_config.get("dump_path") else None,
+            timedelta(seconds=self.metrics_config.get("dump_interval", 60)), catch_up=catch_up
+        )
+
+    async def dump_metrics(self):
+        """Выгрузка метрик в файл"""
+        extra = await self.collect_extra_metrics()
+        await storage_io.run_io(REGISTRY.dump, self.metrics_config["dump_path"], extra)
+
+    async def collect_extra_metrics(self) -> List[Dict[str, List[str]]]:
+        """Метрики других процессов для /metrics и выгрузки (у одиночного бота их нет)"""
+        return []
+
+    def register_queue_metrics(self):
+        QUEUE_DEPTH.set_function(lambda: len(self.deferred_task_checks), queue='deferred_tasks')
+        QUEUE_DEPTH.set_function(lambda: len(self.content_extractor), queue='digests')
+
+    async def start_metrics(self):
+        """Запуск эндпоинта /metrics и регистрация метрик очередей"""
+        QUEUE_DEPTH.set_function(lambda: self.application.update_queue.qsize(), queue='updates')
+        self.register_queue_metrics()
+        if self.metrics_config.get("enabled"):
+            self.metrics_server = MetricsServer(
+                listen=self.metrics_config.get("listen", "127.0.0.1"),
+                port=int(self.metrics_config.get("port", 9108)),
+                collect_extra=self.collect_extra_metrics
+            )
+            await self.metrics_server.start()
+
     async def run_scheduler(self):
         """Запуск фонового планировщика"""
-        while True:
-            schedule.run_pending()
-            await asyncio.sleep(60)
+        await self.scheduler.run()
+
+    async def start_webhook(self):
+        """Запуск локального webhook-сервера и регистрация URL в Telegram"""
+        from webhook_server import WebhookServer
+
+        cfg = self.webhook_config
+        self.webhook_server = WebhookServer(
+            self.application,
+            listen=cfg.get("listen", "0.0.0.0"),
+            port=int(cfg.get("port", 8443)),
+            url_path=cfg.get("url_path", "telegram"),
+            secret_token=cfg.get("secret_token"),
+            record_path=cfg.get("record_path"),
+            stats_provider=self.ingest_stats
+        )
+        await self.webhook_server.start()
+
+        if cfg.get("public_url"):
+            await self.application.bot.set_webhook(
+                url=cfg["public_url"],
+                secret_token=cfg.get("secret_token"),
+                allowed_updates=Update.ALL_TYPES
+            )
+            logger.info(f"Webhook зарегистрирован: {cfg['public_url']}")
+        else:
+            logger.warning("webhook.public_url не задан, Telegram не будет отправлять обновления (локальный режим)")
 
     async def start(self):
         """Основной цикл работы бота"""
-        self.application = Application.builder().token(self.bot_token).build()
+        started = time.perf_counter()
+        builder = Application.builder().token(self.bot_token)
+        if self.update_mode == "webhook":
+            # Обновления принимает собственный сервер, встроенный Updater не нужен
+            builder = builder.updater(None)
+        self.application = builder.build()
         self.setup_handlers()
         self.schedule_tasks()
 
-        await self.application.initialize()
-        await self.application.start()
-        await self.application.updater.start_polling()
-
-        # Запускаем планировщик в фоне
-        asyncio.create_task(self.run_scheduler())
+        with self.startup.phase("initialize"):
+            await self.application.initialize()
+        with self.startup.phase("application_start"):
+            await self.application.start()
+            await self.start_metrics()
+        self.loop_lag_monitor.start()
+        with self.startup.phase("updates"):
+            if self.update_mode == "webhook":
+                await self.start_webhook()
+            else:
+                await self.application.updater.start_polling()
+        self.startup.record("ready", time.perf_counter() - started)
+        self.startup.log("Бот принимает обновления")
+        self.start_background_load()
+
+        # Запускаем планировщик в фоне (ссылка нужна, чтобы задача не была собрана GC)
+        self.scheduler_task = asyncio.create_task(self.run_scheduler())
+
+        # Изменения config.yaml применяются без перезапуска (0 - не отслеживать)
+        reload_interval = self.config["bot"].get("config_reload_interval", 5)
+        if reload_interval:
+            self.config_watcher = ConfigWatcher(config_path(), self.reload_config, reload_interval)
+            self.config_watcher.start()
+
+        # SIGTERM (docker stop) и SIGINT завершают работу с записью накопленных изменений
+        self._stop_event = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            try:
+                loop.add_signal_handler(sig, self._stop_event.set)
+            except (NotImplementedError, RuntimeError):
+                pass  # Windows: остается KeyboardInterrupt
 
         logger.info("Бот запущен и работает")
-        await asyncio.Event().wait()  # Бесконечное ожидание
+        try:
+            await self._stop_event.wait()
+        finally:
+            await self.shutdown()
+
+    async def shutdown(self):
+        """Остановка приема обновлений и запись всех изменений на диск"""
+        logger.info("Остановка бота...")
+        if self.scheduler_task:
+            self.scheduler_task.cancel()
+        if self.config_watcher:
+            self.config_watcher.stop()
+        self.loop_lag_monitor.stop()
+        try:
+            if self.application:
+                if self.application.updater and self.application.updater.running:
+                    await self.application.updater.stop()
+                if self.webhook_server:
+                    await self.webhook_server.stop()
+                if self.application.running:
+                    await self.application.stop()
+                await self.application.shutdown()
+        except Exception as e:
+            logger.error(f"Ошибка остановки приложения: {e}", exc_info=True)
+        finally:
+            # Недоделанные изложения будут поставлены в очередь заново при следующем запуске
+            await self.content_extractor.stop()
+            self.resolve_deferred_tasks()
+            await self.flush_storage()
+            if self.metrics_server:
+                await self.metrics_server.stop()
+        logger.info("Бот остановлен, данные сохранены")
 
 async def main():
-    bot = TelegramSummaryBot()
+    shards = int(CONFIG["bot"].get("shards") or 1)
+    if shards > 1:
+        from sharding import ShardedFrontBot
+        bot = ShardedFrontBot(shards)
+    else:
+        bot = TelegramSummaryBot()
     await bot.start()
 
 if __name__ == "__main__":
@@ -0,0 +1,20 @@
+import os
+import sys
+import tempfile
+
+# config.py читает конфиг при импорте: до импорта модулей бота подставляем минимальный конфиг
+_config_dir = tempfile.TemporaryDirectory(prefix="bot-tests-")
+_config_path = os.path.join(_config_dir.name, "config.yaml")
+with open(_config_path, "w", encoding="utf-8") as f:
+    f.write(
+        "token: {telegram: '0:TEST', gigachat: TEST}\n"
+        "bot: {summary_time: '09:00', max_messages_per_group: 100, summary_language: ru}\n"
+        "groups: []\n"
+    )
+os.environ.setdefault("APP_CONFIG_FILE_PATH", _config_path)
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def pytest_unconfigure(config):
+    _config_dir.cleanup()
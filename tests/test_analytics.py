@@ -0,0 +1,119 @@
+from datetime import datetime, timedelta, timezone
+
+from analytics import compute_activity, format_activity, format_duration
+
+NOW = datetime(2026, 10, 14, 12, 0, tzinfo=timezone.utc)
+SINCE = NOW - timedelta(days=1)
+
+
+def message(user, minutes_ago, topic="Основной чат", chat_id=1):
+    return {
+        'text': "текст",
+        'digest': None,
+        'media': None,
+        'user': user,
+        'time': (NOW - timedelta(minutes=minutes_ago)).isoformat(),
+        'topic': topic,
+        'chat_id': chat_id
+    }
+
+
+def task(task_id, created_hours_ago, completed_hours_ago=None, completed_by=None, archived=False):
+    data = {
+        'id': task_id,
+        'is_complete': completed_hours_ago is not None,
+        'created_at': (NOW - timedelta(hours=created_hours_ago)).isoformat(),
+        'completed_at': (NOW - timedelta(hours=completed_hours_ago)).isoformat()
+        if completed_hours_ago is not None else None,
+        'completed_by': completed_by
+    }
+    if archived:
+        # Задачи из архива (task_archive.query) содержат время архивации
+        data['status'] = "completed"
+        data['archived_at'] = NOW.isoformat()
+    return data
+
+
+MESSAGES = [
+    message("anna", 60, topic="Релиз"),
+    message("boris", 50, topic="Релиз"),
+    message("anna", 40, topic="Релиз"),
+    message("anna", 30),
+    # Тот же топик в другом чате - отдельная переписка, это не ответ на сообщения чата 1
+    message("boris", 29, topic="Релиз", chat_id=2),
+    message("vera", 20, topic="Релиз", chat_id=2),
+]
+
+COMPLETED = [
+    # Из архива: создана до начала периода, выполнена в нем
+    task("archived", created_hours_ago=72, completed_hours_ago=20, completed_by="boris", archived=True),
+    task("live", created_hours_ago=10, completed_hours_ago=8, completed_by="boris"),
+]
+
+ACTIVE = [
+    task("open-new", created_hours_ago=2),
+    task("open-old", created_hours_ago=48),
+]
+
+
+def test_compute_activity_counts():
+    report = compute_activity(MESSAGES, COMPLETED, ACTIVE, since=SINCE)
+
+    assert report['messages'] == 6
+    assert report['participants'] == 3
+    assert report['users'] == [("anna", 3), ("boris", 2), ("vera", 1)]
+    assert report['topics'] == [("Релиз", 5), ("Основной чат", 1)]
+    assert sum(report['hours']) == 6
+
+    # Ответы считаются внутри чата и топика: boris->anna->... в чате 1 и boris->vera в чате 2
+    assert report['responses'] == 3
+    assert report['response_median'] == 600
+    assert report['response_p90'] == 600
+
+    # Созданы в периоде: live и open-new; выполнены: live и задача из архива
+    assert report['tasks_created'] == 2
+    assert report['tasks_completed'] == 2
+    assert report['tasks_open'] == 2
+    assert report['completion_median'] == (52 * 3600 + 2 * 3600) / 2
+    assert report['completed_by'] == [("boris", 2)]
+
+
+def test_compute_activity_per_chat():
+    chat_messages = [m for m in MESSAGES if m['chat_id'] == 2]
+    report = compute_activity(chat_messages, [], [], since=SINCE)
+    assert report['messages'] == 2
+    assert report['topics'] == [("Релиз", 2)]
+    assert report['responses'] == 1
+    assert report['response_median'] == 540
+
+
+def test_compute_activity_without_since_counts_all_created():
+    report = compute_activity([], COMPLETED, ACTIVE)
+    assert report['tasks_created'] == 4
+    assert report['messages'] == 0
+    assert report['response_median'] is None
+
+
+def test_format_activity():
+    text = format_activity(compute_activity(MESSAGES, COMPLETED, ACTIVE, since=SINCE), by_day=False)
+    lines = text.split("\n")
+    assert lines[0] == "Сообщений: 6, участников: 3"
+    assert "Самые активные: anna - 3 (50%), boris - 2 (33%), vera - 1 (16%)" in lines
+    assert "По топикам: Релиз - 5, Основной чат - 1" in lines
+    assert not any(line.startswith("По дням") for line in lines)
+    assert "Поручения: создано 2, выполнено 2, открыто 2, медианное время выполнения 1 д 3 ч" in lines
+    assert "Выполняли поручения: boris - 2" in lines
+
+    assert any(line.startswith("По дням") for line in format_activity(compute_activity(MESSAGES, [], [])).split("\n"))
+
+
+def test_format_activity_empty():
+    text = format_activity(compute_activity([], [], [], since=SINCE))
+    assert text == "Сообщений: 0, участников: 0\nПоручения: создано 0, выполнено 0, открыто 0"
+
+
+def test_format_duration():
+    assert format_duration(42) == "42 с"
+    assert format_duration(600) == "10 мин"
+    assert format_duration(3600) == "1 ч"
+    assert format_duration(2 * 86400 + 3600) == "2 д 1 ч"
@@ -0,0 +1,111 @@
+import asyncio
+import copy
+
+import pytest
+import yaml
+
+from config_watcher import ConfigWatcher, merge_reloadable, validate_config
+
+VALID = {
+    'token': {'telegram': '0:TEST', 'gigachat': 'TEST'},
+    'bot': {
+        'summary_time': '09:00',
+        'max_messages_per_group': 100,
+        'summary_language': 'ru',
+        'shards': None,
+        'task_detection': 'hybrid',
+        'task_confidence': 0.7,
+        'task_deferred_limit': 500,
+        'reminders': True,
+        'admin_user_ids': [42],
+        'weekly_summary_day': 'friday',
+        'weekly_summary_time': '18:00'
+    },
+    'groups': [{'id': -100, 'name': 'Команда', 'topics': [{'id': 1, 'name': 'Общий'}]}]
+}
+
+
+def with_bot(**changes):
+    config = copy.deepcopy(VALID)
+    config['bot'].update(changes)
+    return config
+
+
+def test_valid_config():
+    assert validate_config(VALID) == []
+
+
+@pytest.mark.parametrize("changes, field", [
+    ({'summary_time': '25:00'}, "summary_time"),
+    ({'weekly_summary_day': 'someday'}, "weekly_summary_day"),
+    ({'max_messages_per_group': 0}, "max_messages_per_group"),
+    ({'max_messages_per_group': True}, "max_messages_per_group"),  # bool - не число
+    ({'reminder_lead_minutes': "x"}, "reminder_lead_minutes"),
+    ({'task_batch_size': 2.5}, "task_batch_size"),
+    ({'task_confidence': 1.5}, "task_confidence"),
+    ({'task_detection': 'magic'}, "task_detection"),
+    ({'reminders': 'yes'}, "reminders"),
+    ({'admin_user_ids': ['42']}, "admin_user_ids"),
+    ({'gigachat_model': ''}, "gigachat_model"),
+])
+def test_invalid_bot_values(changes, field):
+    errors = validate_config(with_bot(**changes))
+    assert any(f"bot.{field}" in error for error in errors), errors
+
+
+def test_nullable_numbers_accept_null():
+    assert validate_config(with_bot(history_retention_days=None, task_open_days=None)) == []
+
+
+def test_invalid_groups():
+    config = copy.deepcopy(VALID)
+    config['groups'].append({'id': -100, 'name': 'Дубль'})
+    config['groups'].append({'id': 'x'})
+    config['groups'][0]['topics'].append({'id': 2})
+    errors = validate_config(config)
+    assert len(errors) == 3
+    assert validate_config(None) == ["конфиг должен быть словарем"]
+    assert validate_config({'groups': []}) == ["не задан раздел bot"]
+
+
+def test_merge_keeps_restart_only_values():
+    new = with_bot(shards=4, llm_workers=16, summary_time='10:00')
+    new['token'] = {'telegram': '1:OTHER', 'gigachat': 'OTHER'}
+    merged = merge_reloadable(VALID, new)
+    assert merged['bot']['summary_time'] == '10:00'
+    assert merged['bot'].get('shards') is None
+    assert 'llm_workers' not in merged['bot']
+    assert merged['token'] == VALID['token']
+    # Исходные словари не меняются
+    assert new['bot']['shards'] == 4 and VALID['bot']['summary_time'] == '09:00'
+
+
+def test_watcher_applies_only_valid_config(tmp_path):
+    path = tmp_path / "config.yaml"
+    applied = []
+
+    async def on_reload(config):
+        applied.append(config)
+
+    async def scenario():
+        watcher = ConfigWatcher(str(path), on_reload, interval=60)
+        path.write_text(yaml.safe_dump(with_bot(summary_time='07:30'), allow_unicode=True), encoding="utf-8")
+        ok = await watcher.check()
+        path.write_text(yaml.safe_dump(with_bot(summary_time='7 утра'), allow_unicode=True), encoding="utf-8")
+        rejected = await watcher.check()
+        path.write_text("bot: [", encoding="utf-8")
+        broken = await watcher.check()
+        return ok, rejected, broken
+
+    assert asyncio.run(scenario()) == (True, False, False)
+    assert [config['bot']['summary_time'] for config in applied] == ['07:30']
+
+
+def test_watcher_reports_failed_apply(tmp_path):
+    path = tmp_path / "config.yaml"
+    path.write_text(yaml.safe_dump(VALID, allow_unicode=True), encoding="utf-8")
+
+    async def on_reload(config):
+        raise ValueError("не применился")
+
+    assert asyncio.run(ConfigWatcher(str(path), on_reload).check()) is False
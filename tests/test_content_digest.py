@@ -0,0 +1,144 @@
+import asyncio
+
+from content_digest import ContentExtractor, decode_document, is_text_document, shorten, split_chunks
+
+
+def test_split_chunks_respects_size_and_paragraphs():
+    text = "\n\n".join(["А" * 50, "Б" * 50, "В" * 50])
+    chunks = split_chunks(text, 110)
+    assert chunks == ["А" * 50 + "\n\n" + "Б" * 50, "В" * 50]
+
+
+def test_split_chunks_cuts_long_paragraphs_by_sentence_then_hard():
+    assert split_chunks("Раз. Два. Три.", 6) == ["Раз.", "Два.", "Три."]
+    chunks = split_chunks("x" * 250, 100)
+    assert [len(chunk) for chunk in chunks] == [100, 100, 50]
+    assert "".join(chunks) == "x" * 250
+
+
+def test_split_chunks_never_exceeds_size():
+    text = "\n\n".join(f"Абзац {i}. " + "Обсудили релиз и бюджет проекта. " * (i % 7 + 1) for i in range(40))
+    assert all(len(chunk) <= 300 for chunk in split_chunks(text, 300))
+
+
+def test_shorten():
+    assert shorten("  короткий   текст ", 50) == "короткий текст"
+    assert shorten("Первое предложение. Второе предложение чуть длиннее. Третье.", 45) == "Первое предложение. …"
+    assert shorten("Оченьдлинноеслово и еще слова дальше по тексту", 20) == "Оченьдлинноеслово…"
+
+
+def test_text_documents():
+    assert is_text_document("notes.MD", None)
+    assert is_text_document(None, "text/plain")
+    assert is_text_document(None, "application/json")
+    assert not is_text_document("scan.pdf", "application/pdf")
+    assert decode_document("﻿привет".encode("utf-8")) == "привет"
+    assert decode_document("привет".encode("cp1251")) == "привет"
+
+
+class FakeSummarizer:
+    def __init__(self, fail: bool = False):
+        self.prompts = []
+        self.fail = fail
+
+    async def __call__(self, prompt):
+        self.prompts.append(prompt)
+        return None if self.fail else f"изложение {len(self.prompts)}"
+
+
+LONG_TEXT = "\n\n".join(f"Абзац {i}. " + "Обсудили релиз и бюджет проекта. " * 20 for i in range(3))
+
+
+def test_digest_map_reduce_and_cache():
+    summarize = FakeSummarizer()
+    extractor = ContentExtractor(summarize, chunk_chars=800, max_chars=20)
+
+    async def scenario():
+        return await extractor.digest(LONG_TEXT), await extractor.digest(LONG_TEXT)
+
+    first, second = asyncio.run(scenario())
+    chunks = len(split_chunks(LONG_TEXT, 800))
+    assert chunks > 1
+    # Изложение каждой части и одно сведение; повтор берется из кеша
+    assert len(summarize.prompts) == chunks + 1
+    assert first == second == f"изложение {chunks + 1}"
+
+
+def test_short_text_is_not_summarized():
+    summarize = FakeSummarizer()
+    extractor = ContentExtractor(summarize, max_chars=400)
+    assert asyncio.run(extractor.digest("  Короткое   сообщение ")) == "Короткое сообщение"
+    assert summarize.prompts == []
+
+
+def test_digest_falls_back_to_text_and_is_not_cached():
+    summarize = FakeSummarizer(fail=True)
+    extractor = ContentExtractor(summarize, chunk_chars=800, max_chars=120)
+    result = asyncio.run(extractor.digest(LONG_TEXT))
+    assert result.startswith("Абзац 0. Обсудили релиз")
+    assert len(result) <= 120
+    assert extractor._cache == {}
+
+
+def test_max_chunks_limits_requests():
+    summarize = FakeSummarizer()
+    extractor = ContentExtractor(summarize, chunk_chars=100, max_chars=20, max_chunks=2)
+    asyncio.run(extractor.digest(LONG_TEXT))
+    assert len(summarize.prompts) == 3
+
+
+def test_submit_fills_digest_in_background():
+    done = []
+
+    async def load_document():
+        return "Содержимое документа. " * 50
+
+    async def scenario():
+        extractor = ContentExtractor(FakeSummarizer(), workers=2, chunk_chars=3000, max_chars=50)
+        message = {'id': 1, 'text': "Смотрите файл", 'document': {'name': "plan.txt"}}
+        extractor.submit(message, load_document, on_done=done.append)
+        assert len(extractor) == 1
+        completed = await extractor.join(5)
+        await extractor.stop()
+        return completed, message, len(extractor)
+
+    completed, message, pending = asyncio.run(scenario())
+    assert completed and pending == 0
+    assert message['digest'] == "изложение 1"
+    assert done == [message]
+
+
+def test_failed_digest_is_kept_apart_for_retry():
+    async def scenario():
+        extractor = ContentExtractor(FakeSummarizer(fail=True), chunk_chars=800, max_chars=120)
+        message = {'id': 1, 'text': LONG_TEXT, 'digest': None, 'digest_partial': None}
+        extractor.submit(message)
+        await extractor.join(5)
+        failed = dict(message)
+        extractor.summarize = FakeSummarizer()
+        extractor.submit(message)
+        await extractor.join(5)
+        await extractor.stop()
+        return failed, message
+
+    failed, retried = asyncio.run(scenario())
+    # Начало текста не выдается за изложение: сообщение будет обработано заново
+    assert failed['digest'] is None
+    assert failed['digest_partial'].startswith("Абзац 0. Обсудили релиз")
+    assert retried['digest'].startswith("изложение")
+    assert retried['digest_partial'] is None
+    assert set(retried) == set(failed)
+
+
+def test_join_times_out_on_slow_summaries():
+    async def slow(prompt):
+        await asyncio.sleep(5)
+
+    async def scenario():
+        extractor = ContentExtractor(slow, max_chars=20)
+        extractor.submit({'id': 1, 'text': LONG_TEXT})
+        completed = await extractor.join(0.05)
+        await extractor.stop()
+        return completed
+
+    assert asyncio.run(scenario()) is False
@@ -0,0 +1,75 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from deadlines import DeadlineIndex, parse_deadline
+
+# Среда, 14 октября 2026, 10:00 по местному времени
+REFERENCE = datetime(2026, 10, 14, 10, 0).astimezone()
+
+
+def at(month: int, day: int, hour: int = 18, minute: int = 0, year: int = 2026) -> datetime:
+    return REFERENCE.replace(year=year, month=month, day=day, hour=hour, minute=minute)
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("до пятницы", at(10, 16)),
+    ("до среды", at(10, 21)),  # сказано в среду - следующая среда
+    ("к 15:00", at(10, 14, 15)),
+    ("в 11.30", at(10, 14, 11, 30)),
+    ("к 9 часам", at(10, 15, 9)),  # время уже прошло - завтра
+    ("завтра до 12", at(10, 15, 12)),
+    ("25.12", at(12, 25)),
+    ("25.06", at(6, 25, year=2027)),  # дата уже прошла - следующий год
+    ("3 ноября", at(11, 3)),
+    ("до конца недели", at(10, 16)),
+    ("до конца месяца", at(10, 31)),
+    ("в течение 2 дней", REFERENCE + timedelta(days=2)),
+    ("в течение часа", REFERENCE + timedelta(hours=1)),
+    ("2026-10-20", at(10, 20)),
+])
+def test_parse_deadline(text, expected):
+    assert parse_deadline(text, REFERENCE) == expected
+
+
+def test_iso_datetime_keeps_its_time_zone():
+    assert parse_deadline("2026-10-20T12:30:00+00:00", REFERENCE) == datetime.fromisoformat("2026-10-20T12:30:00+00:00")
+
+
+def test_default_time_for_date_without_time():
+    assert parse_deadline("завтра", REFERENCE, default_time=(9, 30)) == at(10, 15, 9, 30)
+
+
+@pytest.mark.parametrize("text", [None, "", "непонятно", "31.02"])
+def test_unrecognized_deadline(text):
+    assert parse_deadline(text, REFERENCE) is None
+
+
+def task(task_id: str, **fields):
+    return dict({'id': task_id, 'is_complete': False}, **fields)
+
+
+def test_index_returns_due_tasks_in_time_order():
+    index = DeadlineIndex()
+    later, sooner, future = task("later"), task("sooner"), task("future")
+    index.push(later, REFERENCE + timedelta(minutes=30))
+    index.push(sooner, REFERENCE + timedelta(minutes=10))
+    index.push(future, REFERENCE + timedelta(days=1))
+    assert index.next_due() == (REFERENCE + timedelta(minutes=10)).timestamp()
+    assert index.pop_due(REFERENCE + timedelta(hours=1)) == [sooner, later]
+    assert len(index) == 1
+    assert index.pop_due(REFERENCE + timedelta(hours=1)) == []
+
+
+def test_index_skips_stale_entries():
+    index = DeadlineIndex()
+    done, moved, removed = task("done"), task("moved"), task("removed")
+    for item in (done, moved, removed):
+        index.push(item, REFERENCE)
+    done['is_complete'] = True
+    index.push(moved, REFERENCE + timedelta(days=1))  # срок перенесли
+    index.discard("removed")
+    assert index.pop_due(REFERENCE + timedelta(minutes=1)) == []
+    assert index.next_due() == (REFERENCE + timedelta(days=1)).timestamp()
+    assert index.pop_due(REFERENCE + timedelta(days=2)) == [moved]
+    assert len(index) == 0
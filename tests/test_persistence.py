@@ -0,0 +1,93 @@
+import asyncio
+
+from persistence import DebouncedWriter
+
+
+class Recorder:
+    def __init__(self, fail: int = 0):
+        self.writes = []
+        self.fail = fail
+
+    def __call__(self, data):
+        if self.fail:
+            self.fail -= 1
+            return False
+        self.writes.append(data)
+        return True
+
+
+def test_changes_are_grouped_into_one_write():
+    async def scenario():
+        state = {'n': 0}
+        write = Recorder()
+        writer = DebouncedWriter("test", lambda: dict(state), write, delay=0.05, max_pending=100)
+        for i in range(10):
+            state['n'] = i
+            writer.mark_dirty()
+        assert write.writes == []
+        await asyncio.sleep(0.2)
+        return write.writes, writer.pending
+
+    writes, pending = asyncio.run(scenario())
+    assert writes == [{'n': 9}]
+    assert pending == 0
+
+
+def test_max_pending_commits_without_waiting_for_delay():
+    async def scenario():
+        write = Recorder()
+        writer = DebouncedWriter("test", lambda: "snapshot", write, delay=60, max_pending=3)
+        for _ in range(3):
+            writer.mark_dirty()
+        await asyncio.sleep(0.05)
+        return write.writes
+
+    assert asyncio.run(scenario()) == ["snapshot"]
+
+
+def test_failed_write_keeps_changes_pending():
+    async def scenario():
+        write = Recorder(fail=1)
+        writer = DebouncedWriter("test", lambda: "snapshot", write, delay=60)
+        writer.mark_dirty()
+        writer.mark_dirty()
+        first = await writer.flush()
+        pending_after_failure = writer.pending
+        second = await writer.flush()
+        return first, pending_after_failure, second, write.writes, writer.pending
+
+    first, pending_after_failure, second, writes, pending = asyncio.run(scenario())
+    assert (first, pending_after_failure) == (False, 2)
+    assert (second, writes, pending) == (True, ["snapshot"], 0)
+
+
+def test_flush_without_changes_does_not_write():
+    async def scenario():
+        write = Recorder()
+        writer = DebouncedWriter("test", lambda: "snapshot", write)
+        return await writer.flush(), write.writes
+
+    assert asyncio.run(scenario()) == (True, [])
+
+
+def test_commit_waits_until_data_is_ready():
+    async def scenario():
+        ready = asyncio.Event()
+        write = Recorder()
+        writer = DebouncedWriter("test", lambda: "snapshot", write, delay=0.01, wait_ready=ready.wait)
+        writer.mark_dirty()
+        await asyncio.sleep(0.1)
+        before = list(write.writes)
+        ready.set()
+        await asyncio.sleep(0.05)
+        return before, write.writes
+
+    assert asyncio.run(scenario()) == ([], ["snapshot"])
+
+
+def test_mark_dirty_outside_event_loop_writes_immediately():
+    write = Recorder()
+    writer = DebouncedWriter("test", lambda: "snapshot", write)
+    writer.mark_dirty()
+    assert write.writes == ["snapshot"]
+    assert writer.pending == 0
@@ -0,0 +1,144 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+
+import storage_io
+from scheduler import AsyncScheduler, DailyJob, IntervalJob, WeeklyJob, parse_time, parse_weekday
+
+
+async def noop():
+    pass
+
+
+@pytest.fixture
+def state_file(tmp_path):
+    return str(tmp_path / "scheduler_state.json")
+
+
+def write_state(state_file, **last_runs):
+    storage_io.atomic_write_json(state_file, {
+        name: {'last_run': last_run.isoformat(), 'runs': 1, 'failures': 0}
+        for name, last_run in last_runs.items()
+    })
+
+
+def test_parse_time_and_weekday():
+    assert parse_time("09:05") == (9, 5)
+    assert parse_weekday("Sunday") == 6
+    assert parse_weekday(0) == 0
+    with pytest.raises(ValueError):
+        parse_time("24:00")
+    with pytest.raises(ValueError):
+        parse_weekday("someday")
+
+
+def test_daily_job_across_midnight():
+    job = DailyJob("summary", "00:30", noop)
+    late = datetime(2026, 10, 14, 23, 50)
+    assert job.next_after(late) == datetime(2026, 10, 15, 0, 30)
+    assert job.previous_before(late) == datetime(2026, 10, 14, 0, 30)
+
+    early = datetime(2026, 10, 15, 0, 10)
+    assert job.next_after(early) == datetime(2026, 10, 15, 0, 30)
+    assert job.previous_before(early) == datetime(2026, 10, 14, 0, 30)
+
+    # Ровно во время запуска: следующий - завтра, последний - сейчас
+    exact = datetime(2026, 10, 15, 0, 30)
+    assert job.next_after(exact) == datetime(2026, 10, 16, 0, 30)
+    assert job.previous_before(exact) == exact
+
+
+def test_weekly_job_across_week_boundary():
+    # 2026-10-18 - воскресенье, 2026-10-19 - понедельник
+    job = WeeklyJob("weekly", "monday", "09:00", noop)
+    sunday = datetime(2026, 10, 18, 22, 0)
+    assert job.next_after(sunday) == datetime(2026, 10, 19, 9, 0)
+    assert job.previous_before(sunday) == datetime(2026, 10, 12, 9, 0)
+
+    after_run = datetime(2026, 10, 19, 9, 0, 1)
+    assert job.next_after(after_run) == datetime(2026, 10, 26, 9, 0)
+    assert job.previous_before(after_run) == datetime(2026, 10, 19, 9, 0)
+
+    job = WeeklyJob("weekly", "sunday", "23:30", noop)
+    monday = datetime(2026, 10, 19, 0, 15)
+    assert job.next_after(monday) == datetime(2026, 10, 25, 23, 30)
+    assert job.previous_before(monday) == datetime(2026, 10, 18, 23, 30)
+
+
+def test_interval_job_uses_last_run():
+    job = IntervalJob("reminders", timedelta(minutes=10), noop)
+    now = datetime(2026, 10, 14, 12, 0)
+    assert job.next_after(now) == now + timedelta(minutes=10)
+    assert job.previous_before(now) is None
+
+    job.last_run = now - timedelta(minutes=25)
+    assert job.previous_before(now) == now - timedelta(minutes=15)
+    assert job.next_after(now) == now + timedelta(minutes=10)
+
+
+def test_missed_run_is_caught_up_once(state_file):
+    write_state(state_file, summary=datetime.now() - timedelta(days=3))
+    scheduler = AsyncScheduler(state_file)
+    calls = []
+
+    async def summary():
+        calls.append(datetime.now())
+
+    job = scheduler.every_day("summary", "03:00", summary)
+    missed = job.previous_before(datetime.now())
+    assert job.next_run == missed
+    assert scheduler.due_jobs(datetime.now()) == [job]
+
+    async def run():
+        await asyncio.gather(*scheduler.start_due(datetime.now()))
+        # После догоняющего запуска задание больше не считается наступившим
+        assert scheduler.start_due(datetime.now()) == []
+
+    asyncio.run(run())
+    assert len(calls) == 1
+    assert job.next_run > datetime.now()
+    assert storage_io.read_json_file(state_file)['summary']['runs'] == 2
+
+
+def test_no_catch_up_when_last_run_is_current(state_file):
+    job = DailyJob("summary", "03:00", noop)
+    write_state(state_file, summary=job.previous_before(datetime.now()))
+    scheduler = AsyncScheduler(state_file)
+    scheduler.add_job(job)
+    assert job.next_run > datetime.now()
+    assert scheduler.due_jobs(datetime.now()) == []
+
+
+def test_no_catch_up_when_disabled(state_file):
+    write_state(state_file, summary=datetime.now() - timedelta(days=3))
+    scheduler = AsyncScheduler(state_file)
+    job = scheduler.every_day("summary", "03:00", noop, catch_up=False)
+    assert job.next_run > datetime.now()
+    assert scheduler.due_jobs(datetime.now()) == []
+
+
+def test_jobs_due_at_same_moment_run_in_registration_order(state_file):
+    scheduler = AsyncScheduler(state_file)
+    order = []
+
+    def recorder(name, delay):
+        async def func():
+            order.append(f"{name}:start")
+            await asyncio.sleep(delay)
+            order.append(f"{name}:end")
+        return func
+
+    cleanup = scheduler.every_day("cleanup", "03:00", recorder("cleanup", 0.02))
+    summary = scheduler.every_day("summary", "03:00", recorder("summary", 0))
+    moment = datetime.now() - timedelta(seconds=1)
+    cleanup.next_run = summary.next_run = moment
+
+    async def run():
+        tasks = scheduler.start_due(datetime.now())
+        # Задания одного момента выполняются одной задачей, друг за другом
+        assert len(tasks) == 1
+        await asyncio.gather(*tasks)
+
+    asyncio.run(run())
+    assert order == ["cleanup:start", "cleanup:end", "summary:start", "summary:end"]
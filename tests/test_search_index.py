@@ -0,0 +1,76 @@
+import pytest
+
+from search_index import SearchIndex, normalize_token, tokenize
+
+
+def message(chat_id, author, timestamp, text, topic="Общий"):
+    return {'chat_id': chat_id, 'username': author, 'timestamp': timestamp, 'text': text, 'topic_name': topic}
+
+
+@pytest.fixture
+def index():
+    index = SearchIndex()
+    index.add_many([
+        message(1, "ivan", "2026-10-01T10:00:00", "Подготовил отчет по бюджету", topic="Финансы"),
+        message(1, "olga", "2026-10-02T10:00:00", "Бюджет согласован"),
+        message(2, "petr", "2026-10-03T10:00:00", "Отчеты за квартал готовы"),
+        message(1, "olga", "2026-10-04T10:00:00", "Созвон перенесли"),
+    ])
+    return index
+
+
+def test_word_forms_share_a_stem():
+    assert normalize_token("Отчеты") == normalize_token("отчет")
+    assert normalize_token("бюджета") == normalize_token("бюджету")
+    assert normalize_token("готовиться") == "готов"
+    assert normalize_token("GigaChat") == "gigachat"
+
+
+def test_tokenize_drops_stop_words():
+    assert tokenize("И это отчет по бюджету") == [normalize_token("отчет"), normalize_token("бюджету")]
+
+
+def test_search_matches_other_word_forms(index):
+    authors = {r['author'] for r in index.search("отчеты")}
+    assert authors == {"ivan", "petr"}
+
+
+def test_all_words_required_when_possible(index):
+    results = index.search("отчет бюджет")
+    assert [r['author'] for r in results] == ["ivan"]
+
+
+def test_falls_back_to_any_word(index):
+    results = index.search("бюджет квартал")
+    assert {r['author'] for r in results} == {"ivan", "olga", "petr"}
+    # Редкое слово (квартал) весит больше
+    assert results[0]['author'] == "petr"
+
+
+def test_chat_filter(index):
+    assert [r['chat_id'] for r in index.search("отчет", chat_id=1)] == [1]
+    assert index.search("отчет", chat_id=3) == []
+
+
+def test_chat_filter_before_intersection(index):
+    # Оба слова есть только в чате 2, но в чате 1 остаются частичные совпадения
+    assert [r['author'] for r in index.search("отчет квартал")] == ["petr"]
+    assert [r['author'] for r in index.search("отчет квартал", chat_id=1)] == ["ivan"]
+    assert [r['author'] for r in index.search("отчет квартал", chat_id=2)] == ["petr"]
+
+
+def test_author_query_ranks_newer_first(index):
+    results = index.search("@olga")
+    assert [r['timestamp'] for r in results] == ["2026-10-04T10:00:00", "2026-10-02T10:00:00"]
+
+
+def test_limit_and_empty_query(index):
+    assert len(index.search("бюджет квартал", limit=2)) == 2
+    assert index.search("и на") == []
+
+
+def test_rebuild_replaces_contents(index):
+    index.rebuild({5: {0: [message(5, "anna", "2026-10-05T10:00:00", "Новый релиз")]}})
+    assert len(index) == 1
+    assert index.search("отчет") == []
+    assert [r['chat_id'] for r in index.search("релиз")] == [5]
@@ -0,0 +1,95 @@
+import json
+import os
+
+import pytest
+
+import storage_io
+from sharding import partition_marker, partition_storage, repartition_snapshot, shard_for, shard_path
+from task_archive import TaskArchive, archive_path
+from telegram_bot import deferred_path
+
+CHATS = [-1001, -1002, -1003, -1004, -1005, -1006, -1007]
+
+
+@pytest.fixture
+def files(tmp_path):
+    history_file, tasks_file = str(tmp_path / "history.json"), str(tmp_path / "tasks.json")
+    storage_io.atomic_write_json(history_file, {
+        str(chat): {"0": [{'id': 1, 'text': f"сообщение {chat}"}]} for chat in CHATS
+    })
+    storage_io.atomic_write_json(tasks_file, [{'id': f"open{chat}", 'chat_id': chat} for chat in CHATS])
+    with open(archive_path(tasks_file), 'w', encoding='utf-8') as f:
+        for chat in CHATS:
+            f.write(json.dumps({'id': f"done{chat}", 'chat_id': chat, 'status': 'completed'}) + "\n")
+    storage_io.atomic_write_json(deferred_path(tasks_file), [
+        {'message': {'id': 5, 'chat_id': chat}, 'guess': {'confidence': 0.5}} for chat in CHATS
+    ])
+    return history_file, tasks_file
+
+
+def read_shards(history_file, tasks_file, shards):
+    """Чат -> номер шарда по каждому виду данных; заодно проверяется, что чат лежит в своем шарде"""
+    placement = {'history': {}, 'tasks': {}, 'archive': {}, 'deferred': {}}
+    for shard_id in range(shards):
+        shard_tasks = shard_path(tasks_file, shard_id)
+        for chat in storage_io.read_json_file(shard_path(history_file, shard_id)):
+            placement['history'].setdefault(int(chat), []).append(shard_id)
+        for task in storage_io.read_json_file(shard_tasks):
+            placement['tasks'].setdefault(task['chat_id'], []).append(shard_id)
+        archive = TaskArchive(archive_path(shard_tasks))
+        archive.load()
+        for task in archive.query():
+            placement['archive'].setdefault(task['chat_id'], []).append(shard_id)
+        if os.path.exists(deferred_path(shard_tasks)):
+            for entry in storage_io.read_json_file(deferred_path(shard_tasks)):
+                placement['deferred'].setdefault(entry['message']['chat_id'], []).append(shard_id)
+    expected = {chat: [shard_for(chat, shards)] for chat in CHATS}
+    for kind, chats in placement.items():
+        assert chats == expected, kind
+
+
+def test_initial_partition(files):
+    history_file, tasks_file = files
+    assert partition_storage(history_file, tasks_file, 2) is True
+    read_shards(history_file, tasks_file, 2)
+    assert storage_io.read_json_file(partition_marker(history_file)) == {'shards': 2}
+    assert partition_storage(history_file, tasks_file, 2) is False
+
+
+@pytest.mark.parametrize("shards", [3, 1])
+def test_changed_shard_count_repartitions(files, shards):
+    history_file, tasks_file = files
+    partition_storage(history_file, tasks_file, 2)
+    assert partition_storage(history_file, tasks_file, shards) is True
+    read_shards(history_file, tasks_file, shards)
+    assert storage_io.read_json_file(partition_marker(history_file)) == {'shards': shards}
+    # Файлы шардов сверх нового числа удалены
+    assert not os.path.exists(shard_path(history_file, max(shards, 2)))
+    if shards == 1:
+        assert not os.path.exists(shard_path(tasks_file, 1))
+        assert not os.path.exists(archive_path(shard_path(tasks_file, 1)))
+
+
+def test_repartition_resumes_after_crash(files, monkeypatch):
+    history_file, tasks_file = files
+    partition_storage(history_file, tasks_file, 2)
+
+    written = []
+    original = storage_io.atomic_write_json
+
+    def crash_after_two_files(path, data):
+        if len(written) == 2:
+            raise OSError("сбой")
+        written.append(path)
+        return original(path, data)
+
+    monkeypatch.setattr(storage_io, "atomic_write_json", crash_after_two_files)
+    with pytest.raises(OSError):
+        partition_storage(history_file, tasks_file, 3)
+    monkeypatch.setattr(storage_io, "atomic_write_json", original)
+
+    assert storage_io.read_json_file(partition_marker(history_file)) == {'shards': 2}
+    assert os.path.exists(repartition_snapshot(history_file))
+    assert partition_storage(history_file, tasks_file, 3) is True
+    read_shards(history_file, tasks_file, 3)
+    assert not os.path.exists(repartition_snapshot(history_file))
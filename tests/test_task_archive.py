@@ -0,0 +1,99 @@
+import os
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from task_archive import TaskArchive, archive_path, task_time
+
+NOW = datetime(2026, 10, 14, 12, 0, tzinfo=timezone.utc)
+
+
+def task(task_id, status="completed", completed_days_ago=1, archived_days_ago=0, chat_id=1):
+    return {
+        'id': task_id,
+        'status': status,
+        'chat_id': chat_id,
+        'is_complete': status == "completed",
+        'created_at': (NOW - timedelta(days=30)).isoformat(),
+        'completed_at': (NOW - timedelta(days=completed_days_ago)).isoformat() if status == "completed" else None,
+        'archived_at': (NOW - timedelta(days=archived_days_ago)).isoformat()
+    }
+
+
+@pytest.fixture
+def archive(tmp_path):
+    return TaskArchive(archive_path(str(tmp_path / "tasks.json")))
+
+
+def test_archive_path():
+    assert archive_path("data/tasks.json") == os.path.join("data", "tasks.archive.jsonl")
+    assert archive_path("tasks.shard1.json") == "tasks.shard1.archive.jsonl"
+
+
+def test_task_time_adds_utc_to_naive_values():
+    assert task_time({'created_at': "2026-10-14T12:00:00"}, 'created_at') == NOW
+    assert task_time({'created_at': None}, 'created_at') is None
+    assert task_time({'created_at': "вчера"}, 'created_at') is None
+
+
+def test_append_and_get(archive):
+    assert archive.append([task("a"), task("b", status="stale")]) == 2
+    assert len(archive) == 2
+    assert "a" in archive and "c" not in archive
+    assert archive.get("b")['status'] == "stale"
+    assert archive.get("c") is None
+
+
+def test_latest_record_of_a_task_wins(archive):
+    archive.append([task("a", status="stale")])
+    archive.append([task("a")])
+    assert len(archive) == 1
+    assert archive.get("a")['status'] == "completed"
+
+    reloaded = TaskArchive(archive.path)
+    os.remove(reloaded.index_path)  # индекс строится заново по файлу архива
+    reloaded.load()
+    assert reloaded.get("a")['status'] == "completed"
+
+
+def test_query_by_status_time_and_chat(archive):
+    archive.append([
+        task("old", completed_days_ago=10),
+        task("recent", completed_days_ago=1),
+        task("other_chat", completed_days_ago=1, chat_id=2),
+        task("stale", status="stale"),
+    ])
+    since = NOW - timedelta(days=7)
+    assert {t['id'] for t in archive.query('completed', since)} == {"recent", "other_chat"}
+    assert [t['id'] for t in archive.query('completed', since, chat_id=2)] == ["other_chat"]
+    assert [t['id'] for t in archive.query('stale')] == ["stale"]
+
+
+def test_purge_removes_expired_records(archive):
+    archive.append([task("expired", archived_days_ago=100), task("kept", archived_days_ago=1)])
+    assert archive.purge(NOW - timedelta(days=30)) == 1
+    assert "expired" not in archive
+    assert archive.get("kept")['id'] == "kept"
+    assert archive.purge(NOW - timedelta(days=30)) == 0
+
+
+def test_index_is_rebuilt_when_archive_grew_after_it(archive):
+    archive.append([task("a")])
+    # Сбой между дозаписью архива и записью индекса
+    with open(archive.path, 'ab') as f:
+        f.write(b'{"id": "b", "status": "stale", "chat_id": 1}\n')
+    reloaded = TaskArchive(archive.path)
+    reloaded.load()
+    assert {"a", "b"} <= set(reloaded.index)
+
+
+def test_corrupted_line_is_skipped(archive):
+    archive.append([task("a")])
+    with open(archive.path, 'ab') as f:
+        f.write(b'{"id": "broken"\n')
+    archive.append([task("b")])
+    reloaded = TaskArchive(archive.path)
+    os.remove(reloaded.index_path)
+    reloaded.load()
+    assert set(reloaded.index) == {"a", "b"}
+    assert reloaded.get("b")['id'] == "b"
@@ -0,0 +1,44 @@
+from task_heuristics import MIN_CONFIDENCE, extract_task
+
+
+def test_assignment_with_mention_and_deadline():
+    task = extract_task("@ivan подготовь отчет до пятницы", author="olga")
+    assert task == {
+        'is_task': True,
+        'task_text': "подготовь отчет до пятницы",
+        'assignee': "@ivan",
+        'deadline': "до пятницы",
+        'confidence': 0.9
+    }
+
+
+def test_author_mention_is_not_an_assignee():
+    task = extract_task("@olga проверь пожалуйста", author="olga")
+    assert task is not None
+    assert task['assignee'] is None
+
+
+def test_polite_imperative_with_date_keeps_whole_sentence():
+    task = extract_task("Отправьте, пожалуйста, счета до 25.06")
+    assert task['task_text'] == "Отправьте, пожалуйста, счета до 25.06"
+    assert task['deadline'] == "до 25.06"
+    assert task['confidence'] >= 0.7
+
+
+def test_modal_without_imperative_is_uncertain():
+    task = extract_task("Коллеги, нужно обновить документацию к релизу")
+    assert task is not None
+    assert MIN_CONFIDENCE <= task['confidence'] < 0.7
+
+
+def test_task_sentence_is_picked_from_longer_message():
+    task = extract_task("Всем привет. Иван, проверь цифры в таблице до 11.30 завтра. Спасибо!")
+    assert task['task_text'] == "Иван, проверь цифры в таблице до 11.30 завтра."
+
+
+def test_not_tasks():
+    assert extract_task("Готово, отчет отправил") is None
+    assert extract_task("Привет всем, как дела?") is None
+    assert extract_task("подготовь отчет?") is None
+    assert extract_task("ок") is None
+    assert extract_task("") is None
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Стенд для webhook-режима: отправляет записанные (или построенные из history.json)
+обновления на локальный webhook-сервер бота и выводит статистику задержек.
+
+Пример:
+    python webhook_harness.py --url http://127.0.0.1:8443/telegram --count 500
+    python webhook_harness.py --updates recorded_updates.jsonl --secret SECRET
+"""
+
+import argparse
+import asyncio
+import json
+import time
+from typing import Dict, List
+
+import aiohttp
+
+from latency import LatencyStats
+from webhook_server import SECRET_HEADER
+
+
+def load_recorded_updates(path: str) -> List[Dict]:
+    """Чтение обновлений, записанных webhook-сервером (по одному JSON в строке)"""
+    updates = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                updates.append(json.loads(line))
+    return updates
+
+
+def updates_from_history(path: str, limit: int) -> List[Dict]:
+    """Построение обновлений Telegram из сообщений history.json"""
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+
+    updates = []
+    for chat_id_str, topics in data.items():
+        for topic_id_str, messages in topics.items():
+            topic_id = int(topic_id_str)
+            for msg in messages:
+                message = {
+                    'message_id': msg['id'],
+                    'date': 0,
+                    'chat': {'id': int(chat_id_str), 'type': 'supergroup', 'is_forum': True},
+                    'from': {
+                        'id': msg.get('user_id') or 1,
+                        'is_bot': False,
+                        'first_name': msg.get('first_name') or 'user',
+                        'username': msg.get('username')
+                    },
+                    'text': msg.get('text') or ''
+                }
+                if topic_id:
+                    message['message_thread_id'] = topic_id
+                    message['is_topic_message'] = True
+                updates.append({'update_id': len(updates) + 1, 'message': message})
+                if len(updates) >= limit:
+                    return updates
+    return updates
+
+
+async def replay(url: str, updates: List[Dict], secret: str, concurrency: int) -> LatencyStats:
+    """Отправка обновлений на webhook; замер времени подтверждения приема"""
+    ack_latency = LatencyStats(window=len(updates) or 1)
+    headers = {SECRET_HEADER: secret} if secret else {}
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async with aiohttp.ClientSession() as session:
+        async def post(update: Dict):
+            async with semaphore:
+                if 'message' in update:
+                    # Дата отправки = сейчас, чтобы бот мог посчитать задержку до сохранения
+                    update['message']['date'] = int(time.time())
+                started = time.perf_counter()
+                async with session.post(url, json=update, headers=headers) as response:
+                    await response.read()
+                    if response.status != 200:
+                        print(f"update {update.get('update_id')}: HTTP {response.status}")
+                ack_latency.add(time.perf_counter() - started)
+
+        await asyncio.gather(*(post(u) for u in updates))
+    return ack_latency
+
+
+async def fetch_stats(url: str) -> Dict:
+    async with aiohttp.ClientSession() as session:
+        async with session.get(url.rstrip('/') + '/stats') as response:
+            return await response.json()
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Стенд для webhook-режима бота")
+    parser.add_argument('--url', default='http://127.0.0.1:8443/telegram')
+    parser.add_argument('--updates', help='файл с записанными обновлениями (JSON Lines)')
+    parser.add_argument('--history', default='history.json')
+    parser.add_argument('--count', type=int, default=1000)
+    parser.add_argument('--secret', default='')
+    parser.add_argument('--concurrency', type=int, default=10)
+    args = parser.parse_args()
+
+    if args.updates:
+        updates = load_recorded_updates(args.updates)[:args.count]
+    else:
+        updates = updates_from_history(args.history, args.count)
+    print(f"Отправка {len(updates)} обновлений на {args.url}")
+
+    started = time.perf_counter()
+    ack_latency = await replay(args.url, updates, args.secret, args.concurrency)
+    elapsed = time.perf_counter() - started
+
+    print(f"Отправлено за {elapsed:.2f} с ({len(updates) / elapsed:.1f} обновл./с)")
+    print(f"Подтверждение приема: {ack_latency.format()}")
+
+    # Даем боту обработать очередь перед запросом статистики
+    await asyncio.sleep(1)
+    print("Статистика бота:")
+    print(json.dumps(await fetch_stats(args.url), ensure_ascii=False, indent=2))
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
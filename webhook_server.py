@@ -0,0 +1,89 @@
+import json
+import logging
+import time
+from typing import Dict, Optional
+
+from aiohttp import web
+from telegram import Update
+from telegram.ext import Application
+
+import storage_io
+
+logger = logging.getLogger(__name__)
+
+SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+
+
+class WebhookServer:
+    """
+    Локальный HTTP-сервер для приема обновлений Telegram в режиме webhook.
+    Обновления передаются в очередь Application так же, как при polling.
+    """
+
+    def __init__(self, application: Application, listen: str = "0.0.0.0", port: int = 8443,
+                 url_path: str = "telegram", secret_token: Optional[str] = None,
+                 record_path: Optional[str] = None, stats_provider=None):
+        self.application = application
+        self.listen = listen
+        self.port = port
+        self.url_path = "/" + url_path.strip("/")
+        self.secret_token = secret_token
+        self.record_path = record_path
+        self.stats_provider = stats_provider
+        # update_id -> время получения (perf_counter), забирается обработчиком сообщения
+        self.received_at: Dict[int, float] = {}
+        self._runner: Optional[web.AppRunner] = None
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_post(self.url_path, self._handle_update)
+        app.router.add_get(self.url_path + "/stats", self._handle_stats)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.listen, self.port)
+        await site.start()
+        logger.info(f"Webhook-сервер слушает {self.listen}:{self.port}{self.url_path}")
+
+    async def stop(self):
+        if self._runner:
+            await self._runner.cleanup()
+            self._runner = None
+
+    def pop_received_at(self, update_id: int) -> Optional[float]:
+        return self.received_at.pop(update_id, None)
+
+    async def _handle_update(self, request: web.Request) -> web.Response:
+        """Прием одного обновления от Telegram"""
+        received = time.perf_counter()
+        if self.secret_token and request.headers.get(SECRET_HEADER) != self.secret_token:
+            logger.warning("Webhook: неверный секретный токен")
+            return web.Response(status=403)
+
+        try:
+            data = await request.json()
+        except (json.JSONDecodeError, UnicodeDecodeError) as e:
+            logger.error(f"Webhook: некорректное тело запроса: {e}")
+            return web.Response(status=400)
+
+        if self.record_path:
+            try:
+                await storage_io.append_line(self.record_path, json.dumps(data, ensure_ascii=False))
+            except OSError as e:
+                logger.error(f"Webhook: ошибка записи обновления в {self.record_path}: {e}")
+
+        update = Update.de_json(data, self.application.bot)
+        if update is None:
+            return web.Response(status=400)
+
+        self.received_at[update.update_id] = received
+        # Защита от роста словаря, если обновления не доходят до обработчика сообщений
+        if len(self.received_at) > 10000:
+            self.received_at.pop(next(iter(self.received_at)))
+
+        await self.application.update_queue.put(update)
+        return web.Response()
+
+    async def _handle_stats(self, request: web.Request) -> web.Response:
+        """Статистика задержек для стенда сравнения режимов"""
+        stats = self.stats_provider() if self.stats_provider else {}
+        return web.json_response(stats)